@@ -25,112 +25,387 @@ For detailed information on each function and usage, refer to the respective doc
 
 
 # Import necessary libraries
+# netmiko (with paramiko and the cryptography libraries) is imported on the first SSH connection, see connect_netmiko()
 from datetime import datetime
-from netmiko import ConnectHandler
 import re
+import time
+import queue
+import threading
+import contextvars
+import os
+import uuid
+import math
+from contextlib import contextmanager
+from functools import partial
+import signal
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
 from termcolor import cprint
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, Response, request, jsonify, url_for
 import json
+import sqlite3
 from config import username, password  # Import credentials from config.py
 from config import AUTH_TOKEN          # Import API token
 # Import the IP addresses of BGP neighbors for different providers for for Aplos & PSD tenants from config.py
 from config import ote_bgp_neighbor, wind_bgp_neighbor, wind_bgp_v6_neighbor, nova_bgp_neighbor, nova_bgp_v6_neighbor, vodafone_bgp_neighbor, vodafone_bgp_v6_neighbor
 # Import the data_vlan_hosts and voice_vlan_hosts dictionaries from config.py
 from config import data_vlan_hosts, voice_vlan_hosts
+from job_manager import JobManager, QueueFullError, callback_url_allowed
+from connection_pool import ConnectionPool, PoolExhaustedError
+from device_cache import DeviceCache
+from device_locks import SingleFlight, DeviceLimiter
+from circuit_breaker import CircuitBreaker, backoff_delay
+from log_config import setup_logging, stop_logging, LogStream, request_id_var, device_ip_var
+from metrics import MetricsRegistry, CheckTimings, TimedConnection, current_timings
+from history_store import HistoryStore
+from provider_stats import ProviderStats
+from fleet_sweep import FleetSweeper
+from check_plans import CHECK_PROFILES, Step, SessionSet, load_plans, compile_graph, run_graph
+from response_format import ENCODINGS, parse_include, select_sections, dump_json, compress
+from parsers import INVALID_INPUT, parse_ping, parse_bgp_neighbors, parse_ipv6_interface, parse_version, parse_license_status, parse_route_table_total, parse_config_change, same_address
+# Optional tuning settings; the defaults below apply when config.py does not define them
+import config
+BATCH_MAX_WORKERS = getattr(config, 'BATCH_MAX_WORKERS', 10)          # devices checked in parallel per batch request
+BATCH_DEVICE_TIMEOUT = getattr(config, 'BATCH_DEVICE_TIMEOUT', 600)   # seconds allowed for a single device in a batch
+BATCH_MAX_DEVICES = getattr(config, 'BATCH_MAX_DEVICES', 1000)        # maximum entries accepted in one batch request
+BGP_ROUTES_READ_TIMEOUT = getattr(config, 'BGP_ROUTES_READ_TIMEOUT', 120)  # seconds to wait for a full BGP route table
+BGP_ROUTES_MAX_LINES = getattr(config, 'BGP_ROUTES_MAX_LINES', 50)   # route table lines captured per command (0 = whole table)
+PING_CONCURRENCY = getattr(config, 'PING_CONCURRENCY', 1)             # former name of CHECK_CONCURRENCY
+CHECK_CONCURRENCY = getattr(config, 'CHECK_CONCURRENCY', PING_CONCURRENCY)  # SSH sessions per device running check steps in parallel (1 = sequential)
+CHECK_PLANS = getattr(config, 'CHECK_PLANS', {})                      # additional or replaced tenant check plans (see check_plans.py)
+CHECK_PROFILE = getattr(config, 'CHECK_PROFILE', 'standard')          # check profile of requests without 'profile' ('quick', 'standard', 'full')
+PING_MODE = getattr(config, 'PING_MODE', 'standard')                  # 'fast' stops pinging a host once its outcome is certain
+PING_SUCCESS_THRESHOLD = getattr(config, 'PING_SUCCESS_THRESHOLD', 80)  # percent of answered probes for a successful ping
+PING_REPEAT = getattr(config, 'PING_REPEAT', 5)                       # probes per ping
+PING_TIMEOUT = getattr(config, 'PING_TIMEOUT', 2)                     # seconds to wait for each probe reply
+PING_FAST_PROBES = getattr(config, 'PING_FAST_PROBES', 2)             # minimum probes of the first round in fast mode
+JOB_MAX_WORKERS = getattr(config, 'JOB_MAX_WORKERS', 4)               # asynchronous checks running at the same time
+JOB_MAX_QUEUED = getattr(config, 'JOB_MAX_QUEUED', 50)                # asynchronous checks waiting for a free worker
+JOB_RESULT_TTL = getattr(config, 'JOB_RESULT_TTL', 3600)              # seconds a finished job result is kept for polling
+JOB_CALLBACK_TIMEOUT = getattr(config, 'JOB_CALLBACK_TIMEOUT', 30)    # seconds to wait for a callback URL to accept the result
+CALLBACK_URL_PREFIXES = getattr(config, 'CALLBACK_URL_PREFIXES', ())  # URL prefixes a callback_url must start with (none = no callbacks)
+BATCH_SHOW_COMMANDS = getattr(config, 'BATCH_SHOW_COMMANDS', True)    # send the planned show commands in a single pass
+SHOW_BATCH_READ_TIMEOUT = getattr(config, 'SHOW_BATCH_READ_TIMEOUT', 60)  # seconds to wait for the batched show commands
+SSH_KEEPALIVE = getattr(config, 'SSH_KEEPALIVE', 30)                  # seconds between SSH keepalives of open sessions
+SSH_ENGINE = getattr(config, 'SSH_ENGINE', 'netmiko')                 # 'netmiko' or 'asyncssh' (one event loop for the SSH I/O of all sessions)
+SSH_PORT = getattr(config, 'SSH_PORT', 22)                            # SSH port of the devices
+SSH_POOL_MAX_SESSIONS_PER_DEVICE = getattr(config, 'SSH_POOL_MAX_SESSIONS_PER_DEVICE', 3)  # open SSH sessions per device
+SSH_POOL_IDLE_TIMEOUT = getattr(config, 'SSH_POOL_IDLE_TIMEOUT', 300) # seconds an unused session is kept open (0 = no reuse)
+SSH_POOL_ACQUIRE_TIMEOUT = getattr(config, 'SSH_POOL_ACQUIRE_TIMEOUT', 120)  # seconds to wait for a free session to a busy device
+DEVICE_MAX_CHECKS = getattr(config, 'DEVICE_MAX_CHECKS', 1)            # checks running on the same device at the same time
+DEVICE_QUEUE_TIMEOUT = getattr(config, 'DEVICE_QUEUE_TIMEOUT', 600)   # seconds a check waits for its turn on a busy device
+CIRCUIT_FAILURE_THRESHOLD = getattr(config, 'CIRCUIT_FAILURE_THRESHOLD', 3)  # consecutive connect failures opening a device's circuit (0 = never)
+CIRCUIT_COOLDOWN = getattr(config, 'CIRCUIT_COOLDOWN', 60)             # seconds an open circuit rejects the checks of the device
+CIRCUIT_MAX_COOLDOWN = getattr(config, 'CIRCUIT_MAX_COOLDOWN', 900)    # longest cooldown, it doubles after every failed trial
+CONNECT_RETRIES = getattr(config, 'CONNECT_RETRIES', 2)                # connection retries of batch and sweep checks
+CONNECT_BACKOFF = getattr(config, 'CONNECT_BACKOFF', 5)                # seconds before the first retry, doubled for every retry
+CONNECT_BACKOFF_MAX = getattr(config, 'CONNECT_BACKOFF_MAX', 60)       # longest wait before a retry
+COALESCE_REQUESTS = getattr(config, 'COALESCE_REQUESTS', True)        # identical concurrent requests share one check
+CACHE_TTL_SHOW_RUN = getattr(config, 'CACHE_TTL_SHOW_RUN', 3600)      # seconds 'show run' is cached per device (0 = no caching)
+CACHE_TTL_VERSION = getattr(config, 'CACHE_TTL_VERSION', 86400)       # seconds 'show version' is cached per device (0 = no caching)
+CACHE_TTL_LICENSE = getattr(config, 'CACHE_TTL_LICENSE', 3600)        # seconds 'show license status' is cached per device (0 = no caching)
+LOG_FILE = getattr(config, 'LOG_FILE', 'console_log.txt')             # JSON lines log of the checks
+LOG_MAX_BYTES = getattr(config, 'LOG_MAX_BYTES', 10485760)            # size at which the log file is rotated
+LOG_BACKUP_COUNT = getattr(config, 'LOG_BACKUP_COUNT', 5)             # rotated log files kept
+LOG_ROTATE_WHEN = getattr(config, 'LOG_ROTATE_WHEN', None)            # time-based rotation instead, e.g. 'midnight'
+METRICS_REQUIRE_AUTH = getattr(config, 'METRICS_REQUIRE_AUTH', True)  # require the API token on /metrics
+SWEEP_INVENTORY = getattr(config, 'SWEEP_INVENTORY', None)          # .json/.csv device inventory of the fleet sweeps (None = no sweeps)
+SWEEP_INTERVAL = getattr(config, 'SWEEP_INTERVAL', 86400)             # seconds between the starts of two sweeps (0 = on demand only)
+SWEEP_START_TIME = getattr(config, 'SWEEP_START_TIME', None)          # 'HH:MM' local time of the first sweep (None = at startup)
+SWEEP_MAX_WORKERS = getattr(config, 'SWEEP_MAX_WORKERS', 10)          # devices checked at the same time during a sweep
+SWEEP_RATE = getattr(config, 'SWEEP_RATE', 1.0)                       # sweep checks started per second (0 = no limit)
+SWEEP_PROVIDER_LIMITS = getattr(config, 'SWEEP_PROVIDER_LIMITS', {})  # per provider {'max_workers': n, 'rate': checks/s}
+SWEEP_JITTER = getattr(config, 'SWEEP_JITTER', 5)                     # maximum random delay in seconds before every sweep check
+HISTORY_DB = getattr(config, 'HISTORY_DB', 'wanchecks_history.db')    # SQLite history of the check results (None = disabled)
+HISTORY_RETENTION_DAYS = getattr(config, 'HISTORY_RETENTION_DAYS', 90)  # days a check is kept in the history (0 = forever)
+PROVIDER_RTT_SAMPLES = getattr(config, 'PROVIDER_RTT_SAMPLES', 1000)   # latest ping RTTs kept per provider and host for the percentiles
+RESPONSE_COMPACT = getattr(config, 'RESPONSE_COMPACT', False)          # compact JSON unless a request sets 'compact'
+RESPONSE_COMPRESSION_MIN_BYTES = getattr(config, 'RESPONSE_COMPRESSION_MIN_BYTES', 1024)  # smaller responses are not compressed
+SERVER = getattr(config, 'SERVER', 'waitress')                        # 'waitress' (production) or 'flask' (debug server)
+SERVER_HOST = getattr(config, 'SERVER_HOST', '127.0.0.1')             # interface the API listens on
+SERVER_PORT = getattr(config, 'SERVER_PORT', 5000)                    # port the API listens on
+SERVER_THREADS = getattr(config, 'SERVER_THREADS', 16)                # requests served at the same time (waitress)
+REQUEST_TIMEOUT = getattr(config, 'REQUEST_TIMEOUT', 900)             # seconds a synchronous check may run before a 504 (0 = no limit)
 
 # Logging console to 'console_log.txt'
 # ------------------------------------
+# Everything printed by the checks is logged as JSON lines tagged with the request id and
+# device IP. The records go through a queue, so the checks never wait for the file writes.
+# init_services() starts the log and redirects stdout (print/cprint) to the logger.
 import logging
 import sys
 
-# Define a custom logger
-logger = logging.getLogger('my_logger')
-logger.setLevel(logging.INFO)
+logger = logging.getLogger('wanchecks')
+log_listener = None
+# ------------------------------------
 
-# Create a file handler to write log messages to a file
-log_file = 'console_log.txt'
-file_handler = logging.FileHandler(log_file)
+# Routes of the API, registered on the Flask application by create_app()
+api = Blueprint('wanchecks', __name__)
 
-# Define a log format
-log_format = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(log_format)
+# Prometheus metrics exposed on /metrics
+metrics_registry = MetricsRegistry()
+CHECKS = metrics_registry.counter('wanchecks_checks', 'Device checks by tenant type, provider and result', ('tenant_type', 'provider', 'status'))
+CHECK_SECONDS = metrics_registry.histogram('wanchecks_check_seconds', 'Duration of a whole device check', ('tenant_type', 'provider'))
+STAGE_SECONDS = metrics_registry.histogram('wanchecks_stage_seconds', 'Duration of a check stage', ('stage', 'tenant_type', 'provider'))
+COMMAND_SECONDS = metrics_registry.histogram('wanchecks_command_seconds', 'Duration of a device command (IP addresses replaced by <ip>)', ('command',))
+SSH_FAILURES = metrics_registry.counter('wanchecks_ssh_failures', 'Failed SSH connections by exception type', ('reason',))
+COALESCED = metrics_registry.counter('wanchecks_coalesced_requests', 'Requests answered with the result of an identical running check')
+CIRCUIT_REJECTED = metrics_registry.counter('wanchecks_circuit_rejected_checks', 'Checks rejected by the open circuit of an unreachable device')
+CONNECT_RETRIED = metrics_registry.counter('wanchecks_connect_retries', 'Batch and sweep checks retried after a failed connection')
 
-# Add the file handler to the logger
-logger.addHandler(file_handler)
+# IPv4/IPv6 addresses in commands, replaced to keep the number of metric labels small
+IP_ADDRESS = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b|\b[0-9A-Fa-f]{0,4}(?::[0-9A-Fa-f]{0,4}){2,7}\b")
 
-# Redirect stdout to the logger
-class StreamToLogger:
-    def __init__(self, logger, log_level=logging.INFO):
-        self.logger = logger
-        self.log_level = log_level
-        self.linebuf = ''
+def record_command(command, seconds):
+    """
+    Record the duration of a device command in the metrics and in the timings of the running check.
 
-    def write(self, buf):
-        for line in buf.rstrip().splitlines():
-            self.logger.log(self.log_level, line.rstrip())
+    Args:
+        command (str): The command sent to the device.
+        seconds (float): How long the command took.
+    """
+    COMMAND_SECONDS.observe(seconds, command=IP_ADDRESS.sub("<ip>", command))
+    timings = current_timings.get()
+    if timings:
+        timings.add_command(command, seconds)
 
-    def flush(self):
-        pass  # Add a flush method to satisfy the 'flush' attribute
+@contextmanager
+def timed_stage(stage):
+    """
+    Time a stage of the running check (e.g., 'login', 'ping', 'bgp').
 
-# Use the custom stream to logger class to redirect stdout
-sys.stdout = StreamToLogger(logger, logging.INFO)
-# ------------------------------------
+    Args:
+        stage (str): The stage name.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        timings = current_timings.get()
+        labels = timings.labels if timings else {}
+        STAGE_SECONDS.observe(seconds, stage=stage, **labels)
+        if timings:
+            timings.add_stage(stage, seconds)
+
+def connect_netmiko(**device):
+    """
+    Open a Netmiko SSH session (netmiko is imported on the first call, not at startup).
 
+    Args:
+        **device: The ConnectHandler arguments (device_type, ip, username, ...).
 
-# Current time and formats it to "Year/Month/Day__Time".
-timestamp_format = "%Y-%m-%d %H_%M"
-timestamp = datetime.now().strftime(timestamp_format)
+    Returns:
+        object: The Netmiko connection object.
+    """
+    from netmiko import ConnectHandler
+    return ConnectHandler(**device)
 
-# Initialize Flask application
-app = Flask(__name__)
+def open_ssh_session(device):
+    """
+    Open a new SSH session to a device with the SSH_ENGINE (used by the connection pool).
 
-# Create a list to hold the threads
-threads = []
+    Args:
+        device (dict): A dictionary containing device connection details.
+
+    Returns:
+        object: A Netmiko (or Netmiko-compatible asyncssh) connection object whose send_command calls are timed.
+    """
+    try:
+        if SSH_ENGINE == 'asyncssh':
+            # asyncssh is optional, only needed with this engine
+            from async_engine import AsyncSSHConnection
+            return TimedConnection(AsyncSSHConnection(**device), record_command)
+        return TimedConnection(connect_netmiko(**device), record_command)
+    except Exception as e:
+        SSH_FAILURES.inc(reason=type(e).__name__)
+        raise
+
+# SSH sessions kept open between checks, keyed by device IP
+connection_pool = ConnectionPool(open_ssh_session, max_sessions_per_device=SSH_POOL_MAX_SESSIONS_PER_DEVICE,
+                                 idle_timeout=SSH_POOL_IDLE_TIMEOUT, acquire_timeout=SSH_POOL_ACQUIRE_TIMEOUT)
+
+# Outputs of 'show run', 'show version' and 'show license status' reused between checks
+device_cache = DeviceCache({"show run": CACHE_TTL_SHOW_RUN, "show version": CACHE_TTL_VERSION,
+                            "show license status": CACHE_TTL_LICENSE})
+CACHED_COMMANDS = ["show run", "show version", "show license status"]
+CONFIG_CHANGE_COMMAND = "show running-config | include Last configuration change"
+
+# Identical concurrent checks share one execution, checks over the per-device limit wait in line
+single_flight = SingleFlight()
+device_limiter = DeviceLimiter(max_per_device=DEVICE_MAX_CHECKS, timeout=DEVICE_QUEUE_TIMEOUT)
+
+# Devices whose SSH connections keep failing are not tried again until their cooldown ends
+circuit_breaker = CircuitBreaker(failure_threshold=CIRCUIT_FAILURE_THRESHOLD, cooldown=CIRCUIT_COOLDOWN,
+                                 max_cooldown=CIRCUIT_MAX_COOLDOWN)
+
+# Background executor of the asynchronous /wanchecks/ requests
+job_manager = JobManager(max_workers=JOB_MAX_WORKERS, max_queued=JOB_MAX_QUEUED,
+                         result_ttl=JOB_RESULT_TTL, callback_timeout=JOB_CALLBACK_TIMEOUT)
+
+# Structured results of the finished checks, with the running-configs stored once per hash (opened by init_services())
+history_store = None
+
+# Ping and BGP results of the finished checks aggregated by provider, BGP neighbor and pinged host
+provider_stats = ProviderStats(rtt_samples=PROVIDER_RTT_SAMPLES)
+
+# IPv4 and IPv6 BGP neighbors of every provider for APLOS & PSD tenants
+PROVIDER_BGP_NEIGHBORS = {
+    "OTE": (ote_bgp_neighbor, ote_bgp_neighbor),    # v6 over v4 neighbor
+    "WIND": (wind_bgp_neighbor, wind_bgp_v6_neighbor),
+    "NOVA": (nova_bgp_neighbor, nova_bgp_v6_neighbor),
+    "VODAFONE": (vodafone_bgp_neighbor, vodafone_bgp_v6_neighbor),
+}
+
+# Show command batching
+def plan_show_commands(plan, provider, bgp_neighbor, profile=CHECK_PROFILES["standard"]):
+    """
+    Collect the show commands the checks of a check plan need, without duplicates.
+
+    Args:
+        plan (CheckPlan): The check plan of the tenant type.
+        provider (str): The network provider (e.g., 'OTE', 'WIND').
+        bgp_neighbor (str): Comma-separated list of BGP neighbors.
+        profile (CheckProfile): The check profile of the request.
+
+    Returns:
+        list: The show commands in execution order.
+    """
+    commands = ["show version", "show license status"] if profile.version_license else []
+    commands.extend(f'show interface {interface}' for interface in plan.optional_interfaces)
+    commands.extend(f'show ipv6 interface {interface}' for interface in plan.interfaces + plan.optional_interfaces)
+
+    if plan.bgp == "request":
+        commands.extend(f'show ip bgp neighbor {neighbor}' for neighbor in split_bgp_neighbors(bgp_neighbor))
+    else:
+        ipv4_neighbor, _ = provider_bgp_neighbors(provider)
+        commands.append(f'show ip bgp neighbor {ipv4_neighbor}')
+        commands.append('show bgp ipv6 unicast neighbors')
+
+    # drop duplicates, keeping the first occurrence
+    return list(dict.fromkeys(commands))
+
+def run_show_commands(net_connect, commands):
+    """
+    Run a list of show commands and map every command to its output.
+
+    With BATCH_SHOW_COMMANDS the commands are written to the channel at once and
+    the output is split on the device prompt, so the prompt detection of
+    send_command is paid once instead of once per command. If the batched
+    output cannot be split reliably, the commands are sent one by one.
+
+    Args:
+        net_connect (object): A Netmiko connection object.
+        commands (list): The show commands to run.
+
+    Returns:
+        dict: Command to output map.
+    """
+    if BATCH_SHOW_COMMANDS and len(commands) > 1:
+        try:
+            return _run_show_commands_batched(net_connect, commands)
+        except Exception as e:
+            cprint(f"Batched show commands failed ({e}), sending them one by one", "yellow")
+            net_connect.clear_buffer()
+    return {command: net_connect.send_command(command) for command in commands}
+
+def _run_show_commands_batched(net_connect, commands):
+    started = time.perf_counter()
+    prompt = net_connect.find_prompt()
+    prompt_pattern = re.compile(rf"^{re.escape(prompt)}", re.MULTILINE)
+    net_connect.write_channel("".join(f"{command}{net_connect.RETURN}" for command in commands))
+
+    # Every command output is followed by the prompt, read until all of them arrived
+    output = ""
+    deadline = time.monotonic() + SHOW_BATCH_READ_TIMEOUT
+    while len(prompt_pattern.findall(output)) < len(commands):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"no prompt after {SHOW_BATCH_READ_TIMEOUT} seconds")
+        new_data = net_connect.read_channel()
+        if new_data:
+            output += new_data.replace("\r\n", "\n").replace("\r", "")
+        else:
+            time.sleep(0.05)
+
+    # Each piece starts with the command echo followed by the command output
+    pieces = prompt_pattern.split(output)
+    show_outputs = {}
+    for command, piece in zip(commands, pieces):
+        echo, _, command_output = piece.partition("\n")
+        if echo.strip() != command:
+            raise ValueError(f"unexpected echo {echo.strip()!r} for {command!r}")
+        show_outputs[command] = command_output.rstrip("\n")
+    record_command(" ; ".join(commands), time.perf_counter() - started)
+    return show_outputs
+
+def show_command(net_connect, command, show_outputs=None):
+    """
+    Return the output of a show command, from the collected outputs when available.
+
+    Commands missing from show_outputs are sent to the device and added to the
+    map, so repeated commands are only sent once.
+
+    Args:
+        net_connect (object): A Netmiko connection object.
+        command (str): The show command.
+        show_outputs (dict): Optional map of already collected show command outputs.
+
+    Returns:
+        str: The command output.
+    """
+    command = command.strip()
+    if show_outputs is None:
+        return net_connect.send_command(command)
+    if command not in show_outputs:
+        show_outputs[command] = net_connect.send_command(command)
+    return show_outputs[command]
 
 # inteface tests 
-def def_int_checks(tenant_type, device, net_connect):
+def def_int_checks(plan, device, net_connect, show_outputs=None):
     """
-    Perform interface status checks for the given tenant type.
+    Perform the interface status checks of a check plan.
 
     Args:
-        tenant_type (str): The type of tenant (e.g., 'APLOS', 'PSD').
+        plan (CheckPlan): The check plan of the tenant type.
         device (dict): A dictionary containing device connection details.
         net_connect (object): A Netmiko connection object.
+        show_outputs (dict): Optional map of already collected show command outputs.
 
     Returns:
-        tuple: A tuple containing interface list, interface results, interface outputs, and interface report.
+        tuple: A tuple containing interface list, interface results, interface outputs, interface report, and interface stats.
     """
     #with ConnectHandler(**device) as net_connect:  
     interface_results = []
     interface_list = []
     interface_outputs = []
     valid_interfaces = []
+    interface_stats = []
     INTERFACE_REPORT = "OK"  # Assume all interfaces are UP
-
-    # check interface data vlan 3000 status, for all tenants except for ΠΣΔ Ασυμμετρος 
-    if tenant_type == "APLOS":
-        interface_list = ['vlan3000', 'vlan3100']
-    elif tenant_type == "PSD":
-        interface_list = ['vlan3100']
-    elif tenant_type == "MMM":
-        interface_list = ['vlan3000']
-        # check whether tenant belongs to EFKA 
-        output = net_connect.send_command('show interface vlan200')
-        if 'Invalid input detected' not in output:
-            interface_list.append('vlan200')
+    # 'show ipv6 interface X' serves both the existence and the status check
+    if show_outputs is None:
+        show_outputs = {}
+
+    # the interfaces of the tenant type (e.g., no data vlan 3000 for ΠΣΔ Ασυμμετρος)
+    interface_list = list(plan.interfaces)
+    # optional interfaces, e.g. vlan200 when the MMM tenant belongs to EFKA
+    for interface in plan.optional_interfaces:
+        output = show_command(net_connect, f'show interface {interface}', show_outputs)
+        if INVALID_INPUT not in output:
+            interface_list.append(interface)
     
     # Check if interfaces exist before checking their status
     for interface in interface_list:
-        output = net_connect.send_command(f'show ipv6 interface {interface}')
-        if 'Invalid input detected' not in output:
+        output = show_command(net_connect, f'show ipv6 interface {interface}', show_outputs)
+        if parse_ipv6_interface(output, interface).exists:
             valid_interfaces.append(interface)
     
     # Check the status of valid interfaces
     for interface in valid_interfaces:
-        interface_output = net_connect.send_command(f'show ipv6 interface {interface}')
+        interface_output = show_command(net_connect, f'show ipv6 interface {interface}', show_outputs)
         interface_outputs.append(interface_output + "\n")
+        interface_status = parse_ipv6_interface(interface_output, interface)
+        interface_stats.append(interface_status.to_dict())
         
-        if 'line protocol is up' in interface_output:
+        if interface_status.is_up:
             cprint(f'{interface} is UP', "green")
             interface_results.append(f"interface {interface} is UP")
         else:
@@ -138,155 +413,199 @@ def def_int_checks(tenant_type, device, net_connect):
             interface_results.append(f"interface {interface} is down")
             INTERFACE_REPORT = "FAIL"
         
-    return interface_list, interface_results, interface_outputs, INTERFACE_REPORT
+    return interface_list, interface_results, interface_outputs, INTERFACE_REPORT, interface_stats
 
 # PING tests
-def def_ping_checks(device, net_connect, interface_list, tenant_type):
+def ping_command(host_ip, source, repeat=5, timeout=2):
     """
-    Perform ping tests for various hosts using different interfaces.
+    Build a ping command, adding 'repeat'/'timeout' only when they differ from the IOS defaults.
 
     Args:
-        device (dict): A dictionary containing device connection details.
-        net_connect (object): A Netmiko connection object.
-        interface_list (list): List of valid interfaces.
-        tenant_type (str): The type of tenant (e.g., 'APLOS', 'PSD').
+        host_ip (str): The pinged host.
+        source (str): The source interface.
+        repeat (int): Number of probes.
+        timeout (int): Seconds to wait for each probe reply.
 
     Returns:
-        tuple: A tuple containing ping report, ping results, and ping outputs.
+        str: The ping command.
     """
+    command = f"ping {host_ip} source {source}"
+    if repeat != 5:
+        command += f" repeat {repeat}"
+    if timeout != 2:
+        command += f" timeout {timeout}"
+    return command
+
+def ping_host(net_connect, source, host_ip, send_kwargs, threshold=None):
+    """
+    Ping one host with PING_REPEAT probes, or with the fast-fail strategy when PING_MODE is 'fast'.
 
-    # Initialize the variables with default values
-    Lo0_ping_output = ""        
-    vlan200_ping_output = ""
-    vlan3000_ping_output = ""
-    vlan3100_ping_output = ""
-    
-    # Initialize a list to store the ping_outputs for each host
-    Lo0_ping_outputs = []
-    Lo0_ping_results = []
+    In fast mode the first round sends enough probes for the host to pass
+    (at least PING_FAST_PROBES), so a healthy host needs a single command.
+    Later rounds send only the probes that can still change the outcome, e.g.
+    with the default 80% of 5 probes a host answering 3 of the first 4 gets one
+    more probe, and a host losing 2 of them has already failed. The verdict is
+    the same as with all PING_REPEAT probes.
 
-    vlan200_ping_outputs = []
-    vlan200_ping_results = []
+    Args:
+        net_connect (object): A Netmiko connection object.
+        source (str): The source interface of the pings.
+        host_ip (str): The pinged host.
+        send_kwargs (dict): Extra keyword arguments for send_command (e.g., read_timeout).
+        threshold (int): Percent of answered probes for a successful ping, None for PING_SUCCESS_THRESHOLD.
 
-    vlan3000_ping_outputs = []
-    vlan3000_ping_results = []
+    Returns:
+        tuple: A tuple containing the ping commands with their outputs and the combined PingResult.
+    """
+    if PING_MODE != 'fast':
+        command = ping_command(host_ip, source, PING_REPEAT, PING_TIMEOUT)
+        output = net_connect.send_command(command, **send_kwargs)
+        return command + "\n" + output, parse_ping(output)
+
+    # answered probes needed out of PING_REPEAT for a successful ping
+    required = math.ceil((PING_SUCCESS_THRESHOLD if threshold is None else threshold) * PING_REPEAT / 100)
+    outputs = []
+    result = None
+    repeat = min(max(PING_FAST_PROBES, required), PING_REPEAT)
+    while repeat > 0:
+        command = ping_command(host_ip, source, repeat, PING_TIMEOUT)
+        read_timeout = max(send_kwargs.get("read_timeout", 10), repeat * PING_TIMEOUT + 5)
+        output = net_connect.send_command(command, **{**send_kwargs, "read_timeout": read_timeout})
+        outputs.append(command + "\n" + output)
+        round_result = parse_ping(output)
+        result = round_result if result is None else result.combine(round_result)
+        if round_result.sent == 0:
+            break   # no parsable answer, do not retry
+        # stop once the remaining probes cannot change the outcome, else send the probes still needed to pass
+        remaining = PING_REPEAT - result.sent
+        if result.received >= required or result.received + remaining < required:
+            break
+        repeat = min(required - result.received, remaining)
+    return "\n".join(outputs), result
+
+def ping_hosts(net_connect, source, hosts, send_kwargs, threshold=None):
+    """
+    Ping a set of hosts from one source interface.
 
-    vlan3100_ping_outputs = []
-    vlan3100_ping_results = []
-    
-    PING_REPORT = "OK"  # Assume all pings are successful initially
+    Args:
+        net_connect (object): A Netmiko connection object.
+        source (str): The source interface of the pings (e.g., 'Lo0', 'vlan200').
+        hosts (dict): Host name to IP address map.
+        send_kwargs (dict): Extra keyword arguments for send_command (e.g., read_timeout).
+        threshold (int): Percent of answered probes for a successful ping, None for PING_SUCCESS_THRESHOLD.
+
+    Returns:
+        tuple: A tuple containing ping results, ping outputs, ping report, and ping stats.
+    """
+    if threshold is None:
+        threshold = PING_SUCCESS_THRESHOLD
+    ping_results = []
+    ping_outputs = []
+    ping_stats = []
+    PING_REPORT = "OK"
 
-    print("\nLoopback0 - Data VLAN Hosts:")
-    # ping test from Lo0
     # each key in the hosts dictionary is assigned to the variable host_name and each value in the dictionary is assigned to the variable host_ip
-    for host_name, host_ip in data_vlan_hosts.items():
-        Lo0_ping = f"ping {host_ip} source Lo0"
-        Lo0_output = net_connect.send_command(Lo0_ping, read_timeout= 15)
-        Lo0_ping_output = Lo0_ping + "\n" + Lo0_output + "\n"
-        # Append the Lo0_ping_output to the list
-        Lo0_ping_outputs.append(Lo0_ping_output)
-        # Check if the ping was successful
-        if "Success rate is 100 percent" in Lo0_output or "Success rate is 80 percent" in Lo0_output:
-            cprint(f"Ping from Lo0 to {host_name} ({host_ip}): successful","green")
-            Lo0_ping_results.append(f"Ping from Lo0 to {host_name} ({host_ip}): successful")
+    for host_name, host_ip in hosts.items():
+        output, ping_result = ping_host(net_connect, source, host_ip, send_kwargs, threshold)
+        # Append the ping command and its output to the list
+        ping_outputs.append(output + "\n")
+        ping_stats.append({"source": source, "host_name": host_name, "host_ip": host_ip, **ping_result.to_dict()})
+        # Check if the ping was successful (at least 'threshold' percent success rate)
+        if ping_result.succeeded(threshold):
+            cprint(f"Ping from {source} to {host_name} ({host_ip}): successful","green")
+            ping_results.append(f"Ping from {source} to {host_name} ({host_ip}): successful")
         else:
-            cprint(f"Ping from Lo0 to {host_name} ({host_ip}): failed","red")
-            Lo0_ping_results.append(f"Ping from Lo0 to {host_name} ({host_ip}): failed")
+            cprint(f"Ping from {source} to {host_name} ({host_ip}): failed","red")
+            ping_results.append(f"Ping from {source} to {host_name} ({host_ip}): failed")
             PING_REPORT = "FAIL"
 
-    if 'vlan200' in interface_list:
-        print("\nVLAN200 - Voice VLAN Hosts:")
-        # ping test from vlan200 - voice vlan
-        for host_name, host_ip in voice_vlan_hosts.items():
-
-            vlan200_ping = f"ping {host_ip} source vlan200"
-            vlan200_output = net_connect.send_command(vlan200_ping)
-            vlan200_ping_output = vlan200_ping + "\n" + vlan200_output + "\n"
-            # Append the vlan200_ping_output to the list
-            vlan200_ping_outputs.append(vlan200_ping_output)
-            # Check if the ping was successful
-            if "Success rate is 100 percent" in vlan200_output or "Success rate is 80 percent" in vlan200_output:
-                cprint(f"Ping from vlan200 to {host_name} ({host_ip}): successful","green")
-                vlan200_ping_results.append(f"Ping from vlan200 to {host_name} ({host_ip}): successful")
-            else:
-                cprint(f"Ping from vlan200 to {host_name} ({host_ip}): failed","red")  
-                vlan200_ping_results.append(f"Ping from vlan200 to {host_name} ({host_ip}): failed")    
-                PING_REPORT = "FAIL"             
-        
-    elif 'vlan3100' in interface_list:
-        print("\nVLAN3100 - Voice VLAN Hosts:")
-        # ping test from vlan3100 - voice vlan
-        for host_name, host_ip in voice_vlan_hosts.items():
-
-            # perform only IPv6 vlan3100 pings for "APLOS" or "PSD" tenants
-            if tenant_type == "APLOS" or "PSD":
-                if "v6" in host_name:  # Checking if it's an IPv6 address
-                    vlan3100_ping_v6 = f"ping {host_ip} source vlan3100"
-                    vlan3100_output_v6 = net_connect.send_command(vlan3100_ping_v6)
-                    vlan3100_ping_output_v6 = vlan3100_ping_v6 + "\n" + vlan3100_output_v6 + "\n"
-                    # Append the vlan3100_ping_output_v6 to the list
-                    vlan3100_ping_outputs.append(vlan3100_ping_output_v6)
-                    # Check if the ping was successful
-                    if "Success rate is 100 percent" in vlan3100_output_v6 or "Success rate is 80 percent" in vlan3100_output_v6:
-                        cprint(f"Ping from vlan3100 to {host_name} ({host_ip}): successful","green")
-                        vlan3100_ping_results.append(f"Ping from vlan3100 to {host_name} ({host_ip}): successful")
-                    else:
-                        cprint(f"Ping from vlan3100 to {host_name} ({host_ip}): failed","red")
-                        vlan3100_ping_results.append(f"Ping from vlan3100 to {host_name} ({host_ip}): failed")
-                        PING_REPORT = "FAIL"
-                continue
+    return ping_results, ping_outputs, PING_REPORT, ping_stats
+
+# BGP route tables
+MORE_PROMPT = re.compile(r" ?--More-- ?")
+# IOS erases the '--More--' prompt with backspaces (e.g., '\b\b\b      \b\b\b'), often in the next read
+MORE_ERASE = re.compile(r"\x08(?:[\x08 ]*\x08)?")
 
-            vlan3100_ping = f"ping {host_ip} source vlan3100"
-            vlan3100_output = net_connect.send_command(vlan3100_ping, read_timeout= 15)
-            vlan3100_ping_output = vlan3100_ping + "\n" + vlan3100_output + "\n"
-            # Append the vlan3000_ping_output to the list
-            vlan3100_ping_outputs.append(vlan3100_ping_output)
-            # Check if the ping was successful
-            if "Success rate is 100 percent" in vlan3100_output or "Success rate is 80 percent" in vlan3100_output:
-                cprint(f"Ping from vlan3100 to {host_name} ({host_ip}): successful","green")
-                vlan3100_ping_results.append(f"Ping from vlan3100 to {host_name} ({host_ip}): successful")
+def collect_bgp_routes(net_connect, command, bgp_neighbor_output_, max_lines=None):
+    """
+    Capture the first lines of a BGP received/advertised routes table.
+
+    The table is read page by page from the channel. Once 'max_lines' lines
+    are captured, the rest of the table is dropped on the device by answering
+    the '--More--' prompt with 'q', so large tables are never transferred.
+
+    Args:
+        net_connect (object): A Netmiko connection object with the terminal length set to the page size.
+        command (str): The 'show ... received-routes/advertised-routes' command.
+        bgp_neighbor_output_ (list): The BGP output lines collected so far.
+        max_lines (int): Number of table lines to capture, 0 for the whole table, None for BGP_ROUTES_MAX_LINES.
+
+    Returns:
+        tuple: A tuple containing the captured output and its route table info
+        (lines captured, truncated, total prefixes when the whole table was read).
+    """
+    if max_lines is None:
+        max_lines = BGP_ROUTES_MAX_LINES
+    started = time.perf_counter()
+    prompt = net_connect.find_prompt()
+    net_connect.write_channel(command + net_connect.RETURN)
+
+    output = ""
+    truncated = False
+    deadline = time.monotonic() + BGP_ROUTES_READ_TIMEOUT
+    while not output.rstrip().endswith(prompt):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"'{command}' did not finish within {BGP_ROUTES_READ_TIMEOUT} seconds")
+        new_data = net_connect.read_channel()
+        if not new_data:
+            time.sleep(0.05)
+            continue
+        output += new_data.replace("\r\n", "\n").replace("\r", "")
+        if MORE_PROMPT.search(output):
+            output = MORE_PROMPT.sub("", output)
+            if max_lines and output.count("\n") > max_lines:
+                # enough lines captured, stop the output on the device
+                net_connect.write_channel("q")
+                truncated = True
             else:
-                cprint(f"Ping from vlan3100 to {host_name} ({host_ip}): failed","red")
-                vlan3100_ping_results.append(f"Ping from vlan3100 to {host_name} ({host_ip}): failed")
-                PING_REPORT = "FAIL"
-
-            
-        # Απλος Ασυμμετρος
-        if tenant_type == "APLOS":
-            print("\nVLAN3000 - Data VLAN Hosts:")
-            # ping test from vlan3000 - data vlan
-            for host_name, host_ip in data_vlan_hosts.items():
-        
-                vlan3000_ping = f"ping {host_ip} source vlan3000"
-                vlan3000_output = net_connect.send_command(vlan3000_ping, read_timeout= 15)
-                vlan3000_ping_output = vlan3000_ping + "\n" + vlan3000_output + "\n"
-                # Append the vlan3000_ping_output to the list
-                vlan3000_ping_outputs.append(vlan3000_ping_output)
-                # Check if the ping was successful
-                if "Success rate is 100 percent" in vlan3000_output or "Success rate is 80 percent" in vlan3000_output:
-                    cprint(f"Ping from vlan3000 to {host_name} ({host_ip}): successful","green")
-                    vlan3000_ping_results.append(f"Ping from vlan3000 to {host_name} ({host_ip}): successful")
-                else:
-                    cprint(f"Ping from vlan3000 to {host_name} ({host_ip}): failed","red")    
-                    vlan3000_ping_results.append(f"Ping from vlan3000 to {host_name} ({host_ip}): failed")
-                    PING_REPORT = "FAIL"
-
-    # split and return the ping_outputs and ping_results
-    return (
-        #[output.splitlines() for output in Lo0_ping_results],
-        PING_REPORT,
-        Lo0_ping_results,
-        Lo0_ping_outputs, 
-        vlan200_ping_results, 
-        vlan200_ping_outputs, 
-        vlan3000_ping_results, 
-        vlan3000_ping_outputs,
-        vlan3100_ping_results,
-        vlan3100_ping_outputs,
-    )
-                
+                net_connect.write_channel(" ")
+
+    # drop the pager erasure, the command echo and the trailing prompt
+    output = MORE_ERASE.sub("", output)
+    output_lines = output.rstrip()[:-len(prompt)].rstrip("\n").split("\n")[1:]
+    if max_lines and len(output_lines) > max_lines:
+        output_lines = output_lines[:max_lines]
+        truncated = True
+    captured = "\n".join(output_lines)
+    record_command(command, time.perf_counter() - started)
+
+    bgp_neighbor_output_.append(f'\n\n{command}\n')
+    bgp_neighbor_output_.extend(output_lines)
+    route_table = {
+        "lines_captured": len(output_lines),
+        "truncated": truncated,
+        "total_prefixes": None if truncated else parse_route_table_total(captured),
+    }
+    return captured, route_table
+
+def provider_bgp_neighbors(provider):
+    """
+    Return the pre-defined BGP neighbors of a provider for APLOS & PSD tenants.
+
+    Args:
+        provider (str): The network provider (e.g., 'OTE', 'WIND').
+
+    Returns:
+        tuple: A tuple containing the IPv4 and the IPv6 BGP neighbor.
+    """
+    # Convert the provider variable to uppercase because provider data from the GET API is in lower-case
+    neighbors = PROVIDER_BGP_NEIGHBORS.get(provider.upper())
+    if neighbors is None:
+        raise ValueError(f"Unknown provider {provider}")
+    return neighbors
+
 # BGP checks
-def asym_bgp_checks(device, provider, net_connect):
+def asym_bgp_checks(device, provider, net_connect, show_outputs=None, routes=True, max_lines=None):
     """
     Perform BGP checks for asymmetric tenants (APLOS, PSD).
 
@@ -294,39 +613,33 @@ def asym_bgp_checks(device, provider, net_connect):
         device (dict): A dictionary containing device connection details.
         provider (str): The network provider (e.g., 'OTE', 'WIND').
         net_connect (object): A Netmiko connection object.
+        show_outputs (dict): Optional map of already collected show command outputs.
+        routes (bool): Read the received and advertised route tables, not only the neighbor states.
+        max_lines (int): Route table lines captured per command (0 = whole table), None for BGP_ROUTES_MAX_LINES.
 
     Returns:
-        tuple: A tuple containing BGP results, BGP neighbor output, and BGP report.
+        tuple: A tuple containing BGP results, BGP neighbor output, BGP report, and BGP neighbor stats.
     """
     
     bgp_results = []
     bgp_neighbor_output_ = []
+    bgp_stats = []
     BGP_REPORT = "OK"   # Assume all BGP neighborships are UP
 
-    # Convert the provider variable to uppercase because provider data from the GET API is in lower-case
-    provider = provider.upper()
-
-    if provider == "OTE":
-        ipv4_neighbor = ote_bgp_neighbor
-        ipv6_neighbor = ote_bgp_neighbor # v6 over v4 neighbor
-    elif provider == "WIND":
-        ipv4_neighbor = wind_bgp_neighbor
-        ipv6_neighbor = wind_bgp_v6_neighbor
-    elif provider == "NOVA":
-        ipv4_neighbor = nova_bgp_neighbor
-        ipv6_neighbor = nova_bgp_v6_neighbor
-    elif provider == "VODAFONE":
-        ipv4_neighbor = vodafone_bgp_neighbor
-        ipv6_neighbor = vodafone_bgp_v6_neighbor
+    ipv4_neighbor, ipv6_neighbor = provider_bgp_neighbors(provider)
+    if max_lines is None:
+        max_lines = BGP_ROUTES_MAX_LINES
     
     print("\nBGP checks:")
 
     # check BGPv4 status
     v4_neighbor_command = f'show ip bgp neighbor {ipv4_neighbor}\n'
-    bgp_output = net_connect.send_command(v4_neighbor_command)
+    bgp_output = show_command(net_connect, v4_neighbor_command, show_outputs)
     bgp_neighbor_output_.append(bgp_output + "\n")
+    v4_neighbors = parse_bgp_neighbors(bgp_output, ipv4_neighbor)
+    bgp_stats.extend({"address_family": "ipv4", **record.to_dict()} for record in v4_neighbors)
     
-    if "Established" in bgp_output:
+    if any(record.established for record in v4_neighbors):
         cprint(f"BGP v4 neighbor {ipv4_neighbor} Established", "green")
         bgp_results.append(f"BGP v4 neighbor {ipv4_neighbor} Established")
     else:
@@ -335,63 +648,84 @@ def asym_bgp_checks(device, provider, net_connect):
     
     # check BGPv6 status 
     v6_neighbor_command = ('show bgp ipv6 unicast neighbors\n')
-    bgp_output = net_connect.send_command(v6_neighbor_command)
+    bgp_output = show_command(net_connect, v6_neighbor_command, show_outputs)
     bgp_neighbor_output_.append(bgp_output + "\n")
+    # the command lists every IPv6 neighbor, only the provider's decides the verdict
+    v6_neighbors = [record for record in parse_bgp_neighbors(bgp_output, ipv6_neighbor)
+                    if same_address(record.neighbor, ipv6_neighbor)]
+    bgp_stats.extend({"address_family": "ipv6", **record.to_dict()} for record in v6_neighbors)
     
-    if "Established" in bgp_output:
+    if any(record.established for record in v6_neighbors):
         cprint(f"BGP v6 neighbor {ipv6_neighbor} Established", "green")
         bgp_results.append(f"BGP v6 neighbor {ipv6_neighbor} Established")
+    elif any(record.found and record.state for record in v6_neighbors):
+        cprint(f"BGP v6 neighbor {ipv6_neighbor} {v6_neighbors[0].state}", "red")
+        BGP_REPORT = "FAIL"
     else:
         cprint(f"BGP v6 neighbor {ipv6_neighbor} not found", "red")
         BGP_REPORT = "FAIL"
 
-    # check BGP routes
-    with ConnectHandler(**device) as net_connect:
-        command1 = f'\n\nshow ip bgp neighbors {ipv4_neighbor} received-routes\n'
-        out1 = net_connect.send_command(command1, expect_string=r'\*>')
-        if ipv4_neighbor not in out1:
-            cprint(f"Error: ipv4 BGP neighbor {ipv4_neighbor} not found","red")
-            bgp_results.append(f"BGP neighbor {ipv4_neighbor} not found")
-            BGP_REPORT = "FAIL"
-        output1_list = out1.split('\n')
-        bgp_neighbor_output_.append(command1)
-        for line in output1_list:
-            bgp_neighbor_output_.append(line)
-            if line.startswith('*>') and output1_list.index(line) >= 50:
-                break
-    with ConnectHandler(**device) as net_connect:
-        command2 = f'\n\nshow ip bgp neighbors {ipv4_neighbor} advertised-routes\n'
-        out2 = net_connect.send_command(command2, expect_string=r'\*>')
-        output2_list = out2.split('\n')
-        bgp_neighbor_output_.append(command2)
-        for line in output2_list:
-            bgp_neighbor_output_.append(line)
-            if line.startswith('*>') and output2_list.index(line) >= 50:
-                break
-    with ConnectHandler(**device) as net_connect:
-        command3 = f'\n\nshow bgp ipv6 unicast neighbors {ipv6_neighbor} received-routes\n'             
-        out3 = net_connect.send_command(command3, expect_string=r'\*>')
-        output3_list = out3.split('\n')
-        bgp_neighbor_output_.append(command3)
-        for line in output3_list:
-            bgp_neighbor_output_.append(line)
-            if line.startswith('*>') and output3_list.index(line) >= 50:
-                break
-    with ConnectHandler(**device) as net_connect:
-        command4 = f'\n\nshow bgp ipv6 unicast neighbors {ipv6_neighbor} advertised-routes\n'
-        out4 = net_connect.send_command(command4, expect_string=r'\*>')
-        output4_list = out4.split('\n')
-        bgp_neighbor_output_.append(command4)
-        for line in output4_list:
-            bgp_neighbor_output_.append(line)
-            if line.startswith('*>') and output4_list.index(line) >= 50:
-                break
+    # check BGP routes (not in quick checks)
+    # All four route tables are read over the session the other checks use. The terminal
+    # length is set to the capture limit so the device pauses at '--More--' and the rest
+    # of a large table can be dropped; paging is disabled again afterwards.
+    route_tables = {}
+    if routes:
+        if max_lines:
+            net_connect.send_command(f"terminal length {min(max_lines + 1, 512)}")
+        else:
+            net_connect.disable_paging()
+        try:
+            command1 = f'show ip bgp neighbors {ipv4_neighbor} received-routes'
+            out1, route_tables[("ipv4", ipv4_neighbor, "received_routes")] = collect_bgp_routes(net_connect, command1, bgp_neighbor_output_, max_lines)
+            if ipv4_neighbor not in out1:
+                cprint(f"Error: ipv4 BGP neighbor {ipv4_neighbor} not found","red")
+                bgp_results.append(f"BGP neighbor {ipv4_neighbor} not found")
+                BGP_REPORT = "FAIL"
+
+            command2 = f'show ip bgp neighbors {ipv4_neighbor} advertised-routes'
+            _, route_tables[("ipv4", ipv4_neighbor, "advertised_routes")] = collect_bgp_routes(net_connect, command2, bgp_neighbor_output_, max_lines)
+
+            command3 = f'show bgp ipv6 unicast neighbors {ipv6_neighbor} received-routes'
+            _, route_tables[("ipv6", ipv6_neighbor, "received_routes")] = collect_bgp_routes(net_connect, command3, bgp_neighbor_output_, max_lines)
+
+            command4 = f'show bgp ipv6 unicast neighbors {ipv6_neighbor} advertised-routes'
+            _, route_tables[("ipv6", ipv6_neighbor, "advertised_routes")] = collect_bgp_routes(net_connect, command4, bgp_neighbor_output_, max_lines)
+        finally:
+            if max_lines:
+                net_connect.disable_paging()
+
+    # Attach the route table info to the neighbor stats. When a table was cut at the
+    # capture limit, its prefix count comes from the neighbor's prefix summary instead.
+    for (address_family, neighbor, table), route_table in route_tables.items():
+        record = next((record for record in bgp_stats if record["address_family"] == address_family
+                       and same_address(record["neighbor"], neighbor)), None)
+        if record is None:
+            record = {"address_family": address_family, "neighbor": neighbor}
+            bgp_stats.append(record)
+        if route_table["total_prefixes"] is None:
+            route_table["total_prefixes"] = record.get("prefixes_received" if table == "received_routes" else "prefixes_sent")
+        record[table] = route_table
+
     bgp_neighbor_output = '\n'.join(bgp_neighbor_output_)
 
-    return bgp_results, bgp_neighbor_output, BGP_REPORT
+    return bgp_results, bgp_neighbor_output, BGP_REPORT, bgp_stats
+
+def split_bgp_neighbors(bgp_neighbor):
+    """
+    Split the comma-separated BGP neighbors of an MMM request into a list.
+
+    Args:
+        bgp_neighbor (str): Comma-separated list of BGP neighbors.
+
+    Returns:
+        list: The BGP neighbor IP addresses without whitespace.
+    """
+    # split into individual addresses and remove any whitespace characters
+    return [n.strip() for n in bgp_neighbor.split(',')]
 
 # MMM Checks
-def mmm_bgp_checks(device, bgp_neighbor, net_connect):
+def mmm_bgp_checks(device, bgp_neighbor, net_connect, show_outputs=None):
     """
     Perform BGP checks for MMM tenants.
 
@@ -399,9 +733,10 @@ def mmm_bgp_checks(device, bgp_neighbor, net_connect):
         device (dict): A dictionary containing device connection details.
         bgp_neighbor (str): Comma-separated list of BGP neighbors.
         net_connect (object): A Netmiko connection object.
+        show_outputs (dict): Optional map of already collected show command outputs.
 
     Returns:
-        tuple: A tuple containing BGP results, BGP neighbor output, and BGP report.
+        tuple: A tuple containing BGP results, BGP neighbor output, BGP report, and BGP neighbor stats.
     """
     print("\nBGP checks:")
     print(f"BGP neighbor(s): {bgp_neighbor}")  
@@ -409,105 +744,102 @@ def mmm_bgp_checks(device, bgp_neighbor, net_connect):
     #with ConnectHandler(**device) as net_connect:
     bgp_results = []
     bgp_neighbor_output = []
+    bgp_stats = []
     BGP_REPORT = "OK"   # Assume all BGP neighborships are UP
 
-    # split into individual addresses
-    bgp_neighbors = bgp_neighbor.split(',')
+    bgp_neighbors = split_bgp_neighbors(bgp_neighbor)
     cprint(f"List of BGP neighbor IP addresses: {bgp_neighbors}", "yellow")
-    # remove any whitespace characters
-    bgp_neighbors = [n.strip() for n in bgp_neighbors]
     #bgp_neighbors = bgp_neighbors.replace(" ", "").split(",")
     
     for neighbor in bgp_neighbors:
         command = f'show ip bgp neighbor {neighbor}\n'
         cprint(command, "green")
-        bgp_output = net_connect.send_command(command)
+        bgp_output = show_command(net_connect, command, show_outputs)
         bgp_neighbor_output.append(bgp_output + "\n")
         
         # Check the status of the neighbors
-        if "No such neighbor" in bgp_output:
-            cprint(f"BGP neighbor {neighbor} not found", "red")
-            bgp_results.append(f"BGP neighbor {neighbor} not found")
-            BGP_REPORT = "FAIL"
-        else:
-            for line in bgp_output.split("\n"):
-                if "BGP state" in line:
-                    if "Idle" in line:
-                        cprint(f"BGP neighbor {neighbor} is Idle", "red")
-                        bgp_results.append(f"BGP neighbor {neighbor} is Idle")
-                        BGP_REPORT = "FAIL"
-                    elif "Established" in line:
-                        cprint(f"BGP neighbor {neighbor} is Established", "green")
-                        bgp_results.append(f"BGP neighbor {neighbor} is Established")
-                    else:
-                        cprint(line.strip())
-                        BGP_REPORT = "FAIL"
+        for record in parse_bgp_neighbors(bgp_output, neighbor):
+            bgp_stats.append({"address_family": "ipv4", **record.to_dict()})
+            if not record.found:
+                cprint(f"BGP neighbor {neighbor} not found", "red")
+                bgp_results.append(f"BGP neighbor {neighbor} not found")
+                BGP_REPORT = "FAIL"
+            elif record.state == "Idle":
+                cprint(f"BGP neighbor {neighbor} is Idle", "red")
+                bgp_results.append(f"BGP neighbor {neighbor} is Idle")
+                BGP_REPORT = "FAIL"
+            elif record.established:
+                cprint(f"BGP neighbor {neighbor} is Established", "green")
+                bgp_results.append(f"BGP neighbor {neighbor} is Established")
+            elif record.state:
+                cprint(f"BGP state = {record.state}")
+                BGP_REPORT = "FAIL"
         
         # clear the output buffer to avoid caching/buffering issues
         net_connect.clear_buffer()
     cprint("Completed BGP checks", "green")
 
-    return bgp_results, '\n'.join(bgp_neighbor_output), BGP_REPORT
+    return bgp_results, '\n'.join(bgp_neighbor_output), BGP_REPORT, bgp_stats
 
 def device_login(device_ip):   
     """
-    Establish a Netmiko SSH connection to the device.
+    Establish a Netmiko SSH connection to the device, reusing a pooled session when one is open.
+
+    Failed connections are counted by the circuit breaker of the device (a
+    device at its session limit is not a failed connection).
 
     Args:
         device_ip (str): The IP address of the device.
 
     Returns:
-        tuple: A tuple containing Netmiko connection object, hostname, and device details.
+        tuple: A tuple containing Netmiko connection object, hostname, and device details, or None if the login failed.
     """
 
     device = {
         "device_type": "cisco_ios",
         "ip": device_ip,
         "username": username,
-        "password": password
+        "password": password,
+        "port": SSH_PORT,
+        "keepalive": SSH_KEEPALIVE
     }
     # Connect to the device using Netmiko
     try:
-        net_connect = ConnectHandler(**device)
+        net_connect = connection_pool.acquire(device)
         hostname = net_connect.find_prompt()[:-1] 
+        circuit_breaker.record_success(device_ip)
         print('######################################################################################')
         cprint(f"Successfully connected to {device_ip}", 'green')
         return net_connect, hostname, device      
     
+    except PoolExhaustedError as e:
+        cprint(f"Failed to connect to {device_ip}", 'red')
+        cprint(str(e), 'red')
+        return
     except Exception as e:
+        circuit_breaker.record_failure(device_ip, e)
         cprint(f"Failed to connect to {device_ip}", 'red')
         cprint(str(e), 'red')
         return
 
-def main(tenant_type, device, hostname, net_connect, provider, bgp_neighbor):
-    """
-    Main function to execute health checks on the network device.
-
-    Args:
-        tenant_type (str): The type of tenant (e.g., 'APLOS', 'PSD').
-        device (dict): A dictionary containing device connection details.
-        hostname (str): The hostname of the network device.
-        net_connect (object): A Netmiko connection object.
-        provider (str): The network provider (e.g., 'OTE', 'WIND').
-        bgp_neighbor (str): Comma-separated list of BGP neighbors.
-
-    Returns:
-        dict: A dictionary containing the results of health checks.
-    """
+# Check steps of the compiled check plans, each called with (context, session)
+def step_show_commands(context, net_connect):
+    # Collect the show commands of all checks in a single pass, skipping the cached ones
+    show_outputs = context["show_outputs"]
+    planned_commands = plan_show_commands(context["plan"], context["provider"], context["bgp_neighbor"], context["profile"])
+    show_outputs.update(run_show_commands(net_connect, [command for command in planned_commands if command not in show_outputs]))
+    device_cache.put_outputs(context["device"]['ip'], show_outputs)
 
+def step_version_license(context, net_connect):
+    show_outputs = context["show_outputs"]
     LICENSE_REPORT = "OK" 
     license_status = ""  # Initialize the license_status variable
 
-    cprint(f"CPE Router hostname is: {hostname}", 'green')
-    cprint(f"Tenant type is: {tenant_type}\n", 'green')
-
     # Extract S/N & image
-    output = net_connect.send_command("show version")
-    serial_number_match = re.search(r"Processor board ID\s+(\S+)", output)
-    system_image_match = re.search(r"System image file is \"bootflash:(\S+)\"", output)
-    if serial_number_match and system_image_match:
-        serial_number = serial_number_match.group(1)
-        system_image = system_image_match.group(1)
+    version_info = parse_version(show_outputs.get("show version", ""))
+    serial_number = version_info.serial_number
+    system_image = version_info.system_image
+    if serial_number and system_image:
         print("\nSerial number: ", end='')
         cprint(serial_number, 'yellow')
         print("System image: ", end='')
@@ -517,15 +849,16 @@ def main(tenant_type, device, hostname, net_connect, provider, bgp_neighbor):
 
     # Extract license status
     license_command = 'show license status'
-    license_output = net_connect.send_command("show license status")
+    license_output = show_outputs.get(license_command, "")
 
-    if "Trust Code Installed: <none>" in license_output:
+    license_info = parse_license_status(license_output)
+
+    if license_info.trust_code_installed is False:
         cprint("Error: Trust Code not installed", "red")
         LICENSE_REPORT = "FAIL"
     else:
-        match = re.search(r"Trust Code Installed:\s+(\S+ \S+ \S+ \S+ \S+)", license_output)
-        if match:
-            trust_code = match.group(1)
+        if license_info.trust_code:
+            trust_code = license_info.trust_code
             print("License: ", end='')
             cprint(f"Trust Code Installed: {trust_code}", "green") 
             license_status = (f"Trust Code Installed: {trust_code}")   
@@ -533,55 +866,232 @@ def main(tenant_type, device, hostname, net_connect, provider, bgp_neighbor):
             cprint("Error: Failed to extract Trust Code", "red")
             license_status = "Failed to extract Trust Code"
 
-    # Call below functions
-    # capture the interface_list return value of def_int_checks and pass it as an argument to def_ping_checks.
-    interface_list, interface_results, interface_outputs, INTERFACE_REPORT = def_int_checks(tenant_type, device, net_connect)
-    PING_REPORT, Lo0_ping_results, Lo0_ping_outputs, vlan200_ping_results, vlan200_ping_outputs, vlan3000_ping_results, vlan3000_ping_outputs, vlan3100_ping_results, vlan3100_ping_outputs  = def_ping_checks(device, net_connect, interface_list, tenant_type)
-    if tenant_type == "MMM":
-        bgp_results, bgp_neighbor_output, BGP_REPORT = mmm_bgp_checks(device, bgp_neighbor, net_connect)
-    else:
-        bgp_results, bgp_neighbor_output, BGP_REPORT = asym_bgp_checks(device, provider, net_connect)
+    context["version_license"] = {
+        "serial_number": serial_number,
+        "system_image": system_image,
+        "LICENSE_REPORT": LICENSE_REPORT,
+        "license_results": license_status,
+        "license_output": license_command + "\n" + license_output
+    }
+    context["version_info"], context["license_info"] = version_info, license_info
+    context["emit"]("version_license", context["version_license"])
+
+def step_interfaces(context, net_connect):
+    interface_list, interface_results, interface_outputs, INTERFACE_REPORT, interface_stats = def_int_checks(context["plan"], context["device"], net_connect, context["show_outputs"])
+    # the ping sets of the plan which require an interface look it up in interface_list
+    context["interface_list"] = interface_list
+    context["interfaces"] = {
+        "INTERFACE_REPORT": INTERFACE_REPORT,
+        "interface_results": "\n".join(interface_results),
+        "interface_outputs": "\n".join(interface_outputs),
+        "interface_stats": interface_stats
+    }
+    context["emit"]("interfaces", context["interfaces"])
+
+def step_ping_set(ping_set, context, net_connect):
+    hosts = data_vlan_hosts if ping_set.hosts == "data" else voice_vlan_hosts
+    if ping_set.ipv6_only:
+        hosts = {host_name: host_ip for host_name, host_ip in hosts.items() if "v6" in host_name}
+    if context["profile"].ping_hosts:
+        hosts = dict(list(hosts.items())[:context["profile"].ping_hosts])
+    send_kwargs = {"read_timeout": ping_set.read_timeout} if ping_set.read_timeout else {}
+
+    print(f"\n{ping_set.title}:")
+    results, outputs, report, stats = ping_hosts(net_connect, ping_set.source, hosts, send_kwargs, context["plan"].ping_success_threshold)
+    context["pings"][ping_set.source] = (results, outputs, report, stats)
+    context["emit"](f"{ping_set.source}_ping", {
+        "report": report,
+        f"{ping_set.source}_ping_results": "\n".join(results),
+        f"{ping_set.source}_ping_outputs": "\n".join(outputs),
+        "ping_stats": stats
+    })
+
+def _emit_bgp(context, bgp_results, bgp_neighbor_output, BGP_REPORT, bgp_stats):
+    context["bgp"] = {
+        "BGP_REPORT": BGP_REPORT,
+        "bgp_results": "\n".join(bgp_results),
+        "bgp_neighbor_output": bgp_neighbor_output,
+        "bgp_stats": bgp_stats
+    }
+    context["emit"]("bgp", context["bgp"])
+
+def step_provider_bgp(context, net_connect):
+    profile = context["profile"]
+    _emit_bgp(context, *asym_bgp_checks(context["device"], context["provider"], net_connect, context["show_outputs"],
+                                        profile.bgp_routes, profile.bgp_routes_max_lines))
+
+def step_request_bgp(context, net_connect):
+    _emit_bgp(context, *mmm_bgp_checks(context["device"], context["bgp_neighbor"], net_connect, context["show_outputs"]))
+
+def compile_check_plan(plan, profile=CHECK_PROFILES["standard"]):
+    """
+    Compile a check plan into the step graph run by main().
+
+    The show commands of all checks are read first; the version/license,
+    interface and BGP checks only need their outputs. The ping sets depend
+    on nothing, except the ones requiring an interface, which wait for the
+    interface checks and are skipped when the interface is missing. The
+    checks the profile leaves out get no step.
+
+    Args:
+        plan (CheckPlan): The check plan of a tenant type.
+        profile (CheckProfile): The check profile.
+
+    Returns:
+        tuple: The ordered steps of the graph.
+    """
+    steps = [Step("show_commands", step_show_commands, stage="show_commands")]
+    if profile.version_license:
+        steps.append(Step("version_license", step_version_license, after=("show_commands",), session=False))
+    steps.append(Step("interfaces", step_interfaces, after=("show_commands",), stage="interfaces"))
+    for ping_set in plan.ping_sets[:profile.ping_sets]:
+        when = (lambda context, interface=ping_set.requires: interface in context["interface_list"]) if ping_set.requires else None
+        steps.append(Step(f"ping_{ping_set.source}", partial(step_ping_set, ping_set), stage="ping",
+                          after=("interfaces",) if ping_set.requires else (), when=when))
+    steps.append(Step("bgp", step_request_bgp if plan.bgp == "request" else step_provider_bgp, after=("show_commands",), stage="bgp"))
+    return compile_graph(steps)
+
+# Check plans of the tenant types, compiled once per check profile at startup
+tenant_plans = load_plans(CHECK_PLANS)
+compiled_plans = {(tenant_type, profile_name): compile_check_plan(plan, profile)
+                  for tenant_type, plan in tenant_plans.items() for profile_name, profile in CHECK_PROFILES.items()}
+
+# The four ping sets always present in the response, empty when a tenant type does not ping from them
+RESPONSE_PING_SOURCES = ("Lo0", "vlan200", "vlan3000", "vlan3100")
+# Response fields of the version/license check, left out when the check profile skips it
+VERSION_LICENSE_FIELDS = ("serial_number", "system_image", "LICENSE_REPORT", "license_results", "license_output",
+                          "version_info", "license_info")
+
+def main(tenant_type, device, hostname, net_connect, provider, bgp_neighbor, on_section=None, cached_outputs=None, profile=None):
+    """
+    Main function to execute health checks on the network device.
+
+    The checks are the check plan of the tenant type, compiled for the check
+    profile. With CHECK_CONCURRENCY above 1, independent steps (e.g., the
+    ping sets and the BGP checks) run in parallel over up to
+    CHECK_CONCURRENCY SSH sessions. The fields of the checks a profile
+    leaves out (e.g., the license check of a quick check) are not returned.
+
+    When 'on_section' is given, it is called with (section name, section data)
+    as soon as each check completes, so the results can be streamed.
+
+    Args:
+        tenant_type (str): The type of tenant (e.g., 'APLOS', 'PSD').
+        device (dict): A dictionary containing device connection details.
+        hostname (str): The hostname of the network device.
+        net_connect (object): A Netmiko connection object.
+        provider (str): The network provider (e.g., 'OTE', 'WIND').
+        bgp_neighbor (str): Comma-separated list of BGP neighbors.
+        on_section (callable): Optional callback receiving each completed section.
+        cached_outputs (dict): Optional show command outputs served from the device cache.
+        profile (str): The check profile (e.g., 'quick', 'standard', 'full'), None for CHECK_PROFILE.
+
+    Returns:
+        dict: A dictionary containing the results of health checks.
+    """
+    def emit(section, data):
+        if on_section:
+            on_section(section, data)
+
+    plan = tenant_plans[tenant_type]
+    check_profile = CHECK_PROFILES[profile or CHECK_PROFILE]
+    cprint(f"CPE Router hostname is: {hostname}", 'green')
+    cprint(f"Tenant type is: {tenant_type}\n", 'green')
+
+    context = {
+        "plan": plan,
+        "profile": check_profile,
+        "device": device,
+        "provider": provider,
+        "bgp_neighbor": bgp_neighbor,
+        "show_outputs": dict(cached_outputs or {}),
+        "interface_list": [],
+        "pings": {},
+        "emit": emit,
+    }
+    # Extra sessions for the parallel steps come from the connection pool
+    sessions = SessionSet(net_connect, lambda: connection_pool.acquire(device, block=False), CHECK_CONCURRENCY)
+    try:
+        run_graph(compiled_plans[tenant_type, check_profile.name], context, sessions, CHECK_CONCURRENCY, timed_stage)
+    finally:
+        for session in sessions.extra_sessions:
+            connection_pool.release(session)
+
+    version_license = context.get("version_license", {})
+    interfaces = context["interfaces"]
+    bgp = context["bgp"]
+
+    # Merge the ping sets in the order of the plan
+    pings = context["pings"]
+    PING_REPORT = "FAIL" if any(report == "FAIL" for _, _, report, _ in pings.values()) else "OK"
+    ping_sources = list(dict.fromkeys(RESPONSE_PING_SOURCES + tuple(ping_set.source for ping_set in plan.ping_sets)))
+    ping_results = {f"{source}_ping_results": "\n".join(pings.get(source, ([], [], None, []))[0]) for source in ping_sources}
+    ping_outputs = {f"{source}_ping_outputs": "\n".join(pings.get(source, ([], [], None, []))[1]) for source in ping_sources}
+    ping_stats = [stat for ping_set in plan.ping_sets if ping_set.source in pings for stat in pings[ping_set.source][3]]
 
     json_return_output = {
         "tenant_type": tenant_type,
         "provider": provider,        
-        "serial_number": serial_number,
-        "system_image": system_image,
+        "profile": check_profile.name,
+        "serial_number": version_license.get("serial_number"),
+        "system_image": version_license.get("system_image"),
         "bgp_neighbor": bgp_neighbor,
         "PING_REPORT": PING_REPORT,
-        "INTERFACE_REPORT": INTERFACE_REPORT,
-        "LICENSE_REPORT": LICENSE_REPORT,
-        "BGP_REPORT": BGP_REPORT,
+        "INTERFACE_REPORT": interfaces["INTERFACE_REPORT"],
+        "LICENSE_REPORT": version_license.get("LICENSE_REPORT"),
+        "BGP_REPORT": bgp["BGP_REPORT"],
 
-        "interface_results": "\n".join(interface_results),
-        "interface_outputs": "\n".join(interface_outputs),
+        "interface_results": interfaces["interface_results"],
+        "interface_outputs": interfaces["interface_outputs"],
 
-        "license_results": license_status,
-        "license_output": license_command + "\n" + license_output,
+        "license_results": version_license.get("license_results"),
+        "license_output": version_license.get("license_output"),
 
         # Convert array to separate lines
-        "Lo0_ping_results": "\n".join(Lo0_ping_results),  
-        "vlan200_ping_results": "\n".join(vlan200_ping_results),
-        "vlan3000_ping_results": "\n".join(vlan3000_ping_results),
-        "vlan3100_ping_results":"\n".join(vlan3100_ping_results),
-
-        "Lo0_ping_outputs": "\n".join(Lo0_ping_outputs),
-        "vlan200_ping_outputs":"\n".join(vlan200_ping_outputs),
-        "vlan3000_ping_outputs": "\n".join(vlan3000_ping_outputs),
-        "vlan3100_ping_outputs":"\n".join(vlan3100_ping_outputs),
-
-        "bgp_results": "\n".join(bgp_results),
-        "bgp_neighbor_output": bgp_neighbor_output
+        **ping_results,
+        **ping_outputs,
+
+        "bgp_results": bgp["bgp_results"],
+        "bgp_neighbor_output": bgp["bgp_neighbor_output"],
+
+        # Parsed records of the command outputs
+        "version_info": context["version_info"].to_dict() if "version_info" in context else None,
+        "license_info": context["license_info"].to_dict() if "license_info" in context else None,
+        "interface_stats": interfaces["interface_stats"],
+        "ping_stats": ping_stats,
+        "bgp_stats": bgp["bgp_stats"]
     }
+    if not check_profile.version_license:
+        for key in VERSION_LICENSE_FIELDS:
+            del json_return_output[key]
     return json_return_output
 
 
-@app.route('/wanchecks/', methods=['POST'])
-def run_health_checks():
+@api.before_app_request
+def set_request_id():
+    """
+    Tag the log lines of the request with its id (the 'X-Request-ID' header, or a new one).
+    """
+    request_id_var.set(request.headers.get('X-Request-ID') or uuid.uuid4().hex[:12])
+    device_ip_var.set(None)
 
-   # -----------------------------------------------------------------
-    # API Token 
-    #
+
+@api.after_app_request
+def add_request_id_header(response):
+    """
+    Return the request id, so a response can be matched to its log lines.
+    """
+    response.headers['X-Request-ID'] = request_id_var.get()
+    return response
+
+
+def check_authorization():
+    """
+    Validate the 'Authorization' header of the current request.
+
+    Returns:
+        tuple: A (response, status code) tuple when the request is not authorized, otherwise None.
+    """
     # Check if the 'Authorization' header is present in the request
     if 'Authorization' not in request.headers:
         return jsonify({"error": "Authorization header missing"}), 401
@@ -589,9 +1099,439 @@ def run_health_checks():
     # Get the token from the 'Authorization' header
     provided_token = request.headers.get('Authorization')
 
-    # Check if the provided token matches the expected token
-    if provided_token != AUTH_TOKEN:
+    # Check if the provided token matches the expected token ('Bearer <token>' is accepted for scrapers)
+    if provided_token != AUTH_TOKEN and provided_token != f"Bearer {AUTH_TOKEN}":
         return jsonify({"error": "Invalid authorization token"}), 401
+
+    return None
+
+def response_options(post_data=None):
+    """
+    Read the 'include' and 'compact' response options of the current request.
+
+    The options are taken from the JSON body, or from the query string
+    (e.g., '?include=show_run,stats&compact=1') when the body does not set them.
+
+    Args:
+        post_data (dict): The JSON body of the request, if any.
+
+    Returns:
+        tuple: A tuple containing the selected sections (None for all) and whether to send compact JSON.
+
+    Raises:
+        ValueError: If 'include' names unknown sections.
+    """
+    post_data = post_data if isinstance(post_data, dict) else {}
+    include = parse_include(post_data.get('include', request.args.get('include')))
+    compact = post_data.get('compact', request.args.get('compact'))
+    if compact is None:
+        compact = RESPONSE_COMPACT
+    elif isinstance(compact, str):
+        compact = compact.lower() in ('1', 'true', 'yes')
+    return include, bool(compact)
+
+def json_response(data, status_code=200, compact=False):
+    """
+    Build a JSON response, compressed with brotli or gzip when the client accepts it.
+
+    Args:
+        data (object): The response data.
+        status_code (int): The HTTP status code.
+        compact (bool): Send compact JSON instead of the pretty-printed form.
+
+    Returns:
+        tuple: The response body, the status code and the headers.
+    """
+    body = dump_json(data, compact).encode('utf-8')
+    headers = {'Content-Type': 'application/json', 'Vary': 'Accept-Encoding'}
+    # brotli is preferred over gzip when the client accepts both equally
+    encoding = request.accept_encodings.best_match(ENCODINGS) if len(body) >= RESPONSE_COMPRESSION_MIN_BYTES else None
+    if encoding:
+        body = compress(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return body, status_code, headers
+
+def record_history(device_ip, status, hostname=None, tenant_type=None, provider=None, result=None, show_run=None, profile=None):
+    """
+    Store a finished check in the history store, if enabled.
+
+    A failing store is reported in the log and never fails the check itself.
+    See HistoryStore.record() for the arguments.
+    """
+    if history_store is None:
+        return
+    try:
+        history_store.record(device_ip, status, hostname, tenant_type, provider, result, show_run, profile)
+    except sqlite3.Error as e:
+        cprint(f"Failed to store the check of {device_ip} in the history: {e}", 'red')
+
+def run_device_checks(device_ip, tenant_type, provider, bgp_neighbor, on_section=None, force_refresh=False, profile=None):
+    """
+    Connect to a device, run the health checks of a check profile on it and close the SSH connection.
+
+    At most DEVICE_MAX_CHECKS checks run on the same device at the same time,
+    the others wait up to DEVICE_QUEUE_TIMEOUT seconds for their turn.
+
+    'show run', 'show version' and 'show license status' are served from the
+    device cache while their TTL has not expired and the running-config
+    last-change timestamp is unchanged, unless 'force_refresh' is set or the
+    profile reads everything from the device. A profile without 'show run'
+    (e.g., 'quick') neither reads the running-config nor uses the cache.
+
+    A device whose circuit is open after repeated connection failures is not
+    contacted: the check fails right away with status 503, 'error'
+    'circuit_open' and the seconds until the next attempt ('retry_after').
+
+    An unknown tenant type, check profile or provider (of a plan checking the
+    provider's BGP neighbors) is rejected with status 400 before connecting.
+
+    Args:
+        device_ip (str): The login IP address of the device.
+        tenant_type (str): The type of tenant (e.g., 'APLOS', 'PSD').
+        provider (str): The network provider (e.g., 'OTE', 'WIND').
+        bgp_neighbor (str): Comma-separated list of BGP neighbors.
+        on_section (callable): Optional callback receiving each completed section (see main()).
+        force_refresh (bool): Ignore the cached outputs and read everything from the device.
+        profile (str): The check profile (e.g., 'quick', 'standard', 'full'), None for CHECK_PROFILE.
+
+    Returns:
+        tuple: A tuple containing the response data dictionary and the HTTP status code.
+    """
+    # Tag the log lines of this check with the device IP
+    device_ip_var.set(device_ip)
+    if tenant_type not in tenant_plans:
+        return {"response": f"Unknown tenant type {tenant_type}, expected one of {', '.join(tenant_plans)}"}, 400
+    profile = profile or CHECK_PROFILE
+    if profile not in CHECK_PROFILES:
+        return {"response": f"Unknown check profile {profile}, expected one of {', '.join(CHECK_PROFILES)}"}, 400
+    if tenant_plans[tenant_type].bgp == "provider" and provider.upper() not in PROVIDER_BGP_NEIGHBORS:
+        return {"response": f"Unknown provider {provider}, expected one of {', '.join(PROVIDER_BGP_NEIGHBORS)}"}, 400
+    check_profile = CHECK_PROFILES[profile]
+    # Time the stages and commands of this check
+    timings = CheckTimings(tenant_type=tenant_type, provider=provider)
+    current_timings.set(timings)
+
+    # Do not queue for a device that is known to be unreachable
+    retry_after = circuit_breaker.allow(device_ip, trial=False)
+    if retry_after is not None:
+        return circuit_open_response(device_ip, tenant_type, provider, retry_after)
+
+    # Wait in line while the device already runs DEVICE_MAX_CHECKS checks
+    with timed_stage("device_queue"):
+        acquired = device_limiter.acquire(device_ip)
+    if not acquired:
+        CHECKS.inc(tenant_type=tenant_type, provider=provider, status="device_busy")
+        return {"response": f"{device_ip} is busy with other checks, try again later"}, 503
+
+    try:
+        # the checks ahead in line may have opened the circuit; after the cooldown this check is the trial
+        retry_after = circuit_breaker.allow(device_ip)
+        if retry_after is not None:
+            return circuit_open_response(device_ip, tenant_type, provider, retry_after)
+
+        # Connect to the device
+        with timed_stage("login"):
+            login = device_login(device_ip)
+        if login is None:
+            CHECKS.inc(tenant_type=tenant_type, provider=provider, status="login_failed")
+            record_history(device_ip, "login_failed", tenant_type=tenant_type, provider=provider, profile=profile)
+            provider_stats.record(device_ip, provider, "login_failed")
+            return {"response": f"Failed to connect to {device_ip}", "error": "login_failed"}, 400
+        net_connect, hostname, device = login
+        if on_section:
+            on_section("device", {"hostname": hostname, "device_ip": device_ip})
+
+        try:
+            cached_outputs = {}
+            show_run_output = None
+            if force_refresh or (check_profile.show_run and not check_profile.use_cache):
+                device_cache.invalidate(device_ip)
+            elif check_profile.use_cache and device_cache.has_entries(device_ip):
+                # a configuration change invalidates the cached outputs of the device
+                config_stamp = parse_config_change(net_connect.send_command(CONFIG_CHANGE_COMMAND))
+                device_cache.check_config_change(device_ip, config_stamp)
+                cached_outputs = device_cache.get_outputs(device_ip, CACHED_COMMANDS)
+
+            # Execute show run command
+            if check_profile.show_run:
+                show_run_output = cached_outputs.get("show run")
+                if show_run_output is None:
+                    with timed_stage("show_run"):
+                        show_run_output = net_connect.send_command("show run")
+                    device_cache.set_config_stamp(device_ip, parse_config_change(show_run_output))
+                    device_cache.put_outputs(device_ip, {"show run": show_run_output})
+                if on_section:
+                    on_section("show_run", {"show_run_output": show_run_output})
+
+            json_return_output = main(tenant_type, device, hostname, net_connect, provider, bgp_neighbor, on_section, cached_outputs, profile)
+        except Exception:
+            # The session state is unknown after a failed check, do not reuse it
+            connection_pool.discard(net_connect)
+            CHECKS.inc(tenant_type=tenant_type, provider=provider, status="error")
+            raise
+        # Return the SSH connection to the pool after all checks are performed
+        connection_pool.release(net_connect)
+
+        json_return_output["timings"] = timings.to_dict()
+        CHECKS.inc(tenant_type=tenant_type, provider=provider, status="completed")
+        CHECK_SECONDS.observe(timings.elapsed(), tenant_type=tenant_type, provider=provider)
+        record_history(device_ip, "completed", hostname, tenant_type, provider, json_return_output, show_run_output, profile)
+        threshold = tenant_plans[tenant_type].ping_success_threshold
+        provider_stats.record(device_ip, provider, "completed", json_return_output,
+                              PING_SUCCESS_THRESHOLD if threshold is None else threshold)
+
+        response_data = {
+            "hostname": hostname,
+            "device_ip": device_ip,
+            'json_return_output': json_return_output,
+            'show_run_output': show_run_output,
+            'cached_commands': sorted(cached_outputs)
+        }
+        if not check_profile.show_run:
+            del response_data['show_run_output']
+        return response_data, 200
+    finally:
+        device_limiter.release(device_ip)
+
+def circuit_open_response(device_ip, tenant_type, provider, retry_after):
+    """
+    Build the response of a check rejected by the open circuit of its device.
+
+    Args:
+        device_ip (str): The login IP address of the device.
+        tenant_type (str): The type of tenant (e.g., 'APLOS', 'PSD').
+        provider (str): The network provider (e.g., 'OTE', 'WIND').
+        retry_after (float): Seconds until the circuit allows the next connection attempt.
+
+    Returns:
+        tuple: A tuple containing the response data dictionary and the HTTP status code (503).
+    """
+    retry_after = math.ceil(retry_after)
+    cprint(f"{device_ip} is unreachable after repeated connection failures, next attempt in {retry_after} seconds", 'yellow')
+    CHECKS.inc(tenant_type=tenant_type, provider=provider, status="circuit_open")
+    CIRCUIT_REJECTED.inc()
+    return {"response": f"{device_ip} is unreachable after repeated connection failures, retry in {retry_after} seconds",
+            "error": "circuit_open", "retry_after": retry_after}, 503
+
+def run_device_checks_selected(include, device_ip, tenant_type, provider, bgp_neighbor, force_refresh=False, profile=None):
+    """
+    Run the health checks of a device (see run_device_checks_shared) and keep only the 'include' response sections.
+
+    Returns:
+        tuple: A tuple containing the trimmed response data dictionary and the HTTP status code.
+    """
+    response_data, status_code = run_device_checks_shared(device_ip, tenant_type, provider, bgp_neighbor,
+                                                          force_refresh=force_refresh, profile=profile)
+    return select_sections(response_data, include), status_code
+
+def run_device_checks_shared(device_ip, tenant_type, provider, bgp_neighbor, force_refresh=False, profile=None):
+    """
+    Run the health checks of a device, sharing one execution between identical concurrent requests.
+
+    A request for the same device, tenant type, provider, BGP neighbors, check
+    profile and 'force_refresh' as a running check waits for that check and
+    returns its result.
+
+    Args:
+        device_ip (str): The login IP address of the device.
+        tenant_type (str): The type of tenant (e.g., 'APLOS', 'PSD').
+        provider (str): The network provider (e.g., 'OTE', 'WIND').
+        bgp_neighbor (str): Comma-separated list of BGP neighbors.
+        force_refresh (bool): Ignore the cached outputs and read everything from the device.
+        profile (str): The check profile (e.g., 'quick', 'standard', 'full'), None for CHECK_PROFILE.
+
+    Returns:
+        tuple: A tuple containing the response data dictionary (with 'coalesced' set when the
+        result came from another request's check) and the HTTP status code.
+    """
+    if not COALESCE_REQUESTS:
+        response_data, status_code = run_device_checks(device_ip, tenant_type, provider, bgp_neighbor, force_refresh=force_refresh,
+                                                       profile=profile)
+        return {**response_data, "coalesced": False}, status_code
+
+    key = (device_ip, tenant_type, provider, bgp_neighbor, bool(force_refresh), profile or CHECK_PROFILE)
+    (response_data, status_code), coalesced = single_flight.do(key, run_device_checks, device_ip, tenant_type, provider,
+                                                              bgp_neighbor, force_refresh=force_refresh, profile=profile)
+    if coalesced:
+        cprint(f"Returning the result of a running check of {device_ip}", 'yellow')
+        COALESCED.inc()
+    return {**response_data, "coalesced": coalesced}, status_code
+
+def run_device_checks_retrying(device_ip, tenant_type, provider, bgp_neighbor, force_refresh=False, profile=None):
+    """
+    Run the health checks of a device (see run_device_checks_shared), retrying a failed login.
+
+    Used by the batch and sweep checks: a failed login is retried up to
+    CONNECT_RETRIES times after an exponential backoff (CONNECT_BACKOFF,
+    doubled for every retry, at most CONNECT_BACKOFF_MAX seconds, with
+    jitter). Once the circuit of the device is open, the check gives up
+    instead of waiting for the cooldown.
+
+    Returns:
+        tuple: A tuple containing the response data dictionary and the HTTP status code.
+    """
+    for attempt in range(CONNECT_RETRIES + 1):
+        response_data, status_code = run_device_checks_shared(device_ip, tenant_type, provider, bgp_neighbor,
+                                                              force_refresh=force_refresh, profile=profile)
+        if response_data.get("error") != "login_failed" or attempt == CONNECT_RETRIES:
+            break
+        delay = backoff_delay(attempt, CONNECT_BACKOFF, CONNECT_BACKOFF_MAX)
+        cprint(f"Retrying the login to {device_ip} in {delay:.1f} seconds", 'yellow')
+        CONNECT_RETRIED.inc()
+        time.sleep(delay)
+    return response_data, status_code
+
+def stream_device_checks(device_ip, tenant_type, provider, bgp_neighbor, stream_format, force_refresh=False, profile=None):
+    """
+    Run the health checks in a background thread and yield every section as soon as it completes.
+
+    Args:
+        device_ip (str): The login IP address of the device.
+        tenant_type (str): The type of tenant (e.g., 'APLOS', 'PSD').
+        provider (str): The network provider (e.g., 'OTE', 'WIND').
+        bgp_neighbor (str): Comma-separated list of BGP neighbors.
+        stream_format (str): 'ndjson' for one JSON object per line, 'sse' for Server-Sent Events.
+        force_refresh (bool): Ignore the cached outputs and read everything from the device.
+        profile (str): The check profile (e.g., 'quick', 'standard', 'full'), None for CHECK_PROFILE.
+
+    Yields:
+        str: One encoded section, ending with a 'done' (or 'error') section.
+    """
+    sections = queue.Queue()
+    finished = object()
+
+    def run_checks():
+        try:
+            response_data, status_code = run_device_checks(device_ip, tenant_type, provider, bgp_neighbor,
+                                                           on_section=lambda section, data: sections.put((section, data)),
+                                                           force_refresh=force_refresh, profile=profile)
+            if status_code == 200:
+                reports = {key: value for key, value in response_data['json_return_output'].items() if key.endswith('_REPORT')}
+                sections.put(("done", {"status_code": status_code, **reports}))
+            else:
+                sections.put(("error", {"status_code": status_code, **response_data}))
+        except Exception as e:
+            sections.put(("error", {"status_code": 500, "error": str(e)}))
+        finally:
+            sections.put(finished)
+
+    threading.Thread(target=contextvars.copy_context().run, args=(run_checks,), name='wanchecks-stream', daemon=True).start()
+
+    while True:
+        item = sections.get()
+        if item is finished:
+            return
+        section, data = item
+        if stream_format == 'sse':
+            yield f"event: {section}\ndata: {json.dumps(data)}\n\n"
+        else:
+            yield json.dumps({"section": section, "data": data}) + "\n"
+
+def _batch_device_worker(index, entry, started):
+    """
+    Run the health checks of a single batch entry inside the batch worker pool.
+
+    Args:
+        index (int): Position of the entry in the batch request.
+        entry (dict): The device entry (device_ip, tenant_type, provider, bgp_neighbor).
+        started (dict): Shared map of entry index to the monotonic time its checks started.
+
+    Returns:
+        tuple: A tuple containing the response data dictionary and the HTTP status code.
+    """
+    started[index] = time.monotonic()
+    return run_device_checks_retrying(entry['device_ip'], entry['tenant_type'], entry['provider'], entry.get('bgp_neighbor', ""),
+                                      force_refresh=bool(entry.get('force_refresh')), profile=entry.get('profile'))
+
+def run_batch_checks(entries, max_workers=BATCH_MAX_WORKERS, device_timeout=BATCH_DEVICE_TIMEOUT):
+    """
+    Run the health checks for many devices on a bounded worker pool.
+
+    Every device gets its own SSH session. A device that is still running after
+    'device_timeout' seconds (counted from the moment a worker picked it up) is
+    reported as timed out and the batch does not wait for it any longer.
+
+    Args:
+        entries (list): List of device entries (device_ip, tenant_type, provider, bgp_neighbor).
+        max_workers (int): Maximum number of devices checked in parallel.
+        device_timeout (float): Seconds allowed for the checks of a single device.
+
+    Returns:
+        list: One result dictionary per entry, in the order of the request.
+    """
+    results = [None] * len(entries)
+    started = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(entries))), thread_name_prefix='wanchecks-batch')
+    pending = {executor.submit(contextvars.copy_context().run, _batch_device_worker, index, entry, started): index for index, entry in enumerate(entries)}
+
+    while pending:
+        done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            device_ip = entries[index]['device_ip']
+            try:
+                response_data, status_code = future.result()
+            except Exception as e:
+                cprint(f"Health checks failed for {device_ip}: {e}", 'red')
+                results[index] = {"device_ip": device_ip, "status": "error", "status_code": 500, "error": str(e)}
+                continue
+            status = "ok" if status_code == 200 else "failed"
+            results[index] = {"device_ip": device_ip, "status": status, "status_code": status_code, **response_data}
+
+        # Give up on devices which exceeded their time budget
+        now = time.monotonic()
+        for future, index in list(pending.items()):
+            if index in started and now - started[index] > device_timeout:
+                device_ip = entries[index]['device_ip']
+                cprint(f"Health checks for {device_ip} timed out after {device_timeout} seconds", 'red')
+                results[index] = {"device_ip": device_ip, "status": "timeout", "status_code": 504,
+                                  "error": f"Health checks did not finish within {device_timeout} seconds"}
+                del pending[future]
+
+    # Timed out workers finish in the background, do not block the response on them
+    executor.shutdown(wait=False)
+    return results
+
+
+def run_with_timeout(timeout, func, *args, **kwargs):
+    """
+    Run a function in a worker thread and wait at most 'timeout' seconds for its result.
+
+    A function that times out keeps running in the background until it returns.
+
+    Args:
+        timeout (float): Seconds to wait, 0 or None to wait without a limit.
+        func (callable): The function to run.
+        *args: Positional arguments of the function.
+        **kwargs: Keyword arguments of the function.
+
+    Returns:
+        object: The return value of the function.
+
+    Raises:
+        FutureTimeoutError: If the function did not return within the timeout.
+    """
+    future = Future()
+
+    def worker():
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=contextvars.copy_context().run, args=(worker,), name='wanchecks-request', daemon=True).start()
+    return future.result(timeout=timeout or None)
+
+
+@api.route('/wanchecks/', methods=['POST'])
+def run_health_checks():
+
+   # -----------------------------------------------------------------
+    # API Token 
+    #
+    auth_error = check_authorization()
+    if auth_error:
+        return auth_error
     
     # The token is valid, proceed with processing the request
     # -----------------------------------------------------------------
@@ -601,36 +1541,426 @@ def run_health_checks():
     tenant_type = post_data['tenant_type']
     provider = post_data['provider']
     bgp_neighbor = post_data['bgp_neighbor']
-    device_ip = request.json.get('device_ip')
-    #tenant_type = request.json.get('tenant_type')
+    force_refresh = bool(post_data.get('force_refresh'))
+    profile = post_data.get('profile')
+    if profile is not None and profile not in CHECK_PROFILES:
+        return jsonify({"error": f"Unknown check profile {profile}, expected one of {', '.join(CHECK_PROFILES)}"}), 400
+    try:
+        include, compact = response_options(post_data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Asynchronous mode: queue the checks and return the job id right away
+    if post_data.get('async'):
+        callback_url = post_data.get('callback_url')
+        if callback_url and not (isinstance(callback_url, str) and callback_url.startswith(('http://', 'https://'))):
+            return jsonify({"error": "callback_url must be an http(s) URL"}), 400
+        # the server POSTs to the callback URL, so only the configured destinations are accepted
+        if callback_url and not callback_url_allowed(callback_url, CALLBACK_URL_PREFIXES):
+            return jsonify({"error": "callback_url is not allowed, see CALLBACK_URL_PREFIXES"}), 400
+        try:
+            job_id = job_manager.submit(run_device_checks_selected, include, device_ip, tenant_type, provider, bgp_neighbor,
+                                        callback_url=callback_url, force_refresh=force_refresh, profile=profile)
+        except QueueFullError:
+            return jsonify({"error": "Too many health checks in progress, retry later"}), 503, {'Retry-After': '30'}
+        status_url = url_for('.get_health_check_job', job_id=job_id)
+        return jsonify({"job_id": job_id, "status": "queued", "status_url": status_url}), 202, {'Location': status_url}
+
+    # Streaming mode: send every section as soon as it completes
+    stream_format = post_data.get('stream')
+    if stream_format:
+        if stream_format is True:
+            stream_format = 'sse' if 'text/event-stream' in request.headers.get('Accept', '') else 'ndjson'
+        if stream_format not in ('ndjson', 'sse'):
+            return jsonify({"error": "stream must be true, 'ndjson' or 'sse'"}), 400
+        mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+        return Response(stream_device_checks(device_ip, tenant_type, provider, bgp_neighbor, stream_format, force_refresh, profile),
+                        mimetype=mimetype, headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-    # Connect to the device
-    net_connect, hostname, device = device_login(device_ip)
-    if hostname is None:
-        return jsonify({"response": f"Failed to connect to {device_ip}"}), 400
+    try:
+        response_data, status_code = run_with_timeout(REQUEST_TIMEOUT, run_device_checks_shared, device_ip, tenant_type, provider,
+                                                      bgp_neighbor, force_refresh=force_refresh, profile=profile)
+    except FutureTimeoutError:
+        cprint(f"Health checks for {device_ip} timed out after {REQUEST_TIMEOUT} seconds", 'red')
+        response_data = {"response": f"Health checks did not finish within {REQUEST_TIMEOUT} seconds, use async mode for slow devices"}
+        return json.dumps(response_data, indent=4), 504, {'Content-Type': 'application/json'}
+    if status_code != 200:
+        headers = {'Retry-After': str(response_data['retry_after'])} if 'retry_after' in response_data else {}
+        return jsonify(response_data), status_code, headers
+
+    # Keep the requested sections and send the JSON response to the client making the HTTP request.
+    return json_response(select_sections(response_data, include), 200, compact)
+
+
+@api.route('/wanchecks/jobs/<job_id>', methods=['GET'])
+def get_health_check_job(job_id):
+    """
+    Return the status of an asynchronous health check, and its result once it is finished.
+    """
+    auth_error = check_authorization()
+    if auth_error:
+        return auth_error
+
+    try:
+        include, compact = response_options()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown or expired job {job_id}"}), 404
+
+    return json_response({**job, "result": select_sections(job.get("result"), include)}, 200, compact)
+
+
+@api.route('/wanchecks/pool/', methods=['GET'])
+def get_connection_pool_stats():
+    """
+    Return the SSH connection pool metrics (hits, misses, evictions), the open sessions per device
+    and the circuit breaker state of the devices with failed connections.
+    """
+    auth_error = check_authorization()
+    if auth_error:
+        return auth_error
+
+    return jsonify({**connection_pool.stats(), "circuits": circuit_breaker.stats()}), 200
+
+
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Return the check, stage and command latency metrics in the Prometheus text format.
+    """
+    if METRICS_REQUIRE_AUTH:
+        auth_error = check_authorization()
+        if auth_error:
+            return auth_error
+
+    return metrics_registry.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+def history_disabled():
+    """
+    Check that the history store is enabled.
+
+    Returns:
+        tuple: A (response, status code) tuple when HISTORY_DB is not set, otherwise None.
+    """
+    if history_store is None:
+        return jsonify({"error": "The check history is disabled (HISTORY_DB is not set)"}), 404
+    return None
+
+def parse_since(value):
+    """
+    Convert the 'since' query parameter (Unix time or ISO 8601 date/time) to Unix time.
+
+    Raises:
+        ValueError: If the value is neither.
+    """
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+@api.route('/wanchecks/providers/', methods=['GET'])
+def get_provider_stats():
+    """
+    Return the ping and BGP results of the finished checks aggregated by provider, BGP neighbor and pinged host.
+
+    With 'provider', only that provider is returned, with the devices whose latest check of a neighbor or host failed.
+    """
+    auth_error = check_authorization()
+    if auth_error:
+        return auth_error
+
+    # the statistics are not a check response, so only 'compact' applies
+    try:
+        _, compact = response_options()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    provider = request.args.get('provider')
+    stats = provider_stats.snapshot(provider)
+    if stats is None:
+        return jsonify({"error": f"No finished checks of provider {provider}"}), 404
+    return json_response(stats, 200, compact)
+
+
+@api.route('/wanchecks/history/', methods=['GET'])
+def get_check_history():
+    """
+    Return the stored checks, newest first, filtered by 'device_ip', 'serial_number' and 'since' (up to 'limit').
+    """
+    auth_error = check_authorization() or history_disabled()
+    if auth_error:
+        return auth_error
+
+    try:
+        since = parse_since(request.args.get('since'))
+        limit = int(request.args.get('limit', 50))
+        include, compact = response_options()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+
+    checks = history_store.history(request.args.get('device_ip'), request.args.get('serial_number'), since, limit)
+    return json_response({"checks": checks}, 200, compact)
+
+
+@api.route('/wanchecks/history/latest/', methods=['GET'])
+def get_latest_checks():
+    """
+    Return the latest check summary of every device, or the full latest check of 'device_ip'.
+    """
+    auth_error = check_authorization() or history_disabled()
+    if auth_error:
+        return auth_error
+
+    try:
+        include, compact = response_options()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    device_ip = request.args.get('device_ip')
+    if not device_ip:
+        return json_response({"devices": history_store.latest()}, 200, compact)
+    check = history_store.latest(device_ip)
+    if check is None:
+        return jsonify({"error": f"No stored checks for {device_ip}"}), 404
+    return json_response({**check, "result": select_sections(check["result"], include)}, 200, compact)
+
+
+@api.route('/wanchecks/history/diff/', methods=['GET'])
+def get_check_diff():
+    """
+    Compare the latest check of 'device_ip' with the previous one.
+    """
+    auth_error = check_authorization() or history_disabled()
+    if auth_error:
+        return auth_error
+
+    device_ip = request.args.get('device_ip')
+    if not device_ip:
+        return jsonify({"error": "device_ip query parameter missing"}), 400
+    diff = history_store.diff(device_ip)
+    if diff is None:
+        return jsonify({"error": f"{device_ip} has fewer than two stored checks of its latest check profile"}), 404
+    return json_response(diff)
 
-   # Execute show run command
-    show_run_output = net_connect.send_command("show run")
 
-    json_return_output = main(tenant_type, device, hostname, net_connect, provider, bgp_neighbor)
-    # Close the SSH connection after all checks are performed
-    net_connect.disconnect()
+@api.route('/wanchecks/history/<int:check_id>', methods=['GET'])
+def get_stored_check(check_id):
+    """
+    Return a stored check with its json_return_output.
+    """
+    auth_error = check_authorization() or history_disabled()
+    if auth_error:
+        return auth_error
+
+    try:
+        include, compact = response_options()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    check = history_store.get(check_id)
+    if check is None:
+        return jsonify({"error": f"Unknown check {check_id}"}), 404
+    return json_response({**check, "result": select_sections(check["result"], include)}, 200, compact)
+
+
+@api.route('/wanchecks/history/configs/<config_hash>', methods=['GET'])
+def get_stored_config(config_hash):
+    """
+    Return the running-config stored under a hash.
+    """
+    auth_error = check_authorization() or history_disabled()
+    if auth_error:
+        return auth_error
+
+    show_run = history_store.get_config(config_hash)
+    if show_run is None:
+        return jsonify({"error": f"Unknown config hash {config_hash}"}), 404
+    return json_response({"config_hash": config_hash, "show_run_output": show_run})
+
+
+@api.route('/wanchecks/batch/', methods=['POST'])
+def run_batch_health_checks():
+    """
+    Run the health checks for a list of devices concurrently.
 
+    The request body is either a JSON list of device entries or an object with a
+    'devices' list (and optionally the 'include'/'compact' response options).
+    Each entry has the same fields as a /wanchecks/ request: device_ip,
+    tenant_type, provider, bgp_neighbor and the optional profile.
+    """
+    auth_error = check_authorization()
+    if auth_error:
+        return auth_error
+
+    post_data = request.json
+    try:
+        include, compact = response_options(post_data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    entries = post_data if isinstance(post_data, list) else (post_data or {}).get('devices')
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "Request body must contain a non-empty list of devices"}), 400
+    if len(entries) > BATCH_MAX_DEVICES:
+        return jsonify({"error": f"Batch exceeds the maximum of {BATCH_MAX_DEVICES} devices"}), 400
+    for position, entry in enumerate(entries):
+        missing = [key for key in ('device_ip', 'tenant_type', 'provider') if not isinstance(entry, dict) or key not in entry]
+        if missing:
+            return jsonify({"error": f"Device entry {position} is missing {', '.join(missing)}"}), 400
+
+    start_time = time.monotonic()
+    results = run_batch_checks(entries)
+
+    summary = {status: sum(1 for result in results if result['status'] == status) for status in ("ok", "failed", "timeout", "error")}
+    summary["total"] = len(results)
     response_data = {
-        "hostname": hostname,
-        "device_ip": device_ip,
-        'json_return_output': json_return_output,
-        'show_run_output': show_run_output
+        "summary": summary,
+        "elapsed_seconds": round(time.monotonic() - start_time, 2),
+        "results": [select_sections(result, include) for result in results]
     }
 
-    # Manually construct the JSON response
-    response_json = json.dumps(response_data, indent=4)
-    # send the JSON response data, the status code, and the headers to the client making the HTTP request.
-    return response_json, 200, {'Content-Type': 'application/json'}
+    return json_response(response_data, 200, compact)
         
 
+# Scheduled checks of every device in SWEEP_INVENTORY, started by start_services()
+fleet_sweeper = FleetSweeper(run_device_checks_retrying, SWEEP_INVENTORY, interval=SWEEP_INTERVAL, max_workers=SWEEP_MAX_WORKERS,
+                             rate=SWEEP_RATE, provider_limits=SWEEP_PROVIDER_LIMITS, jitter=SWEEP_JITTER,
+                             start_time=SWEEP_START_TIME) if SWEEP_INVENTORY else None
+
+
+@api.route('/wanchecks/sweep/', methods=['GET', 'POST'])
+def fleet_sweep():
+    """
+    GET: Return the fleet sweep settings, the next sweep time and the summaries of the last sweeps.
+    POST: Start a sweep now.
+    """
+    auth_error = check_authorization()
+    if auth_error:
+        return auth_error
+
+    if fleet_sweeper is None:
+        return jsonify({"error": "Fleet sweeps are disabled (SWEEP_INVENTORY is not set)"}), 404
+    if request.method == 'POST':
+        try:
+            triggered = fleet_sweeper.trigger()
+        except RuntimeError as e:
+            return jsonify({"error": str(e)}), 503
+        if not triggered:
+            return jsonify({"error": "A fleet sweep is already running"}), 409
+        return jsonify({"status": "started", "status_url": url_for('.fleet_sweep')}), 202
+    return json_response(fleet_sweeper.status())
+
+
+# Guards the one-time setup of the process-wide services
+_services_lock = threading.Lock()
+_app = None
+
+
+def init_services():
+    """
+    Set up the process-wide services once: the JSON log, with stdout redirected
+    to it, and the history store.
+
+    Importing the module has no side effects (no log file, database, stdout
+    redirect or SSH libraries); the services are set up by create_app().
+    """
+    global log_listener, history_store
+    with _services_lock:
+        if log_listener is not None:
+            return
+        log_listener = setup_logging(LOG_FILE, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT, rotate_when=LOG_ROTATE_WHEN)
+        # Redirect stdout (print/cprint) to the logger
+        sys.stdout = LogStream(logger, logging.INFO)
+        if HISTORY_DB:
+            history_store = HistoryStore(HISTORY_DB, retention_days=HISTORY_RETENTION_DAYS)
+
+
+def create_app():
+    """
+    Create the Flask application of the API (e.g., 'gunicorn "WAN_checks_API:create_app()"').
+
+    Returns:
+        Flask: The application with the API routes registered.
+    """
+    init_services()
+    app = Flask(__name__)
+    app.register_blueprint(api)
+    return app
+
+
+def __getattr__(name):
+    # 'WAN_checks_API:app' of existing gunicorn setups: the application is created on first access
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def start_services():
+    """
+    Start the background services of a serving process (the fleet sweep scheduler).
+    """
+    init_services()
+    if fleet_sweeper is not None:
+        fleet_sweeper.start()
+
+
+def shutdown_services():
+    """
+    Stop the background services before the process exits.
+
+    The fleet sweeps stop, queued asynchronous jobs are cancelled (running
+    ones finish), the pooled SSH sessions and the history store are closed
+    and the queued log records are written.
+    """
+    if fleet_sweeper is not None:
+        fleet_sweeper.stop()
+    job_manager.shutdown(wait=False)
+    connection_pool.close_all()
+    if history_store is not None:
+        history_store.close()
+    if log_listener is not None:
+        stop_logging(log_listener)
+
+
+def serve():
+    """
+    Serve the API with waitress, or with the Flask development server when SERVER = 'flask'.
+
+    SIGTERM and Ctrl+C stop the server gracefully through shutdown_services().
+    """
+    # SystemExit unwinds the server loop, so the finally block below runs on SIGTERM too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    app = create_app()
+    # the reloader process of the Flask debug server does not serve requests, only its child does
+    if SERVER != 'flask' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_services()
+    try:
+        if SERVER == 'flask':
+            print("Starting Flask development server...")
+            app.run(host=SERVER_HOST, port=SERVER_PORT, debug=True)
+            return
+        try:
+            from waitress import serve as waitress_serve
+        except ImportError:
+            cprint("waitress is not installed, starting the Flask development server instead", 'yellow')
+            app.run(host=SERVER_HOST, port=SERVER_PORT, threaded=True)
+            return
+        print(f"Starting waitress on {SERVER_HOST}:{SERVER_PORT} with {SERVER_THREADS} threads...")
+        waitress_serve(app, host=SERVER_HOST, port=SERVER_PORT, threads=SERVER_THREADS)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_services()
+
+
 if __name__  == '__main__':
-    print("Starting Flask application...")
-    app.debug = True
-    app.run(debug=True)
-    #app.run(host='0.0.0.0', port=80)
\ No newline at end of file
+    serve()
\ No newline at end of file
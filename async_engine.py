@@ -0,0 +1,245 @@
+"""
+asyncssh execution engine of the WAN checks API.
+
+With SSH_ENGINE = 'asyncssh' in config.py the SSH sessions are asyncssh
+connections driven by one shared asyncio event loop thread, instead of
+Netmiko/Paramiko sessions with a transport thread each. AsyncSSHConnection
+exposes the Netmiko methods the check functions use (send_command,
+write_channel/read_channel, find_prompt, ...), so the checks run unchanged
+on either engine. Only the SSH I/O moves to the event loop: every check
+still runs in its own worker thread, which waits for each command to
+finish on the loop.
+
+asyncssh is an optional dependency (pip install asyncssh).
+"""
+
+import re
+import asyncio
+import threading
+import concurrent.futures
+
+import asyncssh
+
+
+# Any IOS prompt on the last line of the output, e.g. 'CPE-ATH-0042#'
+PROMPT = re.compile(r"(?:^|\n)([\w.\-/:()]+[#>]) ?$")
+
+# Seconds a worker thread waits for an operation on the event loop, on top of the operation's own timeout
+RUN_TIMEOUT_MARGIN = 5
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop():
+    """
+    Return the event loop shared by all asyncssh sessions, starting its thread on first use.
+
+    Returns:
+        asyncio.AbstractEventLoop: The running event loop.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='wanchecks-asyncssh', daemon=True).start()
+        return _loop
+
+
+def run(coroutine, timeout=30):
+    """
+    Run a coroutine on the shared event loop and wait for its result.
+
+    Args:
+        coroutine (coroutine): The SSH operation.
+        timeout (float): Seconds to wait before the operation is cancelled.
+
+    Returns:
+        object: The result of the coroutine.
+
+    Raises:
+        TimeoutError: If the operation did not finish in time, e.g. because the event loop is blocked.
+    """
+    future = asyncio.run_coroutine_threadsafe(coroutine, get_event_loop())
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"SSH operation did not finish within {timeout} seconds") from None
+
+
+def _normalize(data):
+    return data.replace("\r\n", "\n").replace("\r", "")
+
+
+class AsyncSSHConnection:
+    """
+    Netmiko-compatible Cisco IOS session over asyncssh.
+
+    Takes the same device dictionary as Netmiko's ConnectHandler; keys other
+    than the ones below (e.g., device_type) are ignored.
+
+    Args:
+        ip (str): The IP address of the device (or 'host').
+        username (str): The login username.
+        password (str): The login password.
+        port (int): The SSH port.
+        keepalive (int): Seconds between SSH keepalives, 0 disables them.
+        conn_timeout (float): Seconds allowed for the TCP connection, login and first prompt.
+    """
+
+    RETURN = "\n"
+
+    def __init__(self, ip=None, host=None, username=None, password=None, port=22, keepalive=0, conn_timeout=10, **kwargs):
+        self.host = host or ip
+        self._buffer = ""
+        self._closed = False
+        self._conn = None
+        self._process = None
+        self._data_event = None
+        self._reader = None
+        self._prompt = PROMPT     # replaced by the exact prompt of the device after the login
+        # the TCP connection and login, then the first prompt, each get conn_timeout
+        run(self._connect(username, password, port, keepalive, conn_timeout), 2 * conn_timeout + RUN_TIMEOUT_MARGIN)
+        try:
+            # same session preparation as Netmiko for cisco_ios
+            self.send_command("terminal width 511")
+            self.disable_paging()
+        except BaseException:
+            self._abort()
+            raise
+
+    async def _connect(self, username, password, port, keepalive, conn_timeout):
+        self._conn = await asyncio.wait_for(
+            asyncssh.connect(self.host, port=port, username=username, password=password, known_hosts=None,
+                             keepalive_interval=keepalive or 0),
+            conn_timeout)
+        try:
+            self._process = await self._conn.create_process(term_type="vt100", term_size=(511, 24))
+            self._data_event = asyncio.Event()
+            self._reader = asyncio.ensure_future(self._read_forever())
+            # the login banner ends with the first prompt, later outputs must end with the same hostname
+            banner = await self._read_until(PROMPT, conn_timeout)
+            match = PROMPT.search(banner.rstrip("\n"))
+            if match is None:
+                raise ConnectionError(f"No prompt found in the login banner of {self.host}")
+            self._prompt = re.compile(rf"(?:^|\n)({re.escape(match.group(1)[:-1])}[#>]) ?$")
+        except BaseException:
+            # also when run() cancels the login, so neither the connection nor the reader task is left behind
+            if self._reader is not None:
+                self._reader.cancel()
+            self._conn.close()
+            self._closed = True
+            raise
+
+    def _abort(self):
+        # Close a session that failed half-way from the worker thread, without waiting for the event loop
+        self._closed = True
+        if self._reader is not None:
+            get_event_loop().call_soon_threadsafe(self._reader.cancel)
+        if self._conn is not None:
+            get_event_loop().call_soon_threadsafe(self._conn.close)
+
+    async def _read_forever(self):
+        try:
+            while True:
+                data = await self._process.stdout.read(65536)
+                if not data:
+                    break
+                self._buffer += data
+                self._data_event.set()
+        except (asyncssh.Error, OSError):
+            pass
+        finally:
+            self._closed = True
+            self._data_event.set()
+
+    async def _read_until(self, pattern, timeout):
+        # Wait until the buffered output matches the pattern, then take the output out of the buffer
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            output = _normalize(self._buffer)
+            if pattern.search(output.rstrip("\n")):
+                self._buffer = ""
+                return output
+            if self._closed:
+                raise EOFError(f"SSH session to {self.host} closed while waiting for {pattern.pattern!r}")
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                raise TimeoutError(f"Pattern {pattern.pattern!r} not detected in the output of {self.host} within {timeout} seconds")
+            self._data_event.clear()
+            try:
+                await asyncio.wait_for(self._data_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send_command(self, command, read_timeout, expect_string):
+        self._buffer = ""
+        self._process.stdin.write(command + self.RETURN)
+        pattern = re.compile(expect_string) if expect_string else self._prompt
+        output = await self._read_until(pattern, read_timeout)
+        lines = output.rstrip("\n").split("\n")
+        # drop the command echo and the trailing prompt, like Netmiko
+        if lines and lines[0].strip() == command.strip():
+            lines = lines[1:]
+        if not expect_string and lines and self._prompt.search(lines[-1]):
+            lines = lines[:-1]
+        return "\n".join(lines)
+
+    async def _write(self, data):
+        self._process.stdin.write(data)
+
+    async def _drain(self):
+        data, self._buffer = self._buffer, ""
+        return data
+
+    async def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            await self._conn.wait_closed()
+        self._closed = True
+
+    def send_command(self, command_string, read_timeout=10, expect_string=None, **kwargs):
+        """
+        Send a command and return its output without the command echo and the prompt.
+
+        Args:
+            command_string (str): The command.
+            read_timeout (float): Seconds to wait for the prompt (or 'expect_string').
+            expect_string (str): Optional regular expression ending the output instead of the prompt.
+
+        Returns:
+            str: The command output.
+        """
+        return run(self._send_command(command_string.rstrip("\n"), read_timeout, expect_string),
+                   read_timeout + RUN_TIMEOUT_MARGIN)
+
+    def write_channel(self, out_data):
+        run(self._write(out_data))
+
+    def read_channel(self):
+        return run(self._drain())
+
+    def find_prompt(self, **kwargs):
+        run(self._write(self.RETURN))
+        output = run(self._read_until(self._prompt, 10), 10 + RUN_TIMEOUT_MARGIN)
+        return output.rstrip().split("\n")[-1].strip()
+
+    def clear_buffer(self, **kwargs):
+        return self.read_channel()
+
+    def disable_paging(self, command="terminal length 0", **kwargs):
+        return self.send_command(command)
+
+    def is_alive(self):
+        return not self._closed
+
+    def disconnect(self):
+        if not self._closed:
+            run(self._close())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disconnect()
@@ -0,0 +1,80 @@
+"""
+Benchmark: SSH handshakes and wall time of asym_bgp_checks() against a fake device.
+
+The route tables are read over the session opened by device_login(), so the
+check should not open any additional SSH session. The previous implementation
+opened one new session per route table command (4 per APLOS/PSD check).
+Route tables are captured up to BGP_ROUTES_MAX_LINES lines, so the bytes
+read per check stay flat however large the provider's table is.
+
+Usage:
+    python benchmarks/bench_bgp_sessions.py [--prefixes 20000] [--handshake-latency 0.5] [--max-lines 50]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_device import FakeDevice, install_fake_config, install_fake_device, route_table
+
+# route table commands opened on a new session each by the previous implementation
+LEGACY_ROUTE_SESSIONS = 4
+
+
+def build_device(prefixes, handshake_latency, command_latency):
+    install_fake_config()
+    import config
+    neighbor = config.ote_bgp_neighbor
+    table = route_table(prefixes, neighbor)
+    outputs = {
+        f"show ip bgp neighbor {neighbor}": "BGP state = Established, up for 2w1d",
+        "show bgp ipv6 unicast neighbors": "BGP state = Established, up for 2w1d",
+        f"show ip bgp neighbors {neighbor} received-routes": f"For address family: IPv4 Unicast, neighbor {neighbor}\n" + table,
+        f"show ip bgp neighbors {neighbor} advertised-routes": table,
+        f"show bgp ipv6 unicast neighbors {neighbor} received-routes": table,
+        f"show bgp ipv6 unicast neighbors {neighbor} advertised-routes": table,
+    }
+    return FakeDevice(outputs=outputs, handshake_latency=handshake_latency, command_latency=command_latency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prefixes", type=int, default=20000, help="routes per route table")
+    parser.add_argument("--handshake-latency", type=float, default=0.5, help="seconds per SSH handshake")
+    parser.add_argument("--command-latency", type=float, default=0.05, help="seconds per command")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-lines", type=int, default=None, help="route table lines captured (0 = whole table)")
+    args = parser.parse_args()
+
+    fake = install_fake_device(build_device(args.prefixes, args.handshake_latency, args.command_latency))
+    import WAN_checks_API
+    if args.max_lines is not None:
+        WAN_checks_API.BGP_ROUTES_MAX_LINES = args.max_lines
+
+    net_connect, hostname, device = WAN_checks_API.device_login("192.0.2.1")
+    login_handshakes = fake.handshakes
+
+    timings = []
+    fake.bytes_sent = 0
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        bgp_results, bgp_neighbor_output, BGP_REPORT, bgp_stats = WAN_checks_API.asym_bgp_checks(device, "OTE", net_connect)
+        timings.append(time.perf_counter() - start)
+    net_connect.disconnect()
+
+    extra_handshakes = (fake.handshakes - login_handshakes) / args.runs
+    saved = LEGACY_ROUTE_SESSIONS - extra_handshakes
+    print(f"prefixes per table          : {args.prefixes}")
+    print(f"BGP report                  : {BGP_REPORT}")
+    print(f"handshakes per check        : {extra_handshakes:g} (previously {LEGACY_ROUTE_SESSIONS})")
+    print(f"handshakes saved per check  : {saved:g} (~{saved * args.handshake_latency:.2f}s at {args.handshake_latency}s each)")
+    print(f"bytes read per check        : {fake.bytes_sent // args.runs} (route tables capped at {WAN_checks_API.BGP_ROUTES_MAX_LINES} lines)")
+    print(f"asym_bgp_checks wall time   : min {min(timings):.3f}s / avg {sum(timings) / len(timings):.3f}s over {args.runs} runs")
+
+
+if __name__ == "__main__":
+    main()
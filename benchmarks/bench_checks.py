@@ -0,0 +1,158 @@
+"""
+Benchmark: wall time, throughput and memory of the full health check pipeline against a fake device.
+
+The checks run through the Flask endpoints (test client), so the JSON
+handling, the connection pool and the device cache are measured as well:
+
+- single: POST /wanchecks/ for one device, one request after the other.
+- batch: one POST /wanchecks/batch/ request for all devices.
+- concurrent: POST /wanchecks/ requests for all devices from parallel clients.
+
+Every mode reports the per-device wall time (min/avg/p95/max), the devices
+checked per second and, in a second pass under tracemalloc, the peak Python
+memory. The check output goes to the JSON log file like in production.
+
+Usage:
+    python benchmarks/bench_checks.py [--mode all] [--devices 20] [--concurrency 10] [--tenant-type APLOS]
+                                      [--scenario healthy] [--ping-mode standard] [--profile standard]
+                                      [--handshake-latency 0.5]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_pool import ConnectionPool
+from fake_device import SCENARIOS, FakeDevice, device_outputs, install_fake_device
+
+MODES = ("single", "batch", "concurrent")
+
+
+def check_entry(args, index):
+    # documentation addresses, one per fake device
+    return {
+        "device_ip": f"192.0.2.{index % 254 + 1}",
+        "tenant_type": args.tenant_type,
+        "provider": args.provider,
+        "bgp_neighbor": args.bgp_neighbor,
+        "force_refresh": args.force_refresh,
+        "profile": args.profile,
+    }
+
+
+def post_check(client, token, entry):
+    start = time.perf_counter()
+    response = client.post('/wanchecks/', json=entry, headers={"Authorization": token})
+    if response.status_code != 200:
+        raise RuntimeError(f"{entry['device_ip']}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+    return time.perf_counter() - start
+
+
+def run_single(client, token, args):
+    return [post_check(client, token, check_entry(args, 0)) for _ in range(args.runs)]
+
+
+def run_batch(client, token, args):
+    entries = [check_entry(args, index) for index in range(args.devices)]
+    response = client.post('/wanchecks/batch/', json=entries, headers={"Authorization": token})
+    results = response.get_json()["results"]
+    failed = [result["device_ip"] for result in results if result["status"] != "ok"]
+    if failed:
+        raise RuntimeError(f"batch checks failed for {failed}")
+    return [result["json_return_output"]["timings"]["total_seconds"] for result in results]
+
+
+def run_concurrent(client, token, args):
+    entries = [check_entry(args, index) for index in range(args.devices)]
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        return list(executor.map(lambda entry: post_check(client, token, entry), entries))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(mode, client, token, args, WAN_checks_API):
+    run = {"single": run_single, "batch": run_batch, "concurrent": run_concurrent}[mode]
+    # start every mode with cold sessions and an empty device cache
+    # (close_all() stops the pooling of the old pool for good, so it is replaced)
+    pool = WAN_checks_API.connection_pool
+    pool.close_all()
+    WAN_checks_API.connection_pool = ConnectionPool(WAN_checks_API.open_ssh_session, pool.max_sessions_per_device,
+                                                    pool.idle_timeout, pool.acquire_timeout)
+    for index in range(args.devices):
+        WAN_checks_API.device_cache.invalidate(check_entry(args, index)["device_ip"])
+
+    start = time.perf_counter()
+    device_times = run(client, token, args)
+    wall_time = time.perf_counter() - start
+
+    peak = None
+    if args.memory:
+        tracemalloc.start()
+        run(client, token, args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return device_times, wall_time, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=MODES + ("all",), default="all")
+    parser.add_argument("--devices", type=int, default=20, help="devices of the batch and concurrent modes")
+    parser.add_argument("--concurrency", type=int, default=10, help="parallel clients of the concurrent mode")
+    parser.add_argument("--runs", type=int, default=5, help="requests of the single mode")
+    parser.add_argument("--tenant-type", default="APLOS", choices=("APLOS", "PSD", "MMM"))
+    parser.add_argument("--provider", default="OTE", choices=("OTE", "WIND", "NOVA", "VODAFONE"))
+    parser.add_argument("--bgp-neighbor", default="80.80.80.80", help="BGP neighbors of MMM tenants")
+    parser.add_argument("--scenario", default="healthy", choices=SCENARIOS)
+    parser.add_argument("--prefixes", type=int, default=1000, help="routes per BGP route table")
+    parser.add_argument("--handshake-latency", type=float, default=0.5, help="seconds per SSH handshake")
+    parser.add_argument("--command-latency", type=float, default=0.05, help="seconds per show command")
+    parser.add_argument("--ping-latency", type=float, default=None,
+                        help="seconds per ping (default: the time of the probes, 2s per lost probe)")
+    parser.add_argument("--ping-mode", default="standard", choices=("standard", "fast"), help="PING_MODE of the checks")
+    parser.add_argument("--profile", default="standard", choices=("quick", "standard", "full"), help="check profile of the requests")
+    parser.add_argument("--force-refresh", action="store_true", help="bypass the device cache")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the tracemalloc pass")
+    args = parser.parse_args()
+
+    ping_latencies = {"ping": args.ping_latency} if args.ping_latency is not None else {}
+    fake = install_fake_device(FakeDevice(handshake_latency=args.handshake_latency, command_latency=args.command_latency,
+                                          command_latencies=ping_latencies))
+    import WAN_checks_API
+    WAN_checks_API.PING_MODE = args.ping_mode
+    fake.outputs = device_outputs(args.tenant_type, args.provider, args.bgp_neighbor, args.scenario, args.prefixes)
+    client = WAN_checks_API.create_app().test_client()
+    # create_app() redirects stdout to the log file, the benchmark report goes to the console
+    sys.stdout = sys.__stdout__
+    token = WAN_checks_API.AUTH_TOKEN
+
+    print(f"tenant {args.tenant_type} / {args.provider}, scenario {args.scenario}, profile {args.profile}, "
+          f"ping mode {args.ping_mode}, latencies: handshake {args.handshake_latency}s, command {args.command_latency}s, "
+          f"ping {'per probe' if args.ping_latency is None else f'{args.ping_latency}s'}")
+    for mode in (MODES if args.mode == "all" else (args.mode,)):
+        handshakes, commands = fake.handshakes, len(fake.commands)
+        # the check output goes to the JSON log, the report to the console
+        with redirect_stdout(WAN_checks_API.LogStream(WAN_checks_API.logger)):
+            device_times, wall_time, peak = measure(mode, client, token, args, WAN_checks_API)
+        runs = 2 if args.memory else 1
+        print(f"\n{mode}: {len(device_times)} checks in {wall_time:.2f}s, {len(device_times) / wall_time:.2f} checks/s")
+        print(f"  per device wall time : min {min(device_times):.3f}s / avg {sum(device_times) / len(device_times):.3f}s"
+              f" / p95 {percentile(device_times, 0.95):.3f}s / max {max(device_times):.3f}s")
+        print(f"  per check            : {(fake.handshakes - handshakes) / (len(device_times) * runs):.2f} SSH handshakes,"
+              f" {(len(fake.commands) - commands) / (len(device_times) * runs):.1f} commands")
+        if peak is not None:
+            print(f"  peak traced memory   : {peak / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
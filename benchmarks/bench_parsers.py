@@ -0,0 +1,66 @@
+"""
+Micro-benchmark of the output parsers in parsers.py.
+
+Every file in benchmarks/corpus is a captured command output. The file name
+prefix selects the parser (ping_*, bgp_*, ipv6_interface_*, show_version*,
+show_license_status*). The benchmark prints the parsed record and the mean
+parse time of every file, so the parse cost stays measurable as the number
+of checked CPEs grows.
+
+Usage:
+    python benchmarks/bench_parsers.py [--iterations 20000]
+"""
+
+import os
+import sys
+import glob
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parsers
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+# file name prefix -> parser call
+PARSERS = {
+    "ping_": parsers.parse_ping,
+    "bgp_": lambda output: parsers.parse_bgp_neighbors(output, "10.255.0.1"),
+    "ipv6_interface_": lambda output: parsers.parse_ipv6_interface(output, "vlan3000"),
+    "show_version": parsers.parse_version,
+    "show_license_status": parsers.parse_license_status,
+}
+
+
+def parser_for(file_name):
+    for prefix, parser in PARSERS.items():
+        if file_name.startswith(prefix):
+            return parser
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    total = 0.0
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.txt"))):
+        file_name = os.path.basename(path)
+        parse = parser_for(file_name)
+        if parse is None:
+            continue
+        with open(path) as corpus_file:
+            output = corpus_file.read()
+
+        record = parse(output)
+        seconds = timeit.timeit(lambda: parse(output), number=args.iterations) / args.iterations
+        total += seconds
+        print(f"{file_name:36} {seconds * 1e6:8.2f} us  {record}")
+
+    print(f"{'total per corpus pass':36} {total * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: Netmiko vs asyncssh engine with many concurrent SSH sessions.
+
+Both engines log in to a local FakeSSHServer over real SSH. All sessions are
+opened at the same time and held open while the threads and the traced
+Python memory of the process are sampled, then every session runs the
+Loopback0 ping set of a check (ping_hosts) and disconnects. Netmiko runs a
+Paramiko transport thread per session; the asyncssh engine drives all
+sessions from one event loop thread.
+
+Requires asyncssh (pip install asyncssh).
+
+Usage:
+    python benchmarks/bench_ssh_engines.py [--sessions 50] [--ping-latency 0.5] [--engines netmiko asyncssh]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import tracemalloc
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_device import FakeDevice, device_outputs, install_fake_config
+from fake_ssh_server import FakeSSHServer
+
+
+def run_engine(WAN_checks_API, engine, port, sessions):
+    WAN_checks_API.SSH_ENGINE = engine
+    device = {"device_type": "cisco_ios", "ip": "127.0.0.1", "username": "bench", "password": "bench", "port": port}
+    hosts = WAN_checks_API.data_vlan_hosts
+    all_open = threading.Barrier(sessions + 1)
+    sampled = threading.Event()
+
+    def session_worker(_):
+        net_connect = WAN_checks_API.open_ssh_session(device)
+        all_open.wait()
+        sampled.wait()
+        results, outputs, report, stats = WAN_checks_API.ping_hosts(net_connect, "Lo0", hosts, {"read_timeout": 15})
+        net_connect.disconnect()
+        return report
+
+    threads_before = threading.active_count()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        futures = [executor.submit(session_worker, index) for index in range(sessions)]
+        all_open.wait()
+        connect_time = time.perf_counter() - start
+        open_threads = threading.active_count() - threads_before
+        open_memory = tracemalloc.get_traced_memory()[0]
+        sampled.set()
+        reports = [future.result() for future in futures]
+    wall_time = time.perf_counter() - start
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "connect_time": connect_time,
+        "wall_time": wall_time,
+        "open_threads": open_threads,
+        "open_memory": open_memory,
+        "peak_memory": peak_memory,
+        "failed": sum(report != "OK" for report in reports),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent SSH sessions")
+    parser.add_argument("--ping-latency", type=float, default=0.5, help="seconds per ping")
+    parser.add_argument("--engines", nargs="+", default=["netmiko", "asyncssh"], choices=("netmiko", "asyncssh"))
+    args = parser.parse_args()
+
+    install_fake_config()
+    import WAN_checks_API
+    # ping_hosts prints every result, the report goes to the console
+    sys.stdout = sys.__stdout__
+    server = FakeSSHServer(FakeDevice(outputs=device_outputs("APLOS", "OTE"), command_latencies={"ping": args.ping_latency}))
+    port = server.start()
+
+    print(f"{args.sessions} concurrent sessions, ping latency {args.ping_latency}s, "
+          f"{len(WAN_checks_API.data_vlan_hosts)} pings per session")
+    for engine in args.engines:
+        with redirect_stdout(WAN_checks_API.LogStream(WAN_checks_API.logger)):
+            result = run_engine(WAN_checks_API, engine, port, args.sessions)
+        print(f"\n{engine}:")
+        print(f"  sessions open after     : {result['connect_time']:.2f}s, total {result['wall_time']:.2f}s"
+              f" ({result['failed']} failed ping sets)")
+        print(f"  extra threads when open : {result['open_threads']} ({args.sessions} of them run the checks)")
+        print(f"  traced memory when open : {result['open_memory'] / 1024 / 1024:.1f} MiB"
+              f" ({result['open_memory'] / 1024 / args.sessions:.0f} KiB per session),"
+              f" peak {result['peak_memory'] / 1024 / 1024:.1f} MiB")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
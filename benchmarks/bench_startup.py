@@ -0,0 +1,137 @@
+"""
+Benchmark: cold start of the API process (import, create_app() and first request).
+
+Every run starts a fresh Python interpreter, like a worker spawn or a start
+of the frozen .exe, and measures:
+
+- import: 'import WAN_checks_API', as reported by 'python -X importtime'.
+- create_app(): the log, the history store and the Flask application.
+- first request: GET /wanchecks/pool/ through the test client.
+- process: the wall time of the whole interpreter run.
+
+Importing the module must not load the SSH stack (netmiko, paramiko and the
+cryptography libraries are imported on the first SSH connection). The run
+fails (exit code 1) when the median import time exceeds the budget or the
+SSH stack is imported at startup, so the benchmark can guard the startup time.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--budget-ms 400] [--top 8]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+# Modules of the SSH stack that must not be imported at startup
+SSH_MODULES = ("netmiko", "paramiko")
+
+CHILD = """
+import sys, time, json
+sys.path[:0] = {paths!r}
+from fake_device import install_fake_config
+install_fake_config()
+started = time.perf_counter()
+import WAN_checks_API
+imported = time.perf_counter()
+ssh_modules = [name for name in {ssh_modules!r} if name in sys.modules]
+app = WAN_checks_API.create_app()
+created = time.perf_counter()
+app.test_client().get('/wanchecks/pool/', headers={{'Authorization': WAN_checks_API.AUTH_TOKEN}})
+answered = time.perf_counter()
+WAN_checks_API.shutdown_services()
+print(json.dumps({{"import": imported - started, "create_app": created - imported,
+                  "first_request": answered - created, "ssh_modules": ssh_modules}}), file=sys.__stdout__)
+"""
+
+
+def parse_importtime(output, module="WAN_checks_API"):
+    """
+    Read the import time of a module and of its direct imports from 'python -X importtime' output.
+
+    Args:
+        output (str): The stderr of the interpreter.
+        module (str): The top-level module.
+
+    Returns:
+        tuple: The cumulative seconds of the module and a list of (name, seconds) of its direct imports.
+    """
+    children = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue    # header line
+        depth = (len(name) - 1 - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == module:
+                return int(cumulative) / 1e6, children
+            children = []
+        elif depth == 1:
+            children.append((name.strip(), int(cumulative) / 1e6))
+    raise ValueError(f"{module} not found in the importtime output")
+
+
+def run_once(workdir):
+    # a fresh interpreter per run; the log file and the history database go to a temporary directory
+    code = CHILD.format(paths=[BENCH_DIR, ROOT_DIR], ssh_modules=SSH_MODULES)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=workdir,
+                            capture_output=True, text=True, check=True)
+    process_time = time.perf_counter() - start
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    import_time, children = parse_importtime(result.stderr)
+    timings.update({"import": import_time, "process": process_time, "children": children})
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="interpreter runs")
+    parser.add_argument("--budget-ms", type=float, default=400, help="maximum median import time of WAN_checks_API")
+    parser.add_argument("--top", type=int, default=8, help="slowest direct imports listed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        runs = [run_once(workdir) for _ in range(args.runs)]
+
+    def report(label, key):
+        values = [run[key] * 1000 for run in runs]
+        print(f"{label:<22}: min {min(values):7.1f} ms / median {statistics.median(values):7.1f} ms / max {max(values):7.1f} ms")
+        return statistics.median(values)
+
+    print(f"{args.runs} cold starts of {sys.executable}")
+    import_ms = report("import WAN_checks_API", "import")
+    report("create_app()", "create_app")
+    report("first request", "first_request")
+    report("process", "process")
+
+    ssh_modules = sorted({name for run in runs for name in run["ssh_modules"]})
+    print(f"{'SSH stack at startup':<22}: {', '.join(ssh_modules) + ' imported' if ssh_modules else 'not imported'}")
+
+    # direct imports of the module, by median cumulative time
+    durations = {}
+    for run in runs:
+        for name, seconds in run["children"]:
+            durations.setdefault(name, []).append(seconds * 1000)
+    slowest = sorted(((statistics.median(values), name) for name, values in durations.items()), reverse=True)[:args.top]
+    print("slowest direct imports:")
+    for milliseconds, name in slowest:
+        print(f"  {name:<24} {milliseconds:7.1f} ms")
+
+    within_budget = import_ms <= args.budget_ms
+    print(f"\nimport budget {args.budget_ms:g} ms: {'OK' if within_budget and not ssh_modules else 'EXCEEDED'}")
+    if not within_budget or ssh_modules:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
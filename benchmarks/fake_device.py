@@ -0,0 +1,383 @@
+"""
+Fake Cisco IOS device for offline benchmarks.
+
+FakeConnection mimics the parts of the Netmiko connection API that
+WAN_checks_API uses, so the check functions can run without a real router.
+Every new FakeConnection counts as one SSH handshake and sleeps for the
+configured handshake latency; every command sleeps for the configured
+command latency, or the latency of its command prefix (e.g., 'ping').
+Pings are answered by FakePing, with as many probes as the ping command
+asks for and, unless a 'ping' latency is set, the time these probes take.
+'terminal length' paging with '--More--' prompts is emulated on the channel.
+
+device_outputs() builds the outputs of a whole check from the captured
+outputs in benchmarks/corpus, for a healthy CPE or a failure scenario
+(failed pings, Idle BGP neighbor, interface down).
+
+Usage:
+    from fake_device import FakeDevice, device_outputs, install_fake_device
+    fake = install_fake_device(FakeDevice(outputs=device_outputs("APLOS", "OTE"), handshake_latency=0.5))
+"""
+
+import os
+import sys
+import time
+import types
+import threading
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+# Outputs built by device_outputs() for every scenario
+SCENARIOS = ("healthy", "ping_failure", "bgp_idle", "interface_down")
+
+
+# config.py values used when the benchmarks run on a box without a real config.py
+FAKE_CONFIG = {
+    "username": "bench",
+    "password": "bench",
+    "AUTH_TOKEN": "bench-token",
+    "ote_bgp_neighbor": "10.255.0.1",
+    "wind_bgp_neighbor": "10.255.1.1",
+    "wind_bgp_v6_neighbor": "2001:db8:1::1",
+    "nova_bgp_neighbor": "10.255.2.1",
+    "nova_bgp_v6_neighbor": "2001:db8:2::1",
+    "vodafone_bgp_neighbor": "10.255.3.1",
+    "vodafone_bgp_v6_neighbor": "2001:db8:3::1",
+    "data_vlan_hosts": {"dc1": "10.100.0.1", "dc2": "10.100.0.2"},
+    "voice_vlan_hosts": {"voice": "10.200.0.1", "voice_v6": "2001:db8:200::1"},
+}
+
+
+# Erasure of the ' --More-- ' prompt sent by IOS after the answer to it
+MORE_ERASE = "\x08" * 10 + " " * 10 + "\x08" * 10
+
+
+def install_fake_config():
+    """
+    Register a fake 'config' module unless a real config.py can be imported.
+    """
+    try:
+        import config  # noqa: F401
+    except ImportError:
+        module = types.ModuleType("config")
+        module.__dict__.update(FAKE_CONFIG)
+        sys.modules["config"] = module
+
+
+def route_table(prefix_count, neighbor="10.255.0.1"):
+    """
+    Build a 'show ip bgp neighbors X received-routes' style output.
+
+    Args:
+        prefix_count (int): Number of routes in the table.
+        neighbor (str): The BGP neighbor shown as next hop.
+
+    Returns:
+        str: The route table output.
+    """
+    lines = [
+        "BGP table version is 4242, local router ID is 10.0.0.254",
+        "Status codes: s suppressed, d damped, h history, * valid, > best, i - internal",
+        "Origin codes: i - IGP, e - EGP, ? - incomplete",
+        "",
+        "     Network          Next Hop            Metric LocPrf Weight Path",
+    ]
+    for index in range(prefix_count):
+        lines.append(f"*>   10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}/32  {neighbor}  0  0 65000 i")
+    lines.append("")
+    lines.append(f"Total number of prefixes {prefix_count}")
+    return "\n".join(lines)
+
+
+def corpus(name):
+    """Return a captured output of benchmarks/corpus (e.g., 'ping_success')."""
+    with open(os.path.join(CORPUS_DIR, f"{name}.txt")) as corpus_file:
+        return corpus_file.read()
+
+
+def bgp_neighbor_block(neighbor, state="Established", address_family="IPv4 Unicast", prefixes=(0, 0)):
+    """
+    Build the 'show ip bgp neighbor' style block of one BGP neighbor.
+
+    Args:
+        neighbor (str): The neighbor address.
+        state (str): The BGP state (e.g., 'Established', 'Idle', 'Active').
+        address_family (str): The address family section of the block.
+        prefixes (tuple): Sent and received current prefixes.
+
+    Returns:
+        str: The neighbor block.
+    """
+    uptime = ", up for 3w2d" if state == "Established" else ""
+    return "\n".join([
+        f"BGP neighbor is {neighbor.upper()},  remote AS 6799, external link",
+        "  BGP version 4, remote router ID 195.170.0.1",
+        f"  BGP state = {state}{uptime}",
+        "  Last read 00:00:21, last write 00:00:18, hold time is 180, keepalive interval is 60 seconds",
+        "",
+        f" For address family: {address_family}",
+        "  BGP table version 88, neighbor version 88/0",
+        "                                 Sent       Rcvd",
+        "  Prefix activity:               ----       ----",
+        f"    Prefixes Current:          {prefixes[0]:>6}     {prefixes[1]:>6}",
+        f"    Prefixes Total:            {prefixes[0]:>6}     {prefixes[1]:>6}",
+        "",
+    ])
+
+
+def ipv6_interface(interface, up=True):
+    """Build the 'show ipv6 interface X' output of an up or down VLAN interface."""
+    name = interface[0].upper() + interface[1:]
+    if up:
+        return corpus("ipv6_interface_up").replace("Vlan3000", name)
+    return corpus("ipv6_interface_down").replace("Vlan3100", name)
+
+
+def ping_probes(command):
+    """Return the repeat count and probe timeout of a ping command (IOS defaults 5 and 2 seconds)."""
+    words = command.split()
+    repeat = int(words[words.index("repeat") + 1]) if "repeat" in words else 5
+    timeout = int(words[words.index("timeout") + 1]) if "timeout" in words else 2
+    return repeat, timeout
+
+
+class FakePing:
+    """
+    Answer the ping commands of a FakeDevice like IOS, for any 'repeat' and 'timeout'.
+
+    Args:
+        answered (bool): Whether the pinged host answers the probes.
+        rtt (float): Seconds per answered probe; an unanswered probe takes the probe timeout.
+    """
+
+    def __init__(self, answered=True, rtt=0.015):
+        self.answered = answered
+        self.rtt = rtt
+
+    def __call__(self, command):
+        repeat, timeout = ping_probes(command)
+        received = repeat if self.answered else 0
+        lines = [
+            "Type escape sequence to abort.",
+            f"Sending {repeat}, 100-byte ICMP Echos to {command.split()[1]}, timeout is {timeout} seconds:",
+            ("!" if self.answered else ".") * repeat,
+            f"Success rate is {100 * received // repeat} percent ({received}/{repeat})",
+        ]
+        if received:
+            rtt = round(self.rtt * 1000)
+            lines[-1] += f", round-trip min/avg/max = {rtt}/{rtt}/{rtt} ms"
+        return "\n".join(lines)
+
+    def duration(self, command):
+        """Return the seconds the probes of a ping command take."""
+        repeat, timeout = ping_probes(command)
+        return repeat * (self.rtt if self.answered else timeout)
+
+
+def device_outputs(tenant_type="APLOS", provider="OTE", bgp_neighbor="", scenario="healthy", prefixes=1000):
+    """
+    Build the command outputs of a full health check of a fake CPE.
+
+    Pings are answered by 'ping' prefix rules with FakePing outputs (see
+    FakeDevice), so every host of config.py gets an answer.
+
+    Args:
+        tenant_type (str): The type of tenant (e.g., 'APLOS', 'PSD', 'MMM').
+        provider (str): The network provider (e.g., 'OTE', 'WIND').
+        bgp_neighbor (str): Comma-separated list of BGP neighbors (MMM tenants).
+        scenario (str): One of SCENARIOS.
+        prefixes (int): Routes in every BGP received/advertised routes table.
+
+    Returns:
+        dict: Command (or 'ping ' prefix) to output (or FakePing) map.
+    """
+    if scenario not in SCENARIOS:
+        raise ValueError(f"Unknown scenario {scenario!r}, expected one of {SCENARIOS}")
+    install_fake_config()
+    import config
+    import WAN_checks_API
+
+    outputs = {
+        "show run": "Building configuration...\n\n! Last configuration change at 10:22:31 UTC Tue Mar 14 2023 by admin\n!\nhostname FAKE-CPE\n!\nend",
+        "show running-config | include Last configuration change": "! Last configuration change at 10:22:31 UTC Tue Mar 14 2023 by admin",
+        "show version": corpus("show_version"),
+        "show license status": corpus("show_license_status"),
+        "show interface vlan200": corpus("ipv6_interface_invalid"),
+        "ping ": FakePing(),
+    }
+    # the interface_down scenario takes down the voice VLAN (data VLAN for MMM tenants)
+    down_interface = "vlan3000" if tenant_type == "MMM" else "vlan3100"
+    for interface in ("vlan3000", "vlan3100"):
+        outputs[f"show ipv6 interface {interface}"] = ipv6_interface(interface, up=not (scenario == "interface_down" and interface == down_interface))
+
+    if scenario == "ping_failure":
+        # the first data VLAN host is unreachable from every source
+        first_host = next(iter(config.data_vlan_hosts.values()))
+        outputs[f"ping {first_host} "] = FakePing(answered=False)
+
+    state = "Idle" if scenario == "bgp_idle" else "Established"
+    if tenant_type == "MMM":
+        for neighbor in WAN_checks_API.split_bgp_neighbors(bgp_neighbor):
+            outputs[f"show ip bgp neighbor {neighbor}"] = bgp_neighbor_block(neighbor, state, prefixes=(2, prefixes))
+    else:
+        ipv4_neighbor, ipv6_neighbor = WAN_checks_API.provider_bgp_neighbors(provider)
+        outputs[f"show ip bgp neighbor {ipv4_neighbor}"] = bgp_neighbor_block(ipv4_neighbor, state, prefixes=(2, prefixes))
+        outputs["show bgp ipv6 unicast neighbors"] = bgp_neighbor_block(ipv6_neighbor, state, "IPv6 Unicast", prefixes=(2, prefixes))
+        for command, neighbor in ((f"show ip bgp neighbors {ipv4_neighbor}", ipv4_neighbor),
+                                  (f"show bgp ipv6 unicast neighbors {ipv6_neighbor}", ipv6_neighbor)):
+            outputs[f"{command} received-routes"] = route_table(prefixes, neighbor)
+            outputs[f"{command} advertised-routes"] = route_table(prefixes, neighbor)
+    return outputs
+
+
+class FakeDevice:
+    """
+    Recorded outputs and latencies of a fake CPE router.
+
+    Output keys ending with a space are prefix rules: a command without an
+    exact match gets the output of the longest matching prefix (e.g.,
+    'ping ' answers every ping, 'ping 10.100.0.1 ' the pings to one host).
+    An output can be a callable taking the command, like FakePing, and its
+    'duration' method replaces the command latency.
+
+    Args:
+        hostname (str): Hostname shown in the prompt.
+        outputs (dict): Command to output map; unknown commands return an empty string.
+        handshake_latency (float): Seconds spent on every new SSH session.
+        command_latency (float): Seconds spent on every command.
+        command_latencies (dict): Optional command prefix to seconds map overriding
+                                  'command_latency' and FakePing durations (e.g., {'ping': 1.0}).
+    """
+
+    def __init__(self, hostname="FAKE-CPE", outputs=None, handshake_latency=0.0, command_latency=0.0, command_latencies=None):
+        self.hostname = hostname
+        self.outputs = outputs or {}
+        self.handshake_latency = handshake_latency
+        self.command_latency = command_latency
+        self.command_latencies = command_latencies or {}
+        self.handshakes = 0
+        self.commands = []
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def output(self, command):
+        """Return the recorded output of a command after its latency."""
+        time.sleep(self.latency(command))
+        return self.lookup(command)
+
+    def lookup(self, command):
+        """Record a command and return its output without waiting."""
+        with self._lock:
+            self.commands.append(command)
+        output = self._rule(command)
+        return output(command) if callable(output) else output
+
+    def _rule(self, command):
+        # exact command first, then the longest prefix rule
+        if command in self.outputs:
+            return self.outputs[command]
+        rules = [prefix for prefix in self.outputs if prefix.endswith(" ") and command.startswith(prefix)]
+        return self.outputs[max(rules, key=len)] if rules else ""
+
+    def latency(self, command):
+        """Return the seconds a command takes."""
+        prefixes = [prefix for prefix in self.command_latencies if command.startswith(prefix)]
+        if prefixes:
+            return self.command_latencies[max(prefixes, key=len)]
+        output = self._rule(command)
+        return output.duration(command) if hasattr(output, "duration") else self.command_latency
+
+
+class FakeConnection:
+    """A Netmiko-like connection to a FakeDevice."""
+
+    RETURN = "\n"
+
+    def __init__(self, fake_device, **device):
+        self.fake_device = fake_device
+        self.host = device.get("ip") or device.get("host")
+        self._alive = True
+        self._channel = ""
+        self._page_length = 0      # 'terminal length', 0 = no paging
+        self._paged_lines = []     # lines waiting behind a --More-- prompt
+        time.sleep(fake_device.handshake_latency)
+        with fake_device._lock:
+            fake_device.handshakes += 1
+
+    def find_prompt(self):
+        return f"{self.fake_device.hostname}#"
+
+    def send_command(self, command_string, **kwargs):
+        command = command_string.strip()
+        if command.startswith("terminal length "):
+            self._page_length = int(command.split()[-1])
+        output = self.fake_device.output(command)
+        self.fake_device.bytes_sent += len(output)
+        return output
+
+    def write_channel(self, out_data):
+        # answer to a --More-- prompt: space shows the next page, anything else aborts the output
+        if self._paged_lines:
+            # like IOS, the prompt is erased with backspaces before the device goes on
+            self._emit(MORE_ERASE)
+            if out_data.startswith(" "):
+                self._send_page()
+            else:
+                self._paged_lines = []
+                self._emit(f"\r\n{self.find_prompt()}")
+            return
+        # the device echoes every command line, then prints its output and the prompt
+        for command in out_data.splitlines():
+            self._emit(f"{command}\r\n")
+            self._paged_lines = self.fake_device.output(command.strip()).split("\n")
+            self._send_page()
+
+    def _send_page(self):
+        if self._page_length and len(self._paged_lines) > self._page_length - 1:
+            page, self._paged_lines = self._paged_lines[:self._page_length - 1], self._paged_lines[self._page_length - 1:]
+            self._emit("\r\n".join(page) + "\r\n --More-- ")
+        else:
+            page, self._paged_lines = self._paged_lines, []
+            self._emit("\r\n".join(page) + f"\r\n{self.find_prompt()}")
+
+    def _emit(self, data):
+        self.fake_device.bytes_sent += len(data)
+        self._channel += data
+
+    def read_channel(self):
+        data, self._channel = self._channel, ""
+        return data
+
+    def disable_paging(self, command="terminal length 0", **kwargs):
+        return self.send_command(command)
+
+    def clear_buffer(self, **kwargs):
+        return self.read_channel()
+
+    def is_alive(self):
+        return self._alive
+
+    def disconnect(self):
+        self._alive = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disconnect()
+
+
+def install_fake_device(fake_device):
+    """
+    Make WAN_checks_API open FakeConnection sessions to the given fake device.
+
+    Args:
+        fake_device (FakeDevice): The device every new session connects to.
+
+    Returns:
+        FakeDevice: The installed fake device.
+    """
+    install_fake_config()
+    import WAN_checks_API
+    WAN_checks_API.connect_netmiko = lambda **device: FakeConnection(fake_device, **device)
+    return fake_device
@@ -0,0 +1,113 @@
+"""
+SSH server serving a FakeDevice on localhost, for benchmarks over real SSH sessions.
+
+Unlike FakeConnection, which replaces the SSH client, FakeSSHServer lets both
+SSH engines (Netmiko and asyncssh) log in over TCP and talk to an emulated
+IOS CLI: echoed commands, the '<hostname>#' prompt, 'terminal length' paging
+with '--More--' prompts and the per-command latencies of the FakeDevice.
+Any username and password are accepted. Requires asyncssh.
+
+Usage:
+    server = FakeSSHServer(FakeDevice(outputs=device_outputs("APLOS", "OTE")))
+    port = server.start()
+    ...
+    server.stop()
+"""
+
+import asyncio
+import threading
+
+import asyncssh
+
+
+class _AcceptAllServer(asyncssh.SSHServer):
+    def begin_auth(self, username):
+        return True
+
+    def password_auth_supported(self):
+        return True
+
+    def validate_password(self, username, password):
+        return True
+
+
+class FakeSSHServer:
+    """
+    Serve a FakeDevice over SSH on 127.0.0.1 from a background event loop.
+
+    Args:
+        fake_device (FakeDevice): The device answering the commands.
+        port (int): TCP port, 0 picks a free one.
+    """
+
+    def __init__(self, fake_device, port=0):
+        self.fake_device = fake_device
+        self.port = port
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+        self.sessions = 0
+
+    def start(self):
+        """
+        Start the server thread.
+
+        Returns:
+            int: The port the server listens on.
+        """
+        threading.Thread(target=self._loop.run_forever, name='fake-ssh-server', daemon=True).start()
+        self._server = asyncio.run_coroutine_threadsafe(self._listen(), self._loop).result()
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    def stop(self):
+        """Close the server and stop its event loop."""
+        async def close():
+            self._server.close()
+            await self._server.wait_closed()
+        asyncio.run_coroutine_threadsafe(close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _listen(self):
+        return await asyncssh.create_server(
+            _AcceptAllServer, "127.0.0.1", self.port,
+            server_host_keys=[asyncssh.generate_private_key("ssh-ed25519")],
+            process_factory=self._session, line_editor=False, encoding="utf-8")
+
+    async def _session(self, process):
+        self.sessions += 1
+        with self.fake_device._lock:
+            self.fake_device.handshakes += 1
+        prompt = f"{self.fake_device.hostname}#"
+        page_length = 0
+        pending = ""
+        process.stdout.write(f"\r\n{prompt}")
+        try:
+            while True:
+                data = await process.stdin.read(4096)
+                if not data:
+                    break
+                pending += data.replace("\r\n", "\n").replace("\r", "\n")
+                while "\n" in pending:
+                    line, pending = pending.split("\n", 1)
+                    command = line.strip()
+                    process.stdout.write(f"{line}\r\n")
+                    if not command:
+                        process.stdout.write(prompt)
+                        continue
+                    if command.startswith("terminal length "):
+                        page_length = int(command.split()[-1])
+                    await asyncio.sleep(self.fake_device.latency(command))
+                    output_lines = self.fake_device.lookup(command).split("\n")
+                    # a '--More--' prompt after every page, space shows the next one, anything else aborts
+                    while page_length and len(output_lines) > page_length - 1:
+                        page, output_lines = output_lines[:page_length - 1], output_lines[page_length - 1:]
+                        process.stdout.write("\r\n".join(page) + "\r\n --More-- ")
+                        key = await process.stdin.read(1)
+                        if key != " ":
+                            output_lines = []
+                            break
+                    process.stdout.write("\r\n".join(output_lines) + f"\r\n{prompt}")
+        except (asyncssh.Error, OSError):
+            pass
+        finally:
+            process.exit(0)
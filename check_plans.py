@@ -0,0 +1,322 @@
+"""
+Declarative check plans of the WAN checks API and the step graph running them.
+
+A CheckPlan describes what is checked for a tenant type: the interfaces, the
+ping sets (source interface, host set of config.py, timeout), where the BGP
+neighbors come from and the ping pass threshold. WAN_checks_API compiles
+every plan once at startup into a graph of steps with dependencies;
+run_graph() runs the steps in parallel over several SSH sessions to the
+device as soon as their dependencies are done, and skips the steps that do
+not apply to the device (e.g., the vlan200 pings of an MMM tenant without
+vlan200). A new tenant type is a new plan (DEFAULT_PLANS, or CHECK_PLANS in
+config.py), not another branch in the check functions.
+
+A CheckProfile selects how much of a plan a request runs: 'quick' for
+triage (interface and BGP neighbor states, one Lo0 ping), 'standard' for
+the whole plan and 'full' for the whole plan without cached outputs or
+truncated BGP route tables. Every plan is compiled once per profile.
+"""
+
+import queue
+import threading
+import contextvars
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+@dataclass(frozen=True)
+class PingSet:
+    """
+    Pings from one source interface to a host set of config.py.
+
+    Attributes:
+        source (str): The source interface (e.g., 'Lo0', 'vlan3100').
+        title (str): Heading printed before the pings.
+        hosts (str): 'data' (data_vlan_hosts) or 'voice' (voice_vlan_hosts).
+        ipv6_only (bool): Ping only the hosts with 'v6' in their name.
+        read_timeout (float): Seconds to wait for every ping, None for the Netmiko default.
+        requires (str): Interface that must be configured on the device, None to always ping.
+    """
+    source: str
+    title: str
+    hosts: str
+    ipv6_only: bool = False
+    read_timeout: float = None
+    requires: str = None
+
+
+@dataclass(frozen=True)
+class CheckPlan:
+    """
+    The checks of a tenant type.
+
+    Attributes:
+        tenant_type (str): The type of tenant (e.g., 'APLOS', 'PSD', 'MMM').
+        interfaces (tuple): Interfaces whose 'show ipv6 interface' status is checked.
+        optional_interfaces (tuple): Interfaces checked only when 'show interface X' accepts them.
+        ping_sets (tuple): The PingSets, in execution order.
+        bgp (str): 'provider' for the IPv4/IPv6 neighbors of the provider in config.py and their
+                   route tables, 'request' for the comma-separated neighbors of the request.
+        ping_success_threshold (int): Percent of answered probes for a successful ping, None for PING_SUCCESS_THRESHOLD.
+    """
+    tenant_type: str
+    interfaces: tuple = ()
+    optional_interfaces: tuple = ()
+    ping_sets: tuple = ()
+    bgp: str = "provider"
+    ping_success_threshold: int = None
+
+
+LO0_PINGS = PingSet("Lo0", "Loopback0 - Data VLAN Hosts", "data", read_timeout=15)
+VLAN3000_PINGS = PingSet("vlan3000", "VLAN3000 - Data VLAN Hosts", "data", read_timeout=15)
+VLAN3100_PINGS = PingSet("vlan3100", "VLAN3100 - Voice VLAN Hosts", "voice", ipv6_only=True)
+# EFKA tenants only, they have the vlan200 voice VLAN
+VLAN200_PINGS = PingSet("vlan200", "VLAN200 - Voice VLAN Hosts", "voice", requires="vlan200")
+
+DEFAULT_PLANS = {
+    # Απλος Ασυμμετρος
+    "APLOS": CheckPlan("APLOS", interfaces=("vlan3000", "vlan3100"), ping_sets=(LO0_PINGS, VLAN3100_PINGS, VLAN3000_PINGS)),
+    # ΠΣΔ Ασυμμετρος, no data VLAN 3000
+    "PSD": CheckPlan("PSD", interfaces=("vlan3100",), ping_sets=(LO0_PINGS, VLAN3100_PINGS)),
+    "MMM": CheckPlan("MMM", interfaces=("vlan3000",), optional_interfaces=("vlan200",),
+                     ping_sets=(LO0_PINGS, VLAN200_PINGS), bgp="request"),
+}
+
+
+def load_plans(overrides=None):
+    """
+    Return the check plans, with the plans of config.py added or replacing the defaults.
+
+    Args:
+        overrides (dict): Tenant type to plan settings, e.g.
+            {'APLOS2': {'interfaces': ['vlan3000'], 'bgp': 'provider',
+                        'ping_sets': [{'source': 'Lo0', 'title': 'Loopback0', 'hosts': 'data'}]}}
+
+    Returns:
+        dict: Tenant type to CheckPlan map.
+
+    Raises:
+        ValueError: If a plan has an unknown BGP mode or host set.
+    """
+    plans = dict(DEFAULT_PLANS)
+    for tenant_type, settings in (overrides or {}).items():
+        settings = dict(settings)
+        settings["ping_sets"] = tuple(ping_set if isinstance(ping_set, PingSet) else PingSet(**ping_set)
+                                      for ping_set in settings.get("ping_sets", ()))
+        for key in ("interfaces", "optional_interfaces"):
+            settings[key] = tuple(settings.get(key, ()))
+        plans[tenant_type] = CheckPlan(tenant_type, **settings)
+
+    for plan in plans.values():
+        if plan.bgp not in ("provider", "request"):
+            raise ValueError(f"Check plan {plan.tenant_type}: bgp must be 'provider' or 'request', not {plan.bgp!r}")
+        for ping_set in plan.ping_sets:
+            if ping_set.hosts not in ("data", "voice"):
+                raise ValueError(f"Check plan {plan.tenant_type}: ping set {ping_set.source} hosts must be 'data' or 'voice'")
+    return plans
+
+
+@dataclass(frozen=True)
+class CheckProfile:
+    """
+    How much of a check plan is run for a request.
+
+    Attributes:
+        name (str): The profile name of the requests.
+        show_run (bool): Read the running-config.
+        version_license (bool): Check the serial number, the system image and the license.
+        ping_sets (int): Number of the plan's ping sets run, in plan order, None for all of them.
+        ping_hosts (int): Number of hosts pinged per ping set, None for all of them.
+        bgp_routes (bool): Read the BGP route tables of the provider neighbors, not only the neighbor states.
+        bgp_routes_max_lines (int): Route table lines captured per command, None for BGP_ROUTES_MAX_LINES, 0 for the whole table.
+        use_cache (bool): Serve 'show run', 'show version' and 'show license status' from the device cache.
+    """
+    name: str
+    show_run: bool = True
+    version_license: bool = True
+    ping_sets: int = None
+    ping_hosts: int = None
+    bgp_routes: bool = True
+    bgp_routes_max_lines: int = None
+    use_cache: bool = True
+
+
+CHECK_PROFILES = {
+    # triage: interface states, BGP neighbor states and one Lo0 ping, in seconds
+    "quick": CheckProfile("quick", show_run=False, version_license=False, ping_sets=1, ping_hosts=1, bgp_routes=False,
+                          use_cache=False),
+    "standard": CheckProfile("standard"),
+    # everything read from the device, whole BGP route tables
+    "full": CheckProfile("full", bgp_routes_max_lines=0, use_cache=False),
+}
+
+
+@dataclass(frozen=True)
+class Step:
+    """
+    A step of a check graph.
+
+    Attributes:
+        name (str): Unique step name.
+        run (callable): Called with (context, session); 'session' is None for steps without one.
+        after (tuple): Names of the steps that must be done first.
+        stage (str): Timing stage of the step, None for untimed steps.
+        session (bool): Whether the step sends commands to the device.
+        when (callable): Optional predicate on the context; the step is skipped when it returns False.
+    """
+    name: str
+    run: object
+    after: tuple = ()
+    stage: str = None
+    session: bool = True
+    when: object = field(default=None, compare=False)
+
+
+def compile_graph(steps):
+    """
+    Validate the steps of a graph and order them so that every step comes after its dependencies.
+
+    Steps keep their declaration order wherever the dependencies allow it, which
+    is the order they run in with a single session.
+
+    Args:
+        steps (list): The Steps.
+
+    Returns:
+        tuple: The ordered Steps.
+
+    Raises:
+        ValueError: On duplicate names, unknown dependencies or dependency cycles.
+    """
+    names = [step.name for step in steps]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate step names in {names}")
+    for step in steps:
+        unknown = set(step.after) - set(names)
+        if unknown:
+            raise ValueError(f"Step {step.name} depends on unknown steps {sorted(unknown)}")
+
+    ordered, placed, remaining = [], set(), list(steps)
+    while remaining:
+        ready = next((step for step in remaining if set(step.after) <= placed), None)
+        if ready is None:
+            raise ValueError(f"Dependency cycle between steps {[step.name for step in remaining]}")
+        ordered.append(ready)
+        placed.add(ready.name)
+        remaining.remove(ready)
+    return tuple(ordered)
+
+
+class SessionSet:
+    """
+    SSH sessions to one device shared by the steps of a check.
+
+    The check's own session is used first; more sessions are opened with
+    'open_extra' while all are busy, up to 'max_sessions'. When an extra
+    session cannot be opened, the step waits for a busy one instead.
+
+    Args:
+        primary (object): The session of the check.
+        open_extra (callable): Opens an additional session (may raise).
+        max_sessions (int): Maximum number of sessions used at the same time.
+    """
+
+    def __init__(self, primary, open_extra, max_sessions):
+        self._idle = queue.Queue()
+        self._idle.put(primary)
+        self._open_extra = open_extra
+        self._max_sessions = max_sessions
+        self._opened = 1
+        self._lock = threading.Lock()
+        self.extra_sessions = []
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self._max_sessions
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                session = self._open_extra()
+                self.extra_sessions.append(session)
+                return session
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                    self._max_sessions = self._opened   # the device refuses more sessions
+        return self._idle.get()
+
+    def release(self, session):
+        self._idle.put(session)
+
+
+def _run_step(step, context, sessions, stage_timer):
+    session = sessions.acquire() if step.session else None
+    try:
+        if step.stage and stage_timer:
+            with stage_timer(step.stage):
+                step.run(context, session)
+        else:
+            step.run(context, session)
+    finally:
+        if session is not None:
+            sessions.release(session)
+
+
+def run_graph(graph, context, sessions, max_parallel=1, stage_timer=None):
+    """
+    Run the steps of a compiled graph.
+
+    With max_parallel 1 the steps run one after the other in graph order;
+    otherwise every step starts as soon as its dependencies are done, up to
+    'max_parallel' steps at the same time. A step whose 'when' predicate is
+    False is skipped (and counts as done). The first failing step stops the
+    graph: no further steps start and its exception is raised.
+
+    Args:
+        graph (tuple): Steps ordered by compile_graph().
+        context (dict): Shared state of the check, passed to every step.
+        sessions (SessionSet): The SSH sessions of the device.
+        max_parallel (int): Maximum number of steps running at the same time.
+        stage_timer (callable): Optional context manager factory timing the step stages.
+
+    Returns:
+        list: The names of the skipped steps.
+    """
+    skipped = []
+    if max_parallel <= 1:
+        for step in graph:
+            if step.when and not step.when(context):
+                skipped.append(step.name)
+                continue
+            _run_step(step, context, sessions, stage_timer)
+        return skipped
+
+    done, pending, running = set(), list(graph), {}
+    with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix='wanchecks-step') as executor:
+        while pending or running:
+            for step in [step for step in pending if set(step.after) <= done]:
+                pending.remove(step)
+                if step.when and not step.when(context):
+                    skipped.append(step.name)
+                    done.add(step.name)
+                    continue
+                future = executor.submit(contextvars.copy_context().run, _run_step, step, context, sessions, stage_timer)
+                running[future] = step
+            if not running:
+                continue    # skipped steps may have unblocked others
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                try:
+                    future.result()
+                except Exception:
+                    pending.clear()
+                    wait(running)
+                    raise
+                done.add(step.name)
+    return skipped
@@ -0,0 +1,133 @@
+"""
+Per-device circuit breaker and retry backoff for the WAN checks API.
+
+A CPE that is down makes every check wait out the whole SSH connect
+timeout, holding a worker and a check slot of the device while it does.
+The CircuitBreaker counts the consecutive connect failures of every device;
+after 'failure_threshold' of them the device's circuit opens and checks are
+rejected right away for a cooldown window. When the window ends, one trial
+check may connect: success closes the circuit, failure opens it again for a
+doubled cooldown (up to 'max_cooldown').
+
+backoff_delay() gives the waits between the connection retries of batch and
+scheduled checks: exponential, capped and with jitter, so retries of many
+devices do not hit the network at the same moment.
+"""
+
+import time
+import random
+import threading
+
+
+def backoff_delay(attempt, base, maximum):
+    """
+    Return the wait before a retry: base * 2^attempt, capped at 'maximum', with jitter.
+
+    Args:
+        attempt (int): The number of the failed attempt, starting at 0.
+        base (float): Seconds before the first retry.
+        maximum (float): Longest wait in seconds.
+
+    Returns:
+        float: Seconds to wait, between half and all of the capped exponential delay.
+    """
+    delay = min(maximum, base * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+
+class CircuitBreaker:
+    """
+    Reject the checks of devices whose SSH connections keep failing.
+
+    Args:
+        failure_threshold (int): Consecutive connect failures opening the circuit of a device, 0 to never open it.
+        cooldown (float): Seconds an opened circuit rejects checks.
+        max_cooldown (float): Longest cooldown after failed trials (the cooldown doubles with each of them).
+    """
+
+    def __init__(self, failure_threshold=3, cooldown=60, max_cooldown=900):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._devices = {}        # device ip -> failure state
+        self._lock = threading.Lock()
+        self.metrics = {"opened": 0, "rejected": 0}
+
+    def allow(self, device_ip, trial=True):
+        """
+        Check whether a check of the device may connect.
+
+        While the circuit is open this returns the seconds left of its cooldown.
+        The first call after the cooldown is the trial and is allowed; the
+        calls made while the trial runs are rejected with the full cooldown.
+
+        Args:
+            device_ip (str): The IP address of the device.
+            trial (bool): Start the trial when the cooldown is over; False only checks that
+                          the circuit is not open (e.g., before waiting in line for the device).
+
+        Returns:
+            float: None if the check may connect, else the seconds until the next trial.
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._devices.get(device_ip)
+            if state is None or state["open_until"] is None:
+                return None
+            if now >= state["open_until"]:
+                if not trial:
+                    return None
+                # the trial of this cooldown; a trial never reported is replaced after another cooldown
+                state["open_until"] = now + state["cooldown"]
+                return None
+            self.metrics["rejected"] += 1
+            return state["open_until"] - now
+
+    def record_success(self, device_ip):
+        """Close the circuit of a device after a successful connection."""
+        with self._lock:
+            self._devices.pop(device_ip, None)
+
+    def record_failure(self, device_ip, error):
+        """
+        Count a failed connection of a device, opening its circuit at the threshold.
+
+        Args:
+            device_ip (str): The IP address of the device.
+            error (Exception or str): The connect error.
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._devices.setdefault(device_ip, {"failures": 0, "open_until": None, "cooldown": None,
+                                                         "opened_at": None, "last_error": None})
+            state["failures"] += 1
+            state["last_error"] = f"{type(error).__name__}: {error}" if isinstance(error, Exception) else str(error)
+            if not self.failure_threshold or state["failures"] < self.failure_threshold:
+                return
+            # a failed trial doubles the cooldown
+            state["cooldown"] = self.cooldown if state["cooldown"] is None else min(self.max_cooldown, state["cooldown"] * 2)
+            state["open_until"] = now + state["cooldown"]
+            state["opened_at"] = time.time()
+            self.metrics["opened"] += 1
+
+    def stats(self):
+        """
+        Return the failure counts of the devices with failed connections and the breaker counters.
+
+        Returns:
+            dict: The breaker counters and, per device IP, the consecutive failures, whether the
+            circuit is open, the seconds left of its cooldown and the last connect error.
+        """
+        now = time.monotonic()
+        with self._lock:
+            devices = {
+                device_ip: {
+                    "failures": state["failures"],
+                    "open": state["open_until"] is not None and now < state["open_until"],
+                    "retry_after": round(max(0.0, state["open_until"] - now), 1) if state["open_until"] else None,
+                    "cooldown": state["cooldown"],
+                    "last_error": state["last_error"],
+                }
+                for device_ip, state in sorted(self._devices.items())
+            }
+            return {**self.metrics, "devices": devices}
@@ -0,0 +1,221 @@
+"""
+In-process SSH connection pool for the WAN checks API.
+
+Opening a Netmiko session costs a full SSH handshake and login. The pool
+keeps sessions open after a check, keyed by device IP, so back-to-back checks
+on the same CPE reuse them. Idle sessions are validated before reuse and
+closed after an idle timeout, and the number of sessions per device is capped
+so the checks never exhaust the VTY lines of a router.
+"""
+
+import time
+import threading
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no session to a device is available within the acquire timeout."""
+
+
+class ConnectionPool:
+    """
+    Keep SSH sessions open between checks.
+
+    Args:
+        connect (callable): Opens a new session from a device dictionary (e.g., ConnectHandler).
+        max_sessions_per_device (int): Maximum number of open sessions (idle and in use) per device.
+        idle_timeout (float): Seconds an unused session is kept open; 0 closes sessions on release.
+        acquire_timeout (float): Seconds to wait for a free session when a device is at its limit.
+        reap_interval (float): Seconds between two runs of the idle session reaper.
+    """
+
+    def __init__(self, connect, max_sessions_per_device=3, idle_timeout=300, acquire_timeout=120, reap_interval=30):
+        self._connect = connect
+        self.max_sessions_per_device = max_sessions_per_device
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.reap_interval = reap_interval
+        self._idle = {}          # device ip -> list of (connection, last used time)
+        self._open = {}          # device ip -> number of open sessions (idle and in use)
+        self._owners = {}        # id(connection) -> device ip of the sessions in use
+        self._cond = threading.Condition()
+        self._reaper = None
+        self._closed = False
+        self.metrics = {"hits": 0, "misses": 0, "evictions": 0, "validation_failures": 0, "connect_failures": 0}
+
+    def acquire(self, device, block=True):
+        """
+        Return an open session to a device, reusing an idle one when possible.
+
+        Args:
+            device (dict): A dictionary containing device connection details.
+            block (bool): Wait for a free session when the device is at its session limit.
+
+        Returns:
+            object: A Netmiko connection object.
+
+        Raises:
+            PoolExhaustedError: If the device is at its session limit and no session was released in time.
+        """
+        device_ip = device['ip']
+        deadline = time.monotonic() + self.acquire_timeout
+        self._start_reaper()
+
+        while True:
+            connection = None
+            with self._cond:
+                while True:
+                    idle = self._idle.get(device_ip)
+                    if idle:
+                        connection, _ = idle.pop()
+                        break
+                    if self._open.get(device_ip, 0) < self.max_sessions_per_device:
+                        # reserve the slot of the new session
+                        self._open[device_ip] = self._open.get(device_ip, 0) + 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if not block or remaining <= 0:
+                        raise PoolExhaustedError(f"{self.max_sessions_per_device} sessions to {device_ip} already in use")
+                    self._cond.wait(remaining)
+
+            if connection is None:
+                try:
+                    connection = self._connect(device)
+                except Exception:
+                    self._count("connect_failures")
+                    self._forget(device_ip)
+                    raise
+                self._count("misses")
+                break
+
+            # health validation of the idle session before reuse
+            if self._is_healthy(connection):
+                self._count("hits")
+                break
+            self._count("validation_failures")
+            self._close(connection)
+            self._forget(device_ip)
+
+        with self._cond:
+            self._owners[id(connection)] = device_ip
+        return connection
+
+    def release(self, connection):
+        """
+        Return a healthy session to the pool for reuse.
+
+        Args:
+            connection (object): A connection returned by acquire().
+        """
+        with self._cond:
+            device_ip = self._owners.pop(id(connection), None)
+            if device_ip is None:
+                return
+            if not self._closed and self.idle_timeout > 0:
+                self._idle.setdefault(device_ip, []).append((connection, time.monotonic()))
+                self._cond.notify_all()
+                return
+        self._close(connection)
+        self._forget(device_ip)
+
+    def discard(self, connection):
+        """
+        Close a session instead of returning it to the pool (e.g., after a failed check).
+
+        Args:
+            connection (object): A connection returned by acquire().
+        """
+        with self._cond:
+            device_ip = self._owners.pop(id(connection), None)
+        self._close(connection)
+        if device_ip is not None:
+            self._forget(device_ip)
+
+    def stats(self):
+        """
+        Return the pool metrics and the open sessions per device.
+
+        Returns:
+            dict: Hit/miss/eviction counters and the idle/in use sessions per device.
+        """
+        with self._cond:
+            devices = {
+                device_ip: {"open": count, "idle": len(self._idle.get(device_ip, []))}
+                for device_ip, count in self._open.items()
+            }
+            metrics = dict(self.metrics)
+        lookups = metrics["hits"] + metrics["misses"]
+        return {
+            **metrics,
+            "hit_ratio": round(metrics["hits"] / lookups, 3) if lookups else None,
+            "max_sessions_per_device": self.max_sessions_per_device,
+            "idle_timeout": self.idle_timeout,
+            "devices": devices,
+        }
+
+    def evict_idle(self):
+        """Close the sessions that have been idle for longer than the idle timeout."""
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            for device_ip, idle in self._idle.items():
+                for entry in list(idle):
+                    if now - entry[1] > self.idle_timeout:
+                        idle.remove(entry)
+                        expired.append((device_ip, entry[0]))
+        for device_ip, connection in expired:
+            self._count("evictions")
+            self._close(connection)
+            self._forget(device_ip)
+
+    def close_all(self):
+        """Close every idle session and stop pooling released ones (used at shutdown)."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, {}
+        for device_ip, entries in idle.items():
+            for connection, _ in entries:
+                self._close(connection)
+                self._forget(device_ip)
+
+    def _count(self, metric):
+        # the request threads update the counters concurrently
+        with self._cond:
+            self.metrics[metric] += 1
+
+    def _forget(self, device_ip):
+        with self._cond:
+            self._open[device_ip] = self._open.get(device_ip, 1) - 1
+            if self._open[device_ip] <= 0:
+                self._open.pop(device_ip, None)
+                self._idle.pop(device_ip, None)
+            self._cond.notify_all()
+
+    def _start_reaper(self):
+        if self._reaper is not None or self.idle_timeout <= 0:
+            return
+        with self._cond:
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_forever, name='wanchecks-pool-reaper', daemon=True)
+                self._reaper.start()
+
+    def _reap_forever(self):
+        while not self._closed:
+            time.sleep(self.reap_interval)
+            self.evict_idle()
+
+    @staticmethod
+    def _is_healthy(connection):
+        try:
+            if not connection.is_alive():
+                return False
+            connection.clear_buffer()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.disconnect()
+        except Exception:
+            pass
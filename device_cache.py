@@ -0,0 +1,117 @@
+"""
+TTL cache of slowly changing device outputs for the WAN checks API.
+
+'show run', 'show version' and 'show license status' rarely change between
+two checks of the same CPE. The DeviceCache keeps their outputs per device IP,
+each command with its own time to live, so repeated checks only do the live
+state work (interfaces, pings, BGP). All entries of a device are dropped when
+its running-config last-change timestamp differs from the cached one.
+"""
+
+import time
+import threading
+
+
+class DeviceCache:
+    """
+    Cache command outputs per device IP.
+
+    Args:
+        ttls (dict): Command to time to live in seconds; commands missing or with a TTL of 0 are never cached.
+    """
+
+    def __init__(self, ttls):
+        self.ttls = dict(ttls)
+        self._entries = {}        # device ip -> {command: (output, expiry time)}
+        self._config_stamps = {}  # device ip -> running-config last-change timestamp
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get_outputs(self, device_ip, commands):
+        """
+        Return the cached, unexpired outputs of the given commands.
+
+        Args:
+            device_ip (str): The IP address of the device.
+            commands (list): The commands to look up.
+
+        Returns:
+            dict: Command to output map of the cache hits.
+        """
+        now = time.monotonic()
+        outputs = {}
+        with self._lock:
+            entries = self._entries.get(device_ip, {})
+            for command in commands:
+                if self.ttls.get(command, 0) <= 0:
+                    continue
+                entry = entries.get(command)
+                if entry and entry[1] > now:
+                    outputs[command] = entry[0]
+                    self.metrics["hits"] += 1
+                else:
+                    entries.pop(command, None)
+                    self.metrics["misses"] += 1
+        return outputs
+
+    def put_outputs(self, device_ip, outputs):
+        """
+        Store command outputs of a device, each with the TTL of its command.
+
+        Args:
+            device_ip (str): The IP address of the device.
+            outputs (dict): Command to output map.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries.setdefault(device_ip, {})
+            for command, output in outputs.items():
+                ttl = self.ttls.get(command, 0)
+                if ttl > 0 and command not in entries:
+                    entries[command] = (output, now + ttl)
+
+    def has_entries(self, device_ip):
+        """Return True when any output of the device is cached."""
+        with self._lock:
+            return bool(self._entries.get(device_ip))
+
+    def check_config_change(self, device_ip, config_stamp):
+        """
+        Drop the cached outputs of a device when its configuration changed.
+
+        Args:
+            device_ip (str): The IP address of the device.
+            config_stamp (str): The current running-config last-change timestamp, None if unknown.
+
+        Returns:
+            bool: True when the cached outputs were invalidated.
+        """
+        with self._lock:
+            previous = self._config_stamps.get(device_ip)
+            self._config_stamps[device_ip] = config_stamp
+            if previous is None or config_stamp is None or previous == config_stamp:
+                return False
+        self.invalidate(device_ip)
+        return True
+
+    def set_config_stamp(self, device_ip, config_stamp):
+        """Remember the running-config last-change timestamp of freshly read outputs."""
+        with self._lock:
+            self._config_stamps[device_ip] = config_stamp
+
+    def invalidate(self, device_ip):
+        """Drop all cached outputs of a device."""
+        with self._lock:
+            if self._entries.pop(device_ip, None):
+                self.metrics["invalidations"] += 1
+
+    def stats(self):
+        """
+        Return the cache counters and the number of cached devices.
+
+        Returns:
+            dict: Hit/miss/invalidation counters, TTLs and cached device count.
+        """
+        with self._lock:
+            devices = sum(1 for entries in self._entries.values() if entries)
+        return {**self.metrics, "ttls": self.ttls, "devices": devices}
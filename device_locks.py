@@ -0,0 +1,131 @@
+"""
+Per-device request coalescing and check limits for the WAN checks API.
+
+Two flows checking the same CPE at the same moment would otherwise open two
+SSH sessions and run the whole ping and BGP suite twice. SingleFlight lets
+identical concurrent requests share one execution and its result, and
+DeviceLimiter caps the checks running on a device at the same time: the
+checks over the limit wait in line instead of failing the login on a router
+whose VTY lines are taken.
+"""
+
+import time
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Share the result of identical concurrent calls.
+
+    The first call with a key runs the function; calls with the same key made
+    while it runs wait for it and receive its result (or its exception).
+    """
+
+    def __init__(self):
+        self._calls = {}          # key -> Future of the running call
+        self._lock = threading.Lock()
+        self.metrics = {"executions": 0, "coalesced": 0}
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Run a function once for all concurrent callers with the same key.
+
+        Args:
+            key (hashable): Identifies identical calls.
+            func (callable): The function to run.
+            *args: Positional arguments of the function.
+            **kwargs: Keyword arguments of the function.
+
+        Returns:
+            tuple: The return value of the function and whether it came from another caller's execution.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.metrics["executions"] += 1
+            else:
+                self.metrics["coalesced"] += 1
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = func(*args, **kwargs)
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self):
+        """Return the number of calls currently running."""
+        with self._lock:
+            return len(self._calls)
+
+
+class DeviceLimiter:
+    """
+    Cap the number of checks running on the same device.
+
+    Args:
+        max_per_device (int): Checks allowed to run on a device at the same time.
+        timeout (float): Seconds a check waits for its turn before acquire() gives up.
+    """
+
+    def __init__(self, max_per_device=1, timeout=600):
+        self.max_per_device = max_per_device
+        self.timeout = timeout
+        self._running = {}        # device ip -> running checks
+        self._waiting = {}        # device ip -> checks waiting for their turn
+        self._cond = threading.Condition()
+
+    def acquire(self, device_ip):
+        """
+        Wait until a check slot of the device is free and take it.
+
+        Args:
+            device_ip (str): The IP address of the device.
+
+        Returns:
+            bool: True if the slot was taken, False if the timeout expired first.
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._waiting[device_ip] = self._waiting.get(device_ip, 0) + 1
+            try:
+                while self._running.get(device_ip, 0) >= self.max_per_device:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self._running[device_ip] = self._running.get(device_ip, 0) + 1
+                return True
+            finally:
+                self._waiting[device_ip] -= 1
+                if not self._waiting[device_ip]:
+                    del self._waiting[device_ip]
+
+    def release(self, device_ip):
+        """Free the check slot taken by acquire()."""
+        with self._cond:
+            self._running[device_ip] -= 1
+            if not self._running[device_ip]:
+                del self._running[device_ip]
+            self._cond.notify_all()
+
+    def stats(self):
+        """
+        Return the running and waiting checks per busy device.
+
+        Returns:
+            dict: Device IP to running/waiting check counts.
+        """
+        with self._cond:
+            return {device_ip: {"running": self._running.get(device_ip, 0), "waiting": self._waiting.get(device_ip, 0)}
+                    for device_ip in sorted(set(self._running) | set(self._waiting))}
@@ -0,0 +1,340 @@
+"""
+Scheduled fleet sweeps for the WAN checks API.
+
+The FleetSweeper reads a device inventory and checks every device on a
+fixed interval, with the same check function as the /wanchecks/ endpoint.
+The checks start at a steady pace: a global and per-provider rate (checks
+started per second) and concurrency limit, plus a random start jitter, so a
+nightly sweep of 1,000 CPEs neither floods a provider's network nor the
+SSH capacity of the host. The summaries of the last sweeps are kept in
+memory for the sweep endpoint.
+
+The inventory is a JSON list of device entries (or an object with a
+'devices' list), or a CSV file with a header row; an entry has the
+/wanchecks/ request fields device_ip, tenant_type, provider and the
+optional bgp_neighbor. The file is read again at the start of every sweep.
+"""
+
+import csv
+import copy
+import json
+import time
+import random
+import threading
+import contextvars
+from collections import deque
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from termcolor import cprint
+
+
+REQUIRED_FIELDS = ("device_ip", "tenant_type", "provider")
+
+# Outcomes of a device check: all reports OK, a *_REPORT is FAIL, no check (e.g. login failed), exception or rejected entry
+OUTCOMES = ("ok", "failed", "unreachable", "error")
+
+
+def load_inventory(path):
+    """
+    Read the device entries of an inventory file.
+
+    Args:
+        path (str): A .json or .csv inventory file.
+
+    Returns:
+        list: The device entries (dictionaries with device_ip, tenant_type, provider and bgp_neighbor).
+
+    Raises:
+        ValueError: If the file has no device list or an entry misses a required field.
+    """
+    with open(path, newline='', encoding='utf-8') as inventory_file:
+        if path.lower().endswith('.csv'):
+            entries = list(csv.DictReader(inventory_file))
+        else:
+            entries = json.load(inventory_file)
+    if isinstance(entries, dict):
+        entries = entries.get('devices')
+    if not isinstance(entries, list):
+        raise ValueError(f"{path} does not contain a list of devices")
+
+    devices = []
+    for position, entry in enumerate(entries):
+        missing = [key for key in REQUIRED_FIELDS if not isinstance(entry, dict) or not entry.get(key)]
+        if missing:
+            raise ValueError(f"{path}: device entry {position} is missing {', '.join(missing)}")
+        devices.append({
+            "device_ip": entry["device_ip"].strip(),
+            "tenant_type": entry["tenant_type"].strip(),
+            "provider": entry["provider"].strip(),
+            "bgp_neighbor": (entry.get("bgp_neighbor") or "").strip(),
+        })
+    return devices
+
+
+class _Pace:
+    """Concurrency and start-rate limit of a set of checks (the whole sweep or one provider)."""
+
+    def __init__(self, max_workers=None, rate=None):
+        self.max_workers = max_workers
+        self.interval = 1.0 / rate if rate else 0.0
+        self.running = 0
+        self.next_start = 0.0
+
+    def wait_time(self, now):
+        # seconds until a check may start, None while all workers are busy
+        if self.max_workers and self.running >= self.max_workers:
+            return None
+        return max(0.0, self.next_start - now)
+
+    def start(self, now):
+        self.running += 1
+        self.next_start = max(self.next_start, now) + self.interval
+
+    def finish(self):
+        self.running -= 1
+
+
+class FleetSweeper:
+    """
+    Check every device of an inventory file on a fixed interval.
+
+    Args:
+        check_func (callable): Called with (device_ip, tenant_type, provider, bgp_neighbor),
+                               returns a (response data, HTTP status code) tuple.
+        inventory_path (str): The inventory file.
+        interval (float): Seconds between the starts of two sweeps, 0 for sweeps started with trigger() only.
+        max_workers (int): Devices checked at the same time.
+        rate (float): Checks started per second, 0 for no limit.
+        provider_limits (dict): Provider to {'max_workers': int, 'rate': float} limits.
+        jitter (float): Maximum random delay in seconds added to the start of every check.
+        start_time (str): 'HH:MM' local time of the first sweep, None to start right away.
+        keep_sweeps (int): Number of sweep summaries kept.
+    """
+
+    def __init__(self, check_func, inventory_path, interval=86400, max_workers=10, rate=1.0,
+                 provider_limits=None, jitter=0, start_time=None, keep_sweeps=10):
+        self.check_func = check_func
+        self.inventory_path = inventory_path
+        self.interval = interval
+        self.max_workers = max_workers
+        self.rate = rate
+        self.provider_limits = {provider.upper(): limits for provider, limits in (provider_limits or {}).items()}
+        self.jitter = jitter
+        self.start_time = start_time
+        self.sweeps = deque(maxlen=keep_sweeps)
+        self.next_sweep = None
+        self._lock = threading.Condition()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._running = None
+        self._sweep_count = 0
+        self._thread = None
+
+    def start(self):
+        """Start the scheduler thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._schedule, name='wanchecks-sweep', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the scheduler; a running sweep starts no further checks."""
+        self._stop.set()
+        self._wake.set()
+
+    def trigger(self):
+        """
+        Start a sweep now instead of at the next scheduled time.
+
+        The scheduler thread is started when it is not running yet (e.g., in a
+        process without start_services()), so the sweep always runs.
+
+        Returns:
+            bool: False if a sweep is already running.
+
+        Raises:
+            RuntimeError: If the scheduler was stopped.
+        """
+        with self._lock:
+            if self._running is not None:
+                return False
+            if self._stop.is_set():
+                raise RuntimeError("The fleet sweep scheduler is stopped")
+            self.next_sweep = time.time()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = None
+                self.start()
+        self._wake.set()
+        return True
+
+    def _first_sweep_time(self):
+        if not self.start_time:
+            return time.time()
+        hour, minute = (int(part) for part in self.start_time.split(':'))
+        first = datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if first < datetime.now():
+            first += timedelta(days=1)
+        return first.timestamp()
+
+    def _schedule(self):
+        if self.interval and self.next_sweep is None:
+            self.next_sweep = self._first_sweep_time()
+        while not self._stop.is_set():
+            self._wake.wait(None if self.next_sweep is None else max(0.0, self.next_sweep - time.time()))
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if self.next_sweep is None or time.time() < self.next_sweep:
+                continue
+            started = time.time()
+            try:
+                self.run_sweep()
+            except Exception as e:
+                cprint(f"Fleet sweep failed: {e}", 'red')
+            # keep the schedule: the next sweep starts 'interval' seconds after this one started
+            self.next_sweep = max(started + self.interval, time.time()) if self.interval else None
+
+    def run_sweep(self):
+        """
+        Check every device of the inventory once, within the rate and concurrency limits.
+
+        Returns:
+            dict: The sweep summary.
+        """
+        with self._lock:
+            self._sweep_count += 1
+            summary = {
+                "sweep": self._sweep_count,
+                "status": "running",
+                "started_at": datetime.now().isoformat(timespec='seconds'),
+                "finished_at": None,
+                "elapsed_seconds": None,
+                "devices": 0,
+                "checked": 0,
+                "results": dict.fromkeys(OUTCOMES, 0),
+                "providers": {},
+                "failed_devices": [],
+            }
+            self._running = summary
+            self.sweeps.append(summary)
+        started = time.monotonic()
+        try:
+            devices = load_inventory(self.inventory_path)
+            summary["devices"] = len(devices)
+            cprint(f"Fleet sweep {summary['sweep']}: checking {len(devices)} devices", 'yellow')
+            self._dispatch(devices, summary)
+            summary["status"] = "stopped" if self._stop.is_set() else "finished"
+        except Exception as e:
+            summary["status"] = "error"
+            summary["error"] = str(e)
+            raise
+        finally:
+            summary["finished_at"] = datetime.now().isoformat(timespec='seconds')
+            summary["elapsed_seconds"] = round(time.monotonic() - started, 1)
+            with self._lock:
+                self._running = None
+            cprint(f"Fleet sweep {summary['sweep']} {summary['status']}: {summary['results']}", 'yellow')
+        return summary
+
+    def _dispatch(self, devices, summary):
+        pending = list(devices)
+        overall = _Pace(self.max_workers, self.rate)
+        providers = {}
+
+        def provider_pace(provider):
+            if provider not in providers:
+                limits = self.provider_limits.get(provider, {})
+                providers[provider] = _Pace(limits.get('max_workers'), limits.get('rate'))
+            return providers[provider]
+
+        def finished(device, pace, outcome, error=None):
+            with self._lock:
+                overall.finish()
+                pace.finish()
+                self._record(summary, device, outcome, error)
+                self._lock.notify_all()
+
+        def run_check(device, pace):
+            # spread the checks started at the same moment
+            if self.jitter:
+                time.sleep(random.uniform(0, self.jitter))
+            try:
+                response_data, status_code = self.check_func(device["device_ip"], device["tenant_type"],
+                                                             device["provider"], device["bgp_neighbor"])
+            except Exception as e:
+                finished(device, pace, "error", str(e))
+                return
+            if status_code == 400 and response_data.get("error") != "login_failed":
+                # an invalid inventory entry (e.g., an unknown provider), not a device problem
+                finished(device, pace, "error", response_data.get("response"))
+                return
+            if status_code != 200:
+                finished(device, pace, "unreachable", response_data)
+                return
+            reports = {key: value for key, value in response_data.get("json_return_output", {}).items() if key.endswith("_REPORT")}
+            finished(device, pace, "ok" if all(value == "OK" for value in reports.values()) else "failed", reports)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='wanchecks-sweep') as executor:
+            with self._lock:
+                while pending and not self._stop.is_set():
+                    now = time.monotonic()
+                    overall_wait = overall.wait_time(now)
+                    # the first device whose provider may start a check now, else the shortest wait
+                    chosen, wait = None, None
+                    if overall_wait == 0:
+                        for device in pending:
+                            provider_wait = provider_pace(device["provider"].upper()).wait_time(now)
+                            if provider_wait == 0:
+                                chosen = device
+                                break
+                            if provider_wait is not None:
+                                wait = provider_wait if wait is None else min(wait, provider_wait)
+                    else:
+                        wait = overall_wait
+                    if chosen is None:
+                        # a finished check notifies the condition; without any timer, wait for it
+                        self._lock.wait(wait if wait is not None else 1.0)
+                        continue
+                    pending.remove(chosen)
+                    pace = provider_pace(chosen["provider"].upper())
+                    overall.start(now)
+                    pace.start(now)
+                    executor.submit(contextvars.copy_context().run, run_check, chosen, pace)
+
+    def _record(self, summary, device, outcome, detail):
+        summary["checked"] += 1
+        summary["results"][outcome] += 1
+        provider = summary["providers"].setdefault(device["provider"].upper(), dict.fromkeys(OUTCOMES, 0))
+        provider[outcome] += 1
+        if outcome == "ok":
+            return
+        failure = {"device_ip": device["device_ip"], "tenant_type": device["tenant_type"],
+                   "provider": device["provider"], "outcome": outcome}
+        if outcome == "failed":
+            failure["reports"] = detail
+        elif outcome == "unreachable":
+            failure["response"] = (detail or {}).get("response")
+        else:
+            failure["error"] = detail
+        summary["failed_devices"].append(failure)
+
+    def status(self):
+        """
+        Return the sweep settings, the next sweep time and the summaries of the last sweeps.
+
+        Returns:
+            dict: The sweeper status.
+        """
+        with self._lock:
+            sweeps = copy.deepcopy(list(reversed(self.sweeps)))
+        return {
+            "inventory": self.inventory_path,
+            "interval_seconds": self.interval,
+            "max_workers": self.max_workers,
+            "rate": self.rate,
+            "provider_limits": self.provider_limits,
+            "jitter_seconds": self.jitter,
+            "running": any(sweep["status"] == "running" for sweep in sweeps),
+            "next_sweep": datetime.fromtimestamp(self.next_sweep).isoformat(timespec='seconds') if self.next_sweep else None,
+            "sweeps": sweeps,
+        }
@@ -0,0 +1,39 @@
+"""
+Gunicorn settings of the WAN checks API for Linux servers (the Windows .exe uses waitress).
+
+Usage:
+    pip install gunicorn
+    gunicorn -c gunicorn.conf.py "WAN_checks_API:create_app()"
+
+The SSH connection pool, the asynchronous job queue and the device cache
+live in the worker process, so one worker with many threads is the default.
+Every additional worker has its own pool, which multiplies the SSH sessions
+per device and splits the job ids between the workers.
+
+The settings can be overridden with WANCHECKS_* environment variables.
+"""
+
+import os
+
+bind = os.environ.get("WANCHECKS_BIND", "127.0.0.1:5000")
+workers = int(os.environ.get("WANCHECKS_WORKERS", 1))
+worker_class = "gthread"
+threads = int(os.environ.get("WANCHECKS_THREADS", 16))
+
+# A gthread worker that stops answering its heartbeat for 'timeout' seconds is restarted;
+# long checks are limited by REQUEST_TIMEOUT in config.py instead.
+timeout = int(os.environ.get("WANCHECKS_TIMEOUT", 120))
+# Seconds the running requests get to finish after SIGTERM
+graceful_timeout = int(os.environ.get("WANCHECKS_GRACEFUL_TIMEOUT", 60))
+
+
+def post_worker_init(worker):
+    # start the fleet sweep scheduler in the worker (with several workers, every worker sweeps)
+    import WAN_checks_API
+    WAN_checks_API.start_services()
+
+
+def worker_exit(server, worker):
+    # close the pooled SSH sessions and flush the log of the stopping worker
+    import WAN_checks_API
+    WAN_checks_API.shutdown_services()
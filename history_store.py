@@ -0,0 +1,280 @@
+"""
+SQLite history of the health check results for the WAN checks API.
+
+Every finished check is stored with its structured json_return_output,
+indexed by device IP, serial number and time, so the history of a CPE, the
+latest state of every device and the changes since the previous run can be
+queried without running the checks again. The running-configs are stored
+once per SHA-256 hash of their content; checks only keep the hash.
+"""
+
+import json
+import time
+import sqlite3
+import difflib
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS configs (
+    config_hash TEXT PRIMARY KEY,
+    show_run TEXT NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    device_ip TEXT NOT NULL,
+    hostname TEXT,
+    serial_number TEXT,
+    tenant_type TEXT,
+    provider TEXT,
+    profile TEXT,
+    timestamp REAL NOT NULL,
+    status TEXT NOT NULL,
+    reports TEXT NOT NULL,
+    config_hash TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS checks_device ON checks (device_ip, timestamp);
+CREATE INDEX IF NOT EXISTS checks_serial ON checks (serial_number, timestamp);
+CREATE INDEX IF NOT EXISTS checks_timestamp ON checks (timestamp);
+"""
+
+# Columns of the check summaries returned by history() and latest()
+SUMMARY_COLUMNS = "id, device_ip, hostname, serial_number, tenant_type, provider, profile, timestamp, status, reports, config_hash"
+
+
+def config_hash(show_run):
+    """Return the SHA-256 hex digest of a running-config."""
+    return hashlib.sha256(show_run.encode("utf-8")).hexdigest()
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="seconds")
+
+
+def _diff_fields(result):
+    # Fields compared by diff(): the reports, the image/serial and the result lines.
+    # Raw outputs, parsed stats and timings change on every run (RTTs, uptimes) and are left out.
+    return {key: value for key, value in (result or {}).items()
+            if key.endswith(("_REPORT", "_results")) or key in ("serial_number", "system_image")}
+
+
+class HistoryStore:
+    """
+    Store the check results in a SQLite database.
+
+    Args:
+        path (str): The database file, ':memory:' for a temporary store.
+        retention_days (float): Days a check is kept, 0 keeps every check.
+    """
+
+    def __init__(self, path, retention_days=90):
+        self.path = path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._last_prune = 0.0
+
+    def record(self, device_ip, status, hostname=None, tenant_type=None, provider=None, result=None, show_run=None, profile=None):
+        """
+        Store the result of a check.
+
+        A check whose profile does not read the serial number (e.g., 'quick') is
+        stored with the serial number of the latest check of the device that has one.
+
+        Args:
+            device_ip (str): The IP address of the device.
+            status (str): The check status (e.g., 'completed', 'login_failed').
+            hostname (str): The hostname of the device.
+            tenant_type (str): The type of tenant (e.g., 'APLOS', 'PSD').
+            provider (str): The network provider (e.g., 'OTE', 'WIND').
+            result (dict): The json_return_output of the check.
+            show_run (str): The running-config read (or cached) during the check.
+            profile (str): The check profile (e.g., 'quick', 'standard'), None for the profile of the result.
+
+        Returns:
+            int: The id of the stored check.
+        """
+        now = time.time()
+        reports = {key: value for key, value in (result or {}).items() if key.endswith("_REPORT")}
+        digest = config_hash(show_run) if show_run is not None else None
+        profile = profile or (result or {}).get("profile")
+        with self._lock, self._db:
+            serial_number = (result or {}).get("serial_number")
+            if serial_number is None:
+                row = self._db.execute("SELECT serial_number FROM checks WHERE device_ip = ? AND serial_number IS NOT NULL"
+                                       " ORDER BY timestamp DESC, id DESC LIMIT 1", (device_ip,)).fetchone()
+                serial_number = row["serial_number"] if row else None
+            if digest:
+                self._db.execute("INSERT OR IGNORE INTO configs (config_hash, show_run, first_seen) VALUES (?, ?, ?)",
+                                 (digest, show_run, now))
+            cursor = self._db.execute(
+                "INSERT INTO checks (device_ip, hostname, serial_number, tenant_type, provider, profile, timestamp, status,"
+                " reports, config_hash, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (device_ip, hostname, serial_number, tenant_type, provider, profile, now, status,
+                 json.dumps(reports), digest, json.dumps(result) if result is not None else None))
+            if self.retention_days and now - self._last_prune > 3600:
+                self._prune(now - self.retention_days * 86400)
+                self._last_prune = now
+        return cursor.lastrowid
+
+    def _prune(self, before):
+        # Drop the expired checks and the running-configs no check refers to any more
+        self._db.execute("DELETE FROM checks WHERE timestamp < ?", (before,))
+        self._db.execute("DELETE FROM configs WHERE config_hash NOT IN"
+                         " (SELECT config_hash FROM checks WHERE config_hash IS NOT NULL)")
+
+    def _summary(self, row):
+        return {
+            "id": row["id"],
+            "device_ip": row["device_ip"],
+            "hostname": row["hostname"],
+            "serial_number": row["serial_number"],
+            "tenant_type": row["tenant_type"],
+            "provider": row["provider"],
+            "profile": row["profile"],
+            "timestamp": _iso(row["timestamp"]),
+            "status": row["status"],
+            "reports": json.loads(row["reports"]),
+            "config_hash": row["config_hash"],
+        }
+
+    def _record(self, row):
+        return {**self._summary(row), "result": json.loads(row["result"]) if row["result"] else None}
+
+    def history(self, device_ip=None, serial_number=None, since=None, limit=50):
+        """
+        Return the summaries of the stored checks, newest first.
+
+        Args:
+            device_ip (str): Only the checks of this device IP.
+            serial_number (str): Only the checks of this serial number.
+            since (float): Only the checks after this Unix time.
+            limit (int): Maximum number of checks returned.
+
+        Returns:
+            list: Check summaries (id, device, time, status, reports, config hash).
+        """
+        conditions, parameters = [], []
+        for column, value in (("device_ip", device_ip), ("serial_number", serial_number)):
+            if value:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if since is not None:
+            conditions.append("timestamp > ?")
+            parameters.append(since)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._db.execute(f"SELECT {SUMMARY_COLUMNS} FROM checks{where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+                                    (*parameters, limit)).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def latest(self, device_ip=None):
+        """
+        Return the latest check of a device, or the latest check summary of every device.
+
+        Args:
+            device_ip (str): The IP address of the device, None for all devices.
+
+        Returns:
+            dict or list: The full latest check of the device (None if it was never checked),
+            or the latest check summary of every device.
+        """
+        with self._lock:
+            if device_ip:
+                row = self._db.execute("SELECT * FROM checks WHERE device_ip = ? ORDER BY timestamp DESC, id DESC LIMIT 1",
+                                       (device_ip,)).fetchone()
+                return self._record(row) if row else None
+            rows = self._db.execute(
+                f"SELECT {SUMMARY_COLUMNS} FROM checks WHERE id IN (SELECT MAX(id) FROM checks GROUP BY device_ip)"
+                " ORDER BY device_ip").fetchall()
+        return [self._summary(row) for row in rows]
+
+    def get(self, check_id):
+        """Return a stored check with its result, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM checks WHERE id = ?", (check_id,)).fetchone()
+        return self._record(row) if row else None
+
+    def get_config(self, digest):
+        """Return the running-config stored under a hash, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT show_run FROM configs WHERE config_hash = ?", (digest,)).fetchone()
+        return row["show_run"] if row else None
+
+    def diff(self, device_ip):
+        """
+        Compare the latest check of a device with the previous one of the same check profile.
+
+        Checks of different profiles are not compared, as a lighter profile
+        leaves out checks (e.g., 'quick' skips the license and most pings).
+        The status, the *_REPORT fields, the serial number, the system image
+        and the result lines are compared; a changed running-config comes
+        with its unified diff.
+
+        Args:
+            device_ip (str): The IP address of the device.
+
+        Returns:
+            dict: The two checks compared and their changes, None when the device has fewer than two checks of its latest profile.
+        """
+        with self._lock:
+            latest = self._db.execute("SELECT * FROM checks WHERE device_ip = ? ORDER BY timestamp DESC, id DESC LIMIT 1",
+                                      (device_ip,)).fetchone()
+            if latest is None:
+                return None
+            previous = self._db.execute("SELECT * FROM checks WHERE device_ip = ? AND profile IS ? AND id != ?"
+                                        " ORDER BY timestamp DESC, id DESC LIMIT 1",
+                                        (device_ip, latest["profile"], latest["id"])).fetchone()
+        if previous is None:
+            return None
+        rows = [latest, previous]
+        current, previous = self._record(rows[0]), self._record(rows[1])
+
+        changes = {}
+        if current["status"] != previous["status"]:
+            changes["status"] = {"previous": previous["status"], "current": current["status"]}
+        current_fields, previous_fields = _diff_fields(current["result"]), _diff_fields(previous["result"])
+        for key in sorted(set(current_fields) | set(previous_fields)):
+            if current_fields.get(key) != previous_fields.get(key):
+                changes[key] = {"previous": previous_fields.get(key), "current": current_fields.get(key)}
+
+        config_diff = None
+        if current["config_hash"] and previous["config_hash"] and current["config_hash"] != previous["config_hash"]:
+            config_diff = "\n".join(difflib.unified_diff(
+                self.get_config(previous["config_hash"]).splitlines(), self.get_config(current["config_hash"]).splitlines(),
+                fromfile=f"show run {previous['timestamp']}", tofile=f"show run {current['timestamp']}", lineterm=""))
+
+        return {
+            "device_ip": device_ip,
+            "current": self._summary(rows[0]),
+            "previous": self._summary(rows[1]),
+            "changed": bool(changes or config_diff),
+            "changes": changes,
+            "config_changed": config_diff is not None,
+            "config_diff": config_diff,
+        }
+
+    def stats(self):
+        """
+        Return the number of stored checks, devices and running-configs.
+
+        Returns:
+            dict: The store counters.
+        """
+        with self._lock:
+            checks, devices = self._db.execute("SELECT COUNT(*), COUNT(DISTINCT device_ip) FROM checks").fetchone()
+            configs = self._db.execute("SELECT COUNT(*) FROM configs").fetchone()[0]
+        return {"checks": checks, "devices": devices, "configs": configs}
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,196 @@
+"""
+Background job execution for the WAN checks API.
+
+A full health check can take longer than the HTTP timeout of the calling
+client (e.g. Power Automate). The JobManager runs checks on a bounded thread
+pool, keeps their status and result in memory for polling, and optionally
+POSTs the finished job to a callback URL.
+
+The number of accepted jobs (running + queued) is bounded, so a flood of
+requests is rejected up front instead of opening more SSH sessions than the
+host can hold.
+"""
+
+import json
+import time
+import uuid
+import contextvars
+import threading
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while all running and queued slots are taken."""
+
+
+def callback_url_allowed(callback_url, prefixes):
+    """
+    Check a callback URL against the allowed URL prefixes.
+
+    The scheme and host (with port) must equal those of a prefix and the path
+    must start with its path, so 'https://flows.example.com' does not allow
+    'https://flows.example.com.attacker.net'.
+
+    Args:
+        callback_url (str): The callback URL of a request.
+        prefixes (iterable): The allowed URL prefixes (e.g., 'https://prod.westeurope.logic.azure.com/').
+
+    Returns:
+        bool: True if the URL starts with one of the prefixes.
+    """
+    url = urllib.parse.urlsplit(callback_url)
+    if url.scheme not in ('http', 'https') or not url.netloc:
+        return False
+    for prefix in prefixes:
+        allowed = urllib.parse.urlsplit(prefix)
+        if (url.scheme, url.netloc.lower()) == (allowed.scheme, allowed.netloc.lower()) and url.path.startswith(allowed.path):
+            return True
+    return False
+
+
+class JobManager:
+    """
+    Run functions in the background and keep track of their results.
+
+    Args:
+        max_workers (int): Maximum number of jobs running at the same time.
+        max_queued (int): Maximum number of jobs waiting for a free worker.
+        result_ttl (float): Seconds a finished job is kept for polling.
+        callback_timeout (float): Seconds to wait for a callback URL to accept the result.
+    """
+
+    def __init__(self, max_workers=4, max_queued=50, result_ttl=3600, callback_timeout=30):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.callback_timeout = callback_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='wanchecks-job')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, callback_url=None, **kwargs):
+        """
+        Queue a function call as a background job.
+
+        The function must return a (response data, HTTP status code) tuple,
+        like run_device_checks().
+
+        Args:
+            func (callable): The function to run.
+            *args: Positional arguments of the function.
+            callback_url (str): Optional URL the finished job is POSTed to.
+            **kwargs: Keyword arguments of the function.
+
+        Returns:
+            str: The id of the new job.
+
+        Raises:
+            QueueFullError: If the maximum number of running and queued jobs is reached.
+        """
+        self._evict_expired()
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(f"{self.max_workers} jobs running and {self.max_queued} queued")
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "submitted_at": datetime.now().isoformat(timespec='seconds'),
+            "started_at": None,
+            "finished_at": None,
+            "status_code": None,
+            "result": None,
+            "error": None,
+            "callback_url": callback_url,
+            "callback_status": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            # run in a copy of the caller's context, so the job keeps its request id in the logs
+            job["_future"] = self._executor.submit(contextvars.copy_context().run, self._run, job, func, args, kwargs)
+        return job_id
+
+    def get(self, job_id):
+        """
+        Return a copy of a job, or None if it is unknown or expired.
+
+        Args:
+            job_id (str): The id returned by submit().
+
+        Returns:
+            dict: The job status, and its result once it is finished.
+        """
+        self._evict_expired()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return {key: value for key, value in job.items() if not key.startswith('_')} if job else None
+
+    def stats(self):
+        """
+        Return the number of jobs per status.
+
+        Returns:
+            dict: Job counts keyed by status, plus the configured limits.
+        """
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+        counts = {status: statuses.count(status) for status in ("queued", "running", "finished", "failed")}
+        counts.update(max_workers=self.max_workers, max_queued=self.max_queued)
+        return counts
+
+    def shutdown(self, wait=True):
+        """
+        Stop accepting jobs and optionally wait for the running ones.
+
+        The queued jobs are cancelled and reported as failed, without a callback.
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        finished_at = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            for job in self._jobs.values():
+                if job["_future"].cancelled():
+                    job.update(error="Cancelled, the server is shutting down", status_code=503, status="failed",
+                               finished_at=finished_at, _finished_monotonic=time.monotonic())
+                    self._slots.release()
+
+    def _run(self, job, func, args, kwargs):
+        job["status"] = "running"
+        job["started_at"] = datetime.now().isoformat(timespec='seconds')
+        try:
+            result, status_code = func(*args, **kwargs)
+            job.update(result=result, status_code=status_code, status="finished")
+        except Exception as e:
+            job.update(error=str(e), status_code=500, status="failed")
+        finally:
+            job["finished_at"] = datetime.now().isoformat(timespec='seconds')
+            job["_finished_monotonic"] = time.monotonic()
+            self._slots.release()
+
+        if job["callback_url"]:
+            job["callback_status"] = self._post_callback(job)
+
+    def _post_callback(self, job):
+        payload = {key: value for key, value in job.items() if not key.startswith('_')}
+        callback_request = urllib.request.Request(
+            job["callback_url"],
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        try:
+            with urllib.request.urlopen(callback_request, timeout=self.callback_timeout) as response:
+                return response.status
+        except Exception as e:
+            return f"failed: {e}"
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if "_finished_monotonic" in job and now - job["_finished_monotonic"] > self.result_ttl]
+            for job_id in expired:
+                del self._jobs[job_id]
@@ -0,0 +1,151 @@
+"""
+Non-blocking structured logging of the WAN checks API.
+
+The check functions keep reporting their progress with print()/cprint().
+sys.stdout is replaced by a LogStream that turns every completed line into
+a log record. The record is tagged with the request id and device IP of
+the current request and handed to a QueueHandler. A QueueListener thread
+writes the records to a rotating log file as one JSON object per line, so
+the check code never waits for disk I/O and the lines of concurrent checks
+stay separate and parseable.
+
+The request id and device IP are stored in context variables. Threads
+started for a request must run their target through
+contextvars.copy_context().run to keep them.
+
+Usage:
+    listener = setup_logging('console_log.txt', max_bytes=10485760, backup_count=5)
+    sys.stdout = LogStream(logging.getLogger('wanchecks'))
+"""
+
+import re
+import json
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+
+# Id of the API request being served and IP of the device being checked
+request_id_var = contextvars.ContextVar('request_id', default=None)
+device_ip_var = contextvars.ContextVar('device_ip', default=None)
+
+# Colour codes written by termcolor
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*m")
+
+
+class ContextFilter(logging.Filter):
+    """Tag every record with the request id and device IP of the calling thread."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.device_ip = device_ip_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as a single-line JSON object without colour codes."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "request_id": getattr(record, 'request_id', None),
+            "device_ip": getattr(record, 'device_ip', None),
+            # QueueHandler has already merged any traceback into the message
+            "message": ANSI_ESCAPE.sub('', record.getMessage()),
+        }
+        return json.dumps(entry)
+
+
+class LogStream:
+    """
+    File-like object logging every completed line written to it.
+
+    Each thread has its own line buffer, so partial writes such as
+    print("Serial number: ", end='') are joined with the rest of their line
+    and never mixed with the output of other threads.
+
+    Args:
+        logger (logging.Logger): The logger receiving the lines.
+        log_level (int): Level of the logged lines.
+    """
+
+    def __init__(self, logger, log_level=logging.INFO):
+        self.logger = logger
+        self.log_level = log_level
+        self._local = threading.local()
+
+    def write(self, buf):
+        buffered = getattr(self._local, 'buffer', '') + buf
+        *lines, self._local.buffer = buffered.split('\n')
+        for line in lines:
+            self._log(line)
+        return len(buf)
+
+    def flush(self):
+        line, self._local.buffer = getattr(self._local, 'buffer', ''), ''
+        self._log(line)
+
+    def isatty(self):
+        return False
+
+    def _log(self, line):
+        line = line.rstrip()
+        if line.strip():
+            self.logger.log(self.log_level, line)
+
+
+def setup_logging(log_file, max_bytes=10485760, backup_count=5, rotate_when=None, logger_name='wanchecks'):
+    """
+    Send the records of a logger through a queue to a rotating JSON log file.
+
+    Args:
+        log_file (str): Path of the log file.
+        max_bytes (int): Size at which the log file is rotated (used when 'rotate_when' is not set).
+        backup_count (int): Number of rotated log files kept.
+        rotate_when (str): Optional time-based rotation interval, e.g. 'midnight' or 'H'
+                           (see TimedRotatingFileHandler).
+        logger_name (str): Name of the logger to configure.
+
+    Returns:
+        QueueListener: The started listener writing the records (stopped at exit).
+    """
+    if rotate_when:
+        file_handler = TimedRotatingFileHandler(log_file, when=rotate_when, backupCount=backup_count, encoding='utf-8')
+    else:
+        file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter())
+
+    # The queue is unbounded so a burst of records never blocks the check threads
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_logging, listener)
+    return listener
+
+
+def stop_logging(listener):
+    """
+    Write the queued records and stop the listener (safe to call more than once).
+
+    Args:
+        listener (QueueListener): The listener returned by setup_logging().
+    """
+    if listener._thread is not None:
+        listener.stop()
@@ -0,0 +1,213 @@
+"""
+Latency instrumentation and Prometheus metrics of the WAN checks API.
+
+Counter and Histogram keep labelled values in memory, and MetricsRegistry
+renders them in the Prometheus text exposition format for the /metrics
+endpoint. CheckTimings collects the stage and command durations of a single
+check for the 'timings' block of its response. TimedConnection wraps a
+Netmiko connection so every send_command is timed.
+
+The CheckTimings of the running check is stored in the 'current_timings'
+context variable, so the ping threads of a check add to the same timings.
+"""
+
+import time
+import threading
+import contextvars
+
+
+# Timings of the check running in the current context
+current_timings = contextvars.ContextVar('current_timings', default=None)
+
+# Seconds, from a quick show command up to a full BGP route table
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """
+    Monotonic counter with labels.
+
+    Args:
+        name (str): Metric name.
+        documentation (str): Help text of the metric.
+        labelnames (tuple): Names of the labels passed to inc().
+    """
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}_total{_format_labels(self.labelnames, key)} {value}"
+                for key, value in sorted(values.items())]
+
+
+class Histogram:
+    """
+    Histogram of observed durations with labels.
+
+    Args:
+        name (str): Metric name.
+        documentation (str): Help text of the metric.
+        labelnames (tuple): Names of the labels passed to observe().
+        buckets (tuple): Upper bounds of the buckets in seconds.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}        # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = [counts, total + value, count + 1]
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        lines = []
+        for key, (counts, total, count) in sorted(values.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Create metrics and render them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Render all metrics.
+
+        Returns:
+            str: The metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class CheckTimings:
+    """
+    Stage and command durations of one check.
+
+    Args:
+        **labels: Labels of the check (e.g., tenant_type, provider) used for its metrics.
+    """
+
+    def __init__(self, **labels):
+        self.labels = labels
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.commands = []
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage, seconds):
+        # a stage that runs more than once adds up
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_command(self, command, seconds):
+        with self._lock:
+            self.commands.append({"command": command, "seconds": round(seconds, 3)})
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def to_dict(self):
+        """
+        Return the timings for the 'timings' block of a response.
+
+        Returns:
+            dict: Total seconds, seconds per stage and seconds per command (in completion order).
+        """
+        with self._lock:
+            return {
+                "total_seconds": round(self.elapsed(), 3),
+                "stages": {stage: round(seconds, 3) for stage, seconds in self.stages.items()},
+                "commands": list(self.commands),
+            }
+
+
+class TimedConnection:
+    """
+    Netmiko connection wrapper reporting the duration of every send_command.
+
+    All other attributes are forwarded to the wrapped connection.
+
+    Args:
+        connection (object): A Netmiko connection object.
+        on_command (callable): Called with (command, seconds) after every command.
+    """
+
+    def __init__(self, connection, on_command):
+        self._connection = connection
+        self._on_command = on_command
+
+    def send_command(self, command_string, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._connection.send_command(command_string, *args, **kwargs)
+        finally:
+            self._on_command(command_string.strip(), time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._connection.disconnect()
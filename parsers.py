@@ -0,0 +1,284 @@
+"""
+Structured parsers for the Cisco IOS outputs used by the WAN checks.
+
+Each parser turns the raw output of one command into a typed record, using
+regular expressions compiled once at import time:
+
+- parse_ping():            'ping X source Y'
+- parse_bgp_neighbors():   'show ip bgp neighbor X' / 'show bgp ipv6 unicast neighbors'
+- parse_ipv6_interface():  'show ipv6 interface X'
+- parse_version():         'show version'
+- parse_license_status():  'show license status'
+- parse_route_table_total(): 'show ... received-routes/advertised-routes'
+- parse_config_change():   'show run' / 'show running-config | include Last configuration change'
+
+same_address() compares the neighbor addresses of the records with the
+addresses of config.py, whatever their case or zero padding.
+
+The check functions decide OK/FAIL from these records instead of substring
+tests on the raw text. benchmarks/bench_parsers.py measures the parse cost.
+"""
+
+import re
+import ipaddress
+from dataclasses import dataclass, asdict
+
+
+INVALID_INPUT = 'Invalid input detected'
+
+_SUCCESS_RATE = re.compile(r"Success rate is (\d+) percent \((\d+)/(\d+)\)")
+_ROUND_TRIP = re.compile(r"round-trip min/avg/max = (\d+)/(\d+)/(\d+) ms")
+_BGP_NEIGHBOR = re.compile(r"^BGP neighbor is (\S+?),", re.MULTILINE)
+_BGP_STATE = re.compile(r"BGP state = (\w+)(?:, up for (\S+))?")
+_BGP_PREFIXES = re.compile(r"^\s+Prefixes Current:\s+(\d+)\s+(\d+)", re.MULTILINE)
+_LINE_PROTOCOL = re.compile(r"^(\S+) is ([\w ]+?), line protocol is (\w+)", re.MULTILINE)
+_SERIAL_NUMBER = re.compile(r"Processor board ID\s+(\S+)")
+_SYSTEM_IMAGE = re.compile(r"System image file is \"bootflash:(\S+)\"")
+_IOS_VERSION = re.compile(r"Cisco IOS.*?Version ([^,\s]+)")
+_UPTIME = re.compile(r"uptime is (.+)")
+_TRUST_CODE = re.compile(r"Trust Code Installed:\s+(\S+ \S+ \S+ \S+ \S+)")
+_TOTAL_PREFIXES = re.compile(r"^Total number of prefixes (\d+)", re.MULTILINE)
+_CONFIG_CHANGE = re.compile(r"^! Last configuration change at (.+?)\s*$", re.MULTILINE)
+
+
+@dataclass
+class PingResult:
+    """Outcome of one 'ping X source Y' command."""
+    success_rate: int = 0
+    received: int = 0
+    sent: int = 0
+    rtt_min: int = None
+    rtt_avg: int = None
+    rtt_max: int = None
+
+    @property
+    def loss_pct(self):
+        return 100 - self.success_rate
+
+    def succeeded(self, threshold=80):
+        """Return True when at least 'threshold' percent of the probes were answered."""
+        return self.sent > 0 and self.success_rate >= threshold
+
+    def combine(self, other):
+        """Return the result of this ping and another ping to the same host, as one ping."""
+        sent = self.sent + other.sent
+        received = self.received + other.received
+        answered = [result for result in (self, other) if result.received and result.rtt_avg is not None]
+        return PingResult(
+            success_rate=100 * received // sent if sent else 0,
+            received=received,
+            sent=sent,
+            rtt_min=min((result.rtt_min for result in answered), default=None),
+            rtt_avg=round(sum(result.rtt_avg * result.received for result in answered) / sum(result.received for result in answered)) if answered else None,
+            rtt_max=max((result.rtt_max for result in answered), default=None),
+        )
+
+    def to_dict(self):
+        return {**asdict(self), "loss_pct": self.loss_pct}
+
+
+@dataclass
+class BgpNeighbor:
+    """State of one BGP neighbor."""
+    neighbor: str = None
+    found: bool = True
+    state: str = None
+    uptime: str = None
+    prefixes_sent: int = None
+    prefixes_received: int = None
+
+    @property
+    def established(self):
+        return self.state == "Established"
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class InterfaceStatus:
+    """Status of one interface from 'show ipv6 interface X'."""
+    interface: str
+    exists: bool = False
+    status: str = None
+    line_protocol: str = None
+
+    @property
+    def is_up(self):
+        return self.line_protocol == "up"
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class VersionInfo:
+    """Device facts from 'show version'."""
+    serial_number: str = None
+    system_image: str = None
+    version: str = None
+    uptime: str = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class LicenseStatus:
+    """Trust code state from 'show license status'."""
+    trust_code_installed: bool = None
+    trust_code: str = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def same_address(address, other):
+    """
+    Return True when two IP addresses are the same (e.g., '2001:DB8:1::1' and '2001:0db8:0001::1').
+
+    Args:
+        address (str): An IP address, e.g. the neighbor of a BgpNeighbor record.
+        other (str): Another IP address.
+
+    Returns:
+        bool: Whether both are the same address; strings that are not IP addresses are compared case-insensitively.
+    """
+    try:
+        return ipaddress.ip_address(address) == ipaddress.ip_address(other)
+    except ValueError:
+        return str(address).lower() == str(other).lower()
+
+
+def parse_ping(output):
+    """
+    Parse the output of a ping command.
+
+    Args:
+        output (str): The ping command output.
+
+    Returns:
+        PingResult: Success rate, probe counts and round-trip times (None when no reply was received).
+    """
+    result = PingResult()
+    match = _SUCCESS_RATE.search(output)
+    if match:
+        result.success_rate, result.received, result.sent = (int(value) for value in match.groups())
+    match = _ROUND_TRIP.search(output)
+    if match:
+        result.rtt_min, result.rtt_avg, result.rtt_max = (int(value) for value in match.groups())
+    return result
+
+
+def parse_bgp_neighbors(output, neighbor=None):
+    """
+    Parse the output of 'show ip bgp neighbor X' or 'show bgp ipv6 unicast neighbors'.
+
+    Args:
+        output (str): The command output.
+        neighbor (str): The neighbor the command asked for, reported when the output does not name one.
+
+    Returns:
+        list: One BgpNeighbor per neighbor in the output; a single not found record for 'No such neighbor'.
+    """
+    if "No such neighbor" in output or INVALID_INPUT in output:
+        return [BgpNeighbor(neighbor=neighbor, found=False)]
+
+    starts = [match.start() for match in _BGP_NEIGHBOR.finditer(output)]
+    blocks = [output[start:end] for start, end in zip(starts, starts[1:] + [len(output)])] or [output]
+
+    neighbors = []
+    for block in blocks:
+        name = _BGP_NEIGHBOR.match(block)
+        record = BgpNeighbor(neighbor=name.group(1) if name else neighbor)
+        match = _BGP_STATE.search(block)
+        if match:
+            record.state, record.uptime = match.groups()
+        match = _BGP_PREFIXES.search(block)
+        if match:
+            record.prefixes_sent, record.prefixes_received = int(match.group(1)), int(match.group(2))
+        neighbors.append(record)
+    return neighbors
+
+
+def parse_ipv6_interface(output, interface):
+    """
+    Parse the output of 'show ipv6 interface X'.
+
+    Args:
+        output (str): The command output.
+        interface (str): The interface the command asked for.
+
+    Returns:
+        InterfaceStatus: Whether the interface exists and its line protocol state.
+    """
+    record = InterfaceStatus(interface=interface, exists=INVALID_INPUT not in output)
+    match = _LINE_PROTOCOL.search(output)
+    if match:
+        record.status, record.line_protocol = match.group(2), match.group(3)
+    return record
+
+
+def parse_version(output):
+    """
+    Parse the output of 'show version'.
+
+    Args:
+        output (str): The command output.
+
+    Returns:
+        VersionInfo: Serial number, system image, IOS version and uptime.
+    """
+    record = VersionInfo()
+    for attribute, pattern in (("serial_number", _SERIAL_NUMBER), ("system_image", _SYSTEM_IMAGE),
+                               ("version", _IOS_VERSION), ("uptime", _UPTIME)):
+        match = pattern.search(output)
+        if match:
+            setattr(record, attribute, match.group(1).strip())
+    return record
+
+
+def parse_license_status(output):
+    """
+    Parse the output of 'show license status'.
+
+    Args:
+        output (str): The command output.
+
+    Returns:
+        LicenseStatus: Whether a trust code is installed and its timestamp.
+    """
+    if "Trust Code Installed: <none>" in output:
+        return LicenseStatus(trust_code_installed=False)
+    match = _TRUST_CODE.search(output)
+    if match:
+        return LicenseStatus(trust_code_installed=True, trust_code=match.group(1))
+    return LicenseStatus()
+
+
+def parse_route_table_total(output):
+    """
+    Return the prefix count printed at the end of a received/advertised routes table.
+
+    Args:
+        output (str): The route table output.
+
+    Returns:
+        int: The total number of prefixes, or None when the output was cut before the summary line.
+    """
+    match = _TOTAL_PREFIXES.search(output)
+    return int(match.group(1)) if match else None
+
+
+def parse_config_change(output):
+    """
+    Return the running-config last-change timestamp.
+
+    Args:
+        output (str): The 'show run' output, or only its 'Last configuration change' line.
+
+    Returns:
+        str: The timestamp (and user) of the last configuration change, None when it is not shown.
+    """
+    match = _CONFIG_CHANGE.search(output)
+    return match.group(1) if match else None
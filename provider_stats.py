@@ -0,0 +1,184 @@
+"""
+Cross-device aggregation of the check results per provider for the WAN checks API.
+
+A core problem of a provider (e.g., failing BGP sessions or an unreachable
+data center host) shows up on many CPEs at once, but every check only
+reports its own device. ProviderStats adds every finished check to counters
+grouped by provider, BGP neighbor and pinged host (the data_vlan_hosts and
+voice_vlan_hosts of config.py), keeps the latest state of every device in
+each group and the recent round-trip times for percentiles, so the
+provider-wide picture is available without reading the separate results.
+
+The statistics are kept in memory, per server process, since the server started.
+"""
+
+import time
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+
+REPORTS = ("INTERFACE_REPORT", "PING_REPORT", "BGP_REPORT", "LICENSE_REPORT")
+PERCENTILES = (50, 90, 99)
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="seconds")
+
+
+def percentiles(samples, points=PERCENTILES):
+    """
+    Return the nearest-rank percentiles of a list of samples.
+
+    Args:
+        samples (iterable): The sample values.
+        points (tuple): The percentiles to return.
+
+    Returns:
+        dict: 'pN' to value for every requested percentile and the number of 'samples'
+        (the percentiles are None without samples).
+    """
+    ordered = sorted(samples)
+    result = {"samples": len(ordered)}
+    for point in points:
+        result[f"p{point}"] = ordered[max(0, -(-point * len(ordered) // 100) - 1)] if ordered else None
+    return result
+
+
+class _Group:
+    """Counters of one BGP neighbor or pinged host of a provider, with the latest state of every device."""
+
+    def __init__(self, rtt_samples):
+        self.checks = 0
+        self.failed = 0
+        self.failing = {}     # device ip -> whether its latest check of this group failed
+        self.rtts = deque(maxlen=rtt_samples)
+        self.info = {}
+
+    def add(self, failed, rtt=None):
+        self.checks += 1
+        self.failed += failed
+        if rtt is not None:
+            self.rtts.append(rtt)
+
+    def to_dict(self, devices):
+        failing = sorted(device_ip for device_ip, failed in self.failing.items() if failed)
+        info = {key: value.copy() if isinstance(value, (list, dict)) else value for key, value in self.info.items()}
+        result = {**info, "checks": self.checks, "failed": self.failed,
+                  "devices": len(self.failing), "devices_failing": len(failing)}
+        if devices:
+            result["failing_devices"] = failing
+        return result
+
+
+class ProviderStats:
+    """
+    Aggregate the finished checks of all devices by provider, BGP neighbor and pinged host.
+
+    Args:
+        rtt_samples (int): Latest round-trip times kept per provider and per host for the percentiles.
+    """
+
+    def __init__(self, rtt_samples=1000):
+        self.rtt_samples = rtt_samples
+        self.started = time.time()
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    def _provider(self, provider):
+        return self._providers.setdefault(provider.upper(), {
+            "checks": {}, "reports": {report: {} for report in REPORTS}, "devices": set(), "last_check": None,
+            "rtts": deque(maxlen=self.rtt_samples), "bgp_neighbors": {}, "hosts": {},
+        })
+
+    def record(self, device_ip, provider, status, result=None, ping_threshold=80):
+        """
+        Add a finished check of a device to the statistics of its provider.
+
+        Args:
+            device_ip (str): The login IP address of the device.
+            provider (str): The network provider (e.g., 'NOVA', 'VODAFONE').
+            status (str): 'completed' or 'login_failed'.
+            result (dict): The json_return_output of a completed check.
+            ping_threshold (int): Percent of answered probes for a successful ping.
+        """
+        with self._lock:
+            stats = self._provider(provider)
+            stats["checks"][status] = stats["checks"].get(status, 0) + 1
+            stats["devices"].add(device_ip)
+            stats["last_check"] = time.time()
+            if result is None:
+                return
+
+            for report in REPORTS:
+                if result.get(report):
+                    counts = stats["reports"][report]
+                    counts[result[report]] = counts.get(result[report], 0) + 1
+
+            # a device fails a group when any of its results in the group failed (e.g., the pings of a host from several sources)
+            failing = {}
+            for neighbor in result.get("bgp_stats") or []:
+                group = stats["bgp_neighbors"].get(str(neighbor["neighbor"]))
+                if group is None:
+                    group = stats["bgp_neighbors"][str(neighbor["neighbor"])] = _Group(0)
+                    group.info = {"address_family": neighbor.get("address_family"), "states": {}}
+                state = (neighbor.get("state") or "unknown") if neighbor.get("found", True) else "not found"
+                group.info["states"][state] = group.info["states"].get(state, 0) + 1
+                group.add(state != "Established")
+                failing[group] = failing.get(group, False) or state != "Established"
+
+            for ping in result.get("ping_stats") or []:
+                group = stats["hosts"].get(ping["host_name"])
+                if group is None:
+                    group = stats["hosts"][ping["host_name"]] = _Group(self.rtt_samples)
+                    group.info = {"host_ip": ping["host_ip"], "sources": [], "sent": 0, "received": 0}
+                if ping["source"] not in group.info["sources"]:
+                    group.info["sources"].append(ping["source"])
+                group.info["sent"] += ping["sent"]
+                group.info["received"] += ping["received"]
+                failed = not (ping["sent"] and ping["success_rate"] >= ping_threshold)
+                group.add(failed, ping["rtt_avg"])
+                failing[group] = failing.get(group, False) or failed
+                if ping["rtt_avg"] is not None:
+                    stats["rtts"].append(ping["rtt_avg"])
+
+            for group, failed in failing.items():
+                group.failing[device_ip] = failed
+
+    def snapshot(self, provider=None):
+        """
+        Return the aggregated statistics of all providers, or of one provider with its failing devices.
+
+        Args:
+            provider (str): Only this provider, with the IPs of the devices whose latest check of
+                            a BGP neighbor or host failed.
+
+        Returns:
+            dict: Per provider the check counts by status, the report counts by outcome, the
+            number of devices, the ping round-trip time percentiles in ms and the counters of every
+            BGP neighbor and pinged host; None if the provider has no checks.
+        """
+        with self._lock:
+            names = sorted(self._providers) if provider is None else [provider.upper()]
+            if provider is not None and names[0] not in self._providers:
+                return None
+            providers = {}
+            for name in names:
+                stats = self._providers[name]
+                hosts = {}
+                for host_name, group in sorted(stats["hosts"].items()):
+                    host = group.to_dict(provider is not None)
+                    host["loss_pct"] = round(100 - 100 * host["received"] / host["sent"], 1) if host["sent"] else None
+                    host["rtt_ms"] = percentiles(group.rtts)
+                    hosts[host_name] = host
+                providers[name] = {
+                    "checks": dict(stats["checks"]),
+                    "reports": {report: dict(counts) for report, counts in stats["reports"].items()},
+                    "devices": len(stats["devices"]),
+                    "last_check": _format_time(stats["last_check"]),
+                    "rtt_ms": percentiles(stats["rtts"]),
+                    "bgp_neighbors": {neighbor: group.to_dict(provider is not None)
+                                      for neighbor, group in sorted(stats["bgp_neighbors"].items())},
+                    "hosts": hosts,
+                }
+            return {"since": _format_time(self.started), "providers": providers}
@@ -0,0 +1,122 @@
+"""
+Response trimming, serialization and compression of the WAN checks API.
+
+A full check response holds the whole running-config, every raw ping and
+BGP output and the parsed records, often hundreds of KB per device, while
+most clients (e.g., Power Automate flows) only read the *_REPORT fields.
+Clients choose the optional sections they need with 'include', ask for
+compact JSON, and get gzip or brotli encoded bodies through Accept-Encoding.
+
+brotli is an optional dependency (pip install brotli); without it only gzip is offered.
+"""
+
+import gzip
+import json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Optional sections of a check response and the keys they hold (top level or in json_return_output).
+# The identification fields, the *_REPORT fields, 'cached_commands' and 'coalesced' are always returned.
+SECTIONS = {
+    "show_run": ("show_run_output",),
+    "raw_outputs": ("interface_outputs", "license_output", "Lo0_ping_outputs", "vlan200_ping_outputs",
+                    "vlan3000_ping_outputs", "vlan3100_ping_outputs", "bgp_neighbor_output"),
+    "results": ("interface_results", "license_results", "Lo0_ping_results", "vlan200_ping_results",
+                "vlan3000_ping_results", "vlan3100_ping_results", "bgp_results"),
+    "stats": ("version_info", "license_info", "interface_stats", "ping_stats", "bgp_stats"),
+    "timings": ("timings",),
+}
+# Key suffixes of the sections, for the ping sets of additional check plans (e.g., 'vlan300_ping_outputs')
+SECTION_SUFFIXES = {
+    "raw_outputs": ("_ping_outputs",),
+    "results": ("_ping_results",),
+}
+
+# Encodings in order of preference when the client accepts them equally
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+
+def parse_include(value):
+    """
+    Validate the 'include' option of a request.
+
+    Args:
+        value (list or str): Section names, as a list or a comma-separated string. None selects all sections.
+
+    Returns:
+        tuple: The selected section names (None for all of them), or None.
+
+    Raises:
+        ValueError: If the value is not a list of known section names.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [name.strip() for name in value.split(",") if name.strip()]
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        raise ValueError("include must be a list of section names")
+    unknown = sorted(set(value) - set(SECTIONS))
+    if unknown:
+        raise ValueError(f"Unknown include sections {', '.join(unknown)}, expected some of {', '.join(SECTIONS)}")
+    return tuple(value)
+
+
+def select_sections(response_data, include):
+    """
+    Drop the optional sections of a check response that were not requested.
+
+    Args:
+        response_data (dict): A check response (or a batch result with the same fields).
+        include (tuple): The section names to keep, None to keep everything.
+
+    Returns:
+        dict: The trimmed response; the input is not modified.
+    """
+    if include is None or not isinstance(response_data, dict):
+        return response_data
+    dropped = {key for name, keys in SECTIONS.items() if name not in include for key in keys}
+    dropped_suffixes = tuple(suffix for name, suffixes in SECTION_SUFFIXES.items() if name not in include for suffix in suffixes)
+
+    def keep(key):
+        return key not in dropped and not (dropped_suffixes and key.endswith(dropped_suffixes))
+
+    trimmed = {key: value for key, value in response_data.items() if keep(key)}
+    if isinstance(trimmed.get("json_return_output"), dict):
+        trimmed["json_return_output"] = {key: value for key, value in trimmed["json_return_output"].items() if keep(key)}
+    return trimmed
+
+
+def dump_json(data, compact=False):
+    """
+    Serialize a response, pretty-printed or compact (no indentation and whitespace).
+
+    Args:
+        data (object): The response data.
+        compact (bool): Use the compact form.
+
+    Returns:
+        str: The JSON text.
+    """
+    if compact:
+        return json.dumps(data, separators=(",", ":"))
+    return json.dumps(data, indent=4)
+
+
+def compress(body, encoding):
+    """
+    Encode a response body.
+
+    Args:
+        body (bytes): The response body.
+        encoding (str): 'br' or 'gzip'.
+
+    Returns:
+        bytes: The encoded body.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
@@ -0,0 +1,53 @@
+"""
+Shared fixtures of the WAN checks API tests.
+
+The checks run against the fake CPE of benchmarks/fake_device.py, with the
+fake config.py settings when no real config.py can be imported.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, "benchmarks")]
+
+from fake_device import FakeDevice, install_fake_config, install_fake_device  # noqa: E402
+
+install_fake_config()
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    """A fake CPE every new SSH session of WAN_checks_API connects to, with an empty connection pool."""
+    import WAN_checks_API
+    from connection_pool import ConnectionPool
+
+    monkeypatch.setattr(WAN_checks_API, "connect_netmiko", WAN_checks_API.connect_netmiko)
+    device = install_fake_device(FakeDevice(command_latencies={"ping": 0.0}))
+    pool = ConnectionPool(WAN_checks_API.open_ssh_session, idle_timeout=60)
+    monkeypatch.setattr(WAN_checks_API, "connection_pool", pool)
+    yield device
+    pool.close_all()
+
+
+@pytest.fixture
+def client(fake, monkeypatch):
+    """A test client of the API routes, without the log file and stdout redirect of create_app()."""
+    from flask import Flask
+    import WAN_checks_API
+    from history_store import HistoryStore
+
+    store = HistoryStore(":memory:")
+    monkeypatch.setattr(WAN_checks_API, "history_store", store)
+    app = Flask(__name__)
+    app.register_blueprint(WAN_checks_API.api)
+    yield app.test_client()
+    store.close()
+
+
+@pytest.fixture
+def auth():
+    import WAN_checks_API
+    return {"Authorization": WAN_checks_API.AUTH_TOKEN}
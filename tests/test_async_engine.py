@@ -0,0 +1,111 @@
+"""Tests of the asyncssh engine against a local asyncssh server."""
+
+import time
+import asyncio
+
+import pytest
+
+asyncssh = pytest.importorskip("asyncssh")
+
+import async_engine  # noqa: E402
+from async_engine import AsyncSSHConnection  # noqa: E402
+
+
+class FakeCPEServer(asyncssh.SSHServer):
+    """SSH server without authentication that counts its open connections."""
+
+    connections = 0
+
+    def connection_made(self, conn):
+        FakeCPEServer.connections += 1
+
+    def connection_lost(self, exc):
+        FakeCPEServer.connections -= 1
+
+    def begin_auth(self, username):
+        return False
+
+
+async def cli(process):
+    process.stdout.write("Welcome\r\nFAKE-CPE#")
+    try:
+        while True:
+            line = await process.stdin.readline()
+            if not line:
+                break
+            # the line editor of the pty has already echoed the command
+            command = line.strip()
+            process.stdout.write(f"output of {command}\r\nFAKE-CPE#" if command else "FAKE-CPE#")
+    except asyncssh.Error:
+        pass
+    process.exit(0)
+
+
+async def silent(process):
+    # a banner that never ends with a prompt
+    process.stdout.write("Welcome\r\n")
+    await asyncio.sleep(30)
+
+
+@pytest.fixture
+def server():
+    """Start a local SSH server running 'handler' on the engine's event loop, return its port."""
+    servers = []
+
+    def start(handler):
+        async def create():
+            return await asyncssh.create_server(FakeCPEServer, "127.0.0.1", 0, process_factory=handler,
+                                                server_host_keys=[asyncssh.generate_private_key("ssh-ed25519")])
+        servers.append(async_engine.run(create()))
+        return servers[-1].sockets[0].getsockname()[1]
+
+    yield start
+    for ssh_server in servers:
+        async_engine.get_event_loop().call_soon_threadsafe(ssh_server.close)
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_session_sends_commands_like_netmiko(server):
+    connection = AsyncSSHConnection(ip="127.0.0.1", port=server(cli), username="admin", password="admin", conn_timeout=5)
+    assert connection.send_command("show version") == "output of show version"
+    assert connection.find_prompt() == "FAKE-CPE#"
+    assert connection.is_alive()
+    connection.disconnect()
+    assert not connection.is_alive()
+    wait_for(lambda: FakeCPEServer.connections == 0)
+
+
+def test_failed_login_closes_the_connection(server):
+    port = server(silent)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        AsyncSSHConnection(ip="127.0.0.1", port=port, username="admin", password="admin", conn_timeout=0.3)
+    assert time.monotonic() - started < 3
+    wait_for(lambda: FakeCPEServer.connections == 0)
+    # the reader task of the failed session is gone too
+    assert async_engine.run(running_readers()) == []
+
+
+async def running_readers():
+    return [task for task in asyncio.all_tasks() if "_read_forever" in repr(task.get_coro())]
+
+
+def test_run_cancels_an_operation_that_does_not_finish_in_time():
+    cancelled = []
+
+    async def stuck():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(TimeoutError, match="within 0.1 seconds"):
+        async_engine.run(stuck(), timeout=0.1)
+    wait_for(lambda: cancelled)
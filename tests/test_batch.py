@@ -0,0 +1,81 @@
+"""Tests of the /wanchecks/batch/ endpoint against the fake device."""
+
+import time
+
+from fake_device import device_outputs
+
+
+def entry(device_ip, **fields):
+    return {"device_ip": device_ip, "tenant_type": "APLOS", "provider": "OTE", "bgp_neighbor": "", **fields}
+
+
+def test_batch_returns_one_result_per_device_in_request_order(client, auth, fake):
+    fake.outputs = device_outputs("APLOS", "OTE", "", "healthy", 20)
+    devices = [entry(f"192.0.2.{index}") for index in range(10, 16)]
+    response = client.post('/wanchecks/batch/', json=devices, headers=auth)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["summary"] == {"ok": 6, "failed": 0, "timeout": 0, "error": 0, "total": 6}
+    assert [result["device_ip"] for result in data["results"]] == [device["device_ip"] for device in devices]
+    assert all(result["status"] == "ok" and result["hostname"] == "FAKE-CPE" for result in data["results"])
+    assert fake.handshakes == 6
+
+
+def test_batch_reports_the_failures_of_every_device(client, auth, fake, monkeypatch):
+    import WAN_checks_API
+
+    def checks(device_ip, *args, **kwargs):
+        if device_ip == "192.0.2.21":
+            return {"response": f"Failed to connect to {device_ip}", "error": "login_failed"}, 400
+        if device_ip == "192.0.2.22":
+            raise RuntimeError("channel closed")
+        return {"hostname": "CPE"}, 200
+
+    monkeypatch.setattr(WAN_checks_API, "run_device_checks_retrying", checks)
+    response = client.post('/wanchecks/batch/', json={"devices": [entry("192.0.2.20"), entry("192.0.2.21"), entry("192.0.2.22")]},
+                           headers=auth)
+    data = response.get_json()
+    assert data["summary"] == {"ok": 1, "failed": 1, "timeout": 0, "error": 1, "total": 3}
+    assert [(result["status"], result["status_code"]) for result in data["results"]] == [("ok", 200), ("failed", 400), ("error", 500)]
+    assert data["results"][2]["error"] == "channel closed"
+
+
+def test_batch_gives_up_on_devices_over_their_time_budget(monkeypatch):
+    import WAN_checks_API
+
+    def checks(device_ip, *args, **kwargs):
+        time.sleep(2.5 if device_ip == "192.0.2.41" else 0)
+        return {"hostname": "CPE"}, 200
+
+    monkeypatch.setattr(WAN_checks_API, "run_device_checks_retrying", checks)
+    started = time.monotonic()
+    results = WAN_checks_API.run_batch_checks([entry("192.0.2.40"), entry("192.0.2.41")], max_workers=2, device_timeout=0.2)
+    # the batch checks the budgets every second and does not wait for the slow device
+    assert time.monotonic() - started < 2
+    assert [result["status"] for result in results] == ["ok", "timeout"]
+    assert results[1]["status_code"] == 504
+
+
+def test_batch_request_validation(client, auth, monkeypatch):
+    import WAN_checks_API
+
+    assert client.post('/wanchecks/batch/', json=[entry("192.0.2.50")]).status_code == 401
+    assert client.post('/wanchecks/batch/', json=[], headers=auth).status_code == 400
+    assert client.post('/wanchecks/batch/', json={"devices": "192.0.2.50"}, headers=auth).status_code == 400
+
+    response = client.post('/wanchecks/batch/', json=[entry("192.0.2.50"), {"device_ip": "192.0.2.51"}], headers=auth)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Device entry 1 is missing tenant_type, provider"
+
+    monkeypatch.setattr(WAN_checks_API, "BATCH_MAX_DEVICES", 2)
+    response = client.post('/wanchecks/batch/', json=[entry(f"192.0.2.{index}") for index in range(3)], headers=auth)
+    assert response.status_code == 400
+    assert "maximum of 2 devices" in response.get_json()["error"]
+
+
+def test_batch_entries_are_trimmed_to_the_included_sections(client, auth, fake):
+    fake.outputs = device_outputs("APLOS", "OTE", "", "healthy", 20)
+    response = client.post('/wanchecks/batch/?include=stats', json=[entry("192.0.2.60")], headers=auth)
+    result = response.get_json()["results"][0]
+    assert result["status"] == "ok" and "show_run_output" not in result
+    assert "bgp_stats" in result["json_return_output"] and "bgp_neighbor_output" not in result["json_return_output"]
@@ -0,0 +1,101 @@
+"""Tests of the check steps running in parallel over several SSH sessions to the same device."""
+
+import time
+import threading
+
+import pytest
+
+from check_plans import SessionSet, Step, compile_graph, run_graph
+from fake_device import device_outputs
+
+
+def run_checks(client, auth, device_ip):
+    response = client.post('/wanchecks/', json={"device_ip": device_ip, "tenant_type": "APLOS", "provider": "OTE",
+                                                "bgp_neighbor": "", "include": ["results", "raw_outputs", "stats"]},
+                           headers=auth)
+    assert response.status_code == 200
+    return response.get_json()["json_return_output"]
+
+
+def test_parallel_ping_sets_return_the_sequential_results(client, auth, fake, monkeypatch):
+    import WAN_checks_API
+
+    fake.outputs = device_outputs("APLOS", "OTE", "", "ping_failure", 20)
+    fake.command_latencies["ping"] = 0.05
+    started = time.monotonic()
+    sequential = run_checks(client, auth, "192.0.2.70")
+    sequential_seconds = time.monotonic() - started
+    assert fake.handshakes == 1
+
+    monkeypatch.setattr(WAN_checks_API, "CHECK_CONCURRENCY", 3)
+    started = time.monotonic()
+    parallel = run_checks(client, auth, "192.0.2.71")
+    parallel_seconds = time.monotonic() - started
+
+    # the session of the check and two extra sessions from the connection pool
+    assert fake.handshakes == 1 + 3
+    assert parallel_seconds < sequential_seconds * 0.8
+    assert {**parallel, "timings": None} == {**sequential, "timings": None}
+    assert parallel["PING_REPORT"] == "FAIL"
+
+
+def test_session_set_waits_for_a_busy_session_when_the_device_refuses_more():
+    opened = []
+
+    def open_extra():
+        opened.append(1)
+        raise ConnectionError("no free VTY line")
+
+    sessions = SessionSet("primary", open_extra, max_sessions=3)
+    assert sessions.acquire() == "primary"
+    threading.Timer(0.1, sessions.release, args=("primary",)).start()
+    assert sessions.acquire() == "primary"
+    # the failed open lowers the limit, no further sessions are tried
+    sessions.release("primary")
+    assert sessions.acquire() == "primary"
+    assert len(opened) == 1 and sessions.extra_sessions == []
+
+
+def test_parallel_steps_respect_their_dependencies():
+    events = []
+    lock = threading.Lock()
+
+    def step(name, seconds=0.05):
+        def run(context, session):
+            with lock:
+                events.append(("start", name))
+            time.sleep(seconds)
+            with lock:
+                events.append(("end", name))
+        return run
+
+    graph = compile_graph([
+        Step("show", step("show")),
+        Step("ping_a", step("ping_a", 0.2)),
+        Step("ping_b", step("ping_b", 0.2), after=("show",)),
+        Step("skipped", step("skipped"), when=lambda context: False),
+        Step("bgp", step("bgp"), after=("show", "skipped")),
+    ])
+    sessions = SessionSet("primary", lambda: "extra", max_sessions=3)
+    started = time.monotonic()
+    assert run_graph(graph, {}, sessions, max_parallel=3) == ["skipped"]
+    assert time.monotonic() - started < 0.4
+    assert events.index(("end", "show")) < events.index(("start", "ping_b"))
+    assert events.index(("end", "show")) < events.index(("start", "bgp"))
+    # ping_a does not wait for the show commands
+    assert events.index(("start", "ping_a")) < events.index(("end", "show"))
+
+
+def test_failing_step_stops_the_graph():
+    ran = []
+
+    def fail(context, session):
+        raise ValueError("unexpected output")
+
+    graph = compile_graph([
+        Step("show", fail),
+        Step("interfaces", lambda context, session: ran.append("interfaces"), after=("show",)),
+    ])
+    with pytest.raises(ValueError):
+        run_graph(graph, {}, SessionSet("primary", lambda: "extra", max_sessions=2), max_parallel=2)
+    assert ran == []
@@ -0,0 +1,110 @@
+"""Tests of the /wanchecks/ request validation and checks against the fake device."""
+
+from fake_device import corpus, device_outputs
+
+
+def test_unknown_provider_is_rejected_before_login(client, auth, fake):
+    fake.outputs = device_outputs("APLOS", "WIND", "", "healthy", 20)
+    response = client.post('/wanchecks/', json={"device_ip": "192.0.2.30", "tenant_type": "APLOS", "provider": "FOO",
+                                                "bgp_neighbor": ""}, headers=auth)
+    assert response.status_code == 400
+    assert response.get_json()["response"].startswith("Unknown provider FOO")
+    assert fake.handshakes == 0
+
+    response = client.post('/wanchecks/batch/', json=[
+        {"device_ip": "192.0.2.30", "tenant_type": "PSD", "provider": "FOO", "bgp_neighbor": ""},
+        {"device_ip": "192.0.2.31", "tenant_type": "APLOS", "provider": "wind", "bgp_neighbor": ""}], headers=auth)
+    results = response.get_json()["results"]
+    assert [result["status_code"] for result in results] == [400, 200]
+    assert fake.handshakes == 1
+
+
+def test_mmm_checks_do_not_need_a_known_provider(client, auth, fake):
+    fake.outputs = device_outputs("MMM", "OTE", "10.9.9.1", "healthy")
+    response = client.post('/wanchecks/', json={"device_ip": "192.0.2.32", "tenant_type": "MMM", "provider": "FOO",
+                                                "bgp_neighbor": "10.9.9.1"}, headers=auth)
+    assert response.status_code == 200
+
+
+def test_ipv6_verdict_comes_from_the_provider_neighbor(client, auth, fake):
+    # another IPv6 peer is Established, the provider's neighbor (2001:db8:1::1 of WIND) is Active
+    fake.outputs = device_outputs("APLOS", "WIND", "", "healthy", 20)
+    fake.outputs["show bgp ipv6 unicast neighbors"] = corpus("bgp_ipv6_neighbors")
+    response = client.post('/wanchecks/', json={"device_ip": "192.0.2.33", "tenant_type": "APLOS", "provider": "WIND",
+                                                "bgp_neighbor": "", "profile": "quick"}, headers=auth)
+    result = response.get_json()["json_return_output"]
+    assert result["BGP_REPORT"] == "FAIL"
+    assert "BGP v6 neighbor" not in result["bgp_results"]
+    assert [(record["neighbor"], record["state"]) for record in result["bgp_stats"] if record["address_family"] == "ipv6"] == \
+        [("2001:DB8:1::1", "Active")]
+
+
+def test_ipv6_neighbor_of_config_may_be_zero_padded(client, auth, fake, monkeypatch):
+    import WAN_checks_API
+
+    fake.outputs = device_outputs("APLOS", "WIND", "", "healthy", 20)
+    # IOS prints 2001:DB8:1::1
+    monkeypatch.setitem(WAN_checks_API.PROVIDER_BGP_NEIGHBORS, "WIND", ("10.255.1.1", "2001:0db8:0001::0001"))
+    response = client.post('/wanchecks/', json={"device_ip": "192.0.2.34", "tenant_type": "APLOS", "provider": "WIND",
+                                                "bgp_neighbor": "", "profile": "quick"}, headers=auth)
+    result = response.get_json()["json_return_output"]
+    assert result["BGP_REPORT"] == "OK"
+    assert "BGP v6 neighbor 2001:0db8:0001::0001 Established" in result["bgp_results"]
+
+
+class ReplayConnection:
+    """Replays a captured channel transcript, one read per page; the pager erasure arrives with the next page."""
+
+    RETURN = "\n"
+
+    def __init__(self, transcript):
+        pages = transcript.split(" --More-- ")
+        self.reads = [page + " --More-- " for page in pages[:-1]] + [pages[-1]]
+        self.answers = []
+        self.sent = False
+
+    def find_prompt(self):
+        return "CPE#"
+
+    def write_channel(self, data):
+        if self.sent:
+            self.answers.append(data)
+        self.sent = True
+
+    def read_channel(self):
+        # the next page only comes after the answer to the prompt
+        page = len(self.answers)
+        if page >= len(self.reads) or self.reads[page] is None:
+            return ""
+        data, self.reads[page] = self.reads[page], None
+        return data
+
+
+def test_route_table_pager_erasure_is_stripped():
+    import WAN_checks_API
+    connection = ReplayConnection(corpus("route_table_paged"))
+    output_lines = []
+    captured, route_table = WAN_checks_API.collect_bgp_routes(
+        connection, "show ip bgp neighbors 10.255.0.1 received-routes", output_lines, max_lines=0)
+    assert "\x08" not in captured and "--More--" not in captured
+    assert connection.answers == [" ", " "]
+    assert route_table == {"lines_captured": 15, "truncated": False, "total_prefixes": 8}
+    assert all(line.startswith(("*>", "BGP", "Status", "Origin", "Total", "     Network")) or not line
+               for line in captured.split("\n"))
+
+
+def test_route_table_limit_is_read_when_the_table_is_collected(monkeypatch):
+    import WAN_checks_API
+    from fake_device import FakeConnection, FakeDevice, route_table
+
+    command = "show ip bgp neighbors 10.255.0.1 received-routes"
+    connection = FakeConnection(FakeDevice(outputs={command: route_table(200)}))
+    connection.send_command("terminal length 11")
+    monkeypatch.setattr(WAN_checks_API, "BGP_ROUTES_MAX_LINES", 10)
+    captured, route_table_info = WAN_checks_API.collect_bgp_routes(connection, command, [])
+    assert route_table_info == {"lines_captured": 10, "truncated": True, "total_prefixes": None}
+
+    monkeypatch.setattr(WAN_checks_API, "BGP_ROUTES_MAX_LINES", 0)
+    connection.send_command("terminal length 0")
+    captured, route_table_info = WAN_checks_API.collect_bgp_routes(connection, command, [])
+    assert route_table_info == {"lines_captured": 207, "truncated": False, "total_prefixes": 200}
@@ -0,0 +1,139 @@
+"""Tests of the per-device circuit breaker and the connection retry backoff."""
+
+import types
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, backoff_delay
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, "time", types.SimpleNamespace(monotonic=clock, time=lambda: clock.now))
+    return clock
+
+
+def fail(breaker, times, device_ip="192.0.2.1"):
+    for _ in range(times):
+        breaker.record_failure(device_ip, TimeoutError("connect timed out"))
+
+
+def test_circuit_opens_at_the_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    fail(breaker, 2)
+    assert breaker.allow("192.0.2.1") is None
+
+    fail(breaker, 1)
+    assert breaker.allow("192.0.2.1") == 60
+    clock.now += 15
+    assert breaker.allow("192.0.2.1") == 45
+    # other devices are not affected
+    assert breaker.allow("192.0.2.2") is None
+
+    stats = breaker.stats()
+    assert stats["opened"] == 1 and stats["rejected"] == 2
+    assert stats["devices"]["192.0.2.1"] == {"failures": 3, "open": True, "retry_after": 45.0, "cooldown": 60,
+                                             "last_error": "TimeoutError: connect timed out"}
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    fail(breaker, 2)
+    breaker.record_success("192.0.2.1")
+    fail(breaker, 2)
+    assert breaker.allow("192.0.2.1") is None
+
+
+def test_one_trial_after_the_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    fail(breaker, 3)
+    clock.now += 60
+
+    # a plain lookup does not start the trial
+    assert breaker.allow("192.0.2.1", trial=False) is None
+    assert breaker.allow("192.0.2.1") is None
+    # the checks arriving while the trial runs are rejected for a whole cooldown
+    assert breaker.allow("192.0.2.1") == 60
+    assert breaker.allow("192.0.2.1", trial=False) == 60
+
+    breaker.record_success("192.0.2.1")
+    assert breaker.allow("192.0.2.1") is None
+    assert breaker.stats()["devices"] == {}
+
+
+def test_failed_trials_double_the_cooldown_up_to_the_maximum(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60, max_cooldown=200)
+    fail(breaker, 3)
+    cooldowns = []
+    for _ in range(4):
+        cooldowns.append(breaker.allow("192.0.2.1"))
+        clock.now += cooldowns[-1]
+        assert breaker.allow("192.0.2.1") is None     # the trial
+        fail(breaker, 1)
+    assert cooldowns == [60, 120, 200, 200]
+    assert breaker.stats()["opened"] == 5     # the first opening and the failed trials
+
+
+def test_threshold_zero_never_opens(clock):
+    breaker = CircuitBreaker(failure_threshold=0)
+    fail(breaker, 10)
+    assert breaker.allow("192.0.2.1") is None
+
+
+def test_backoff_delay_is_exponential_capped_and_jittered():
+    for attempt, upper in enumerate([5, 10, 20, 40, 60, 60]):
+        delays = [backoff_delay(attempt, 5, 60) for _ in range(200)]
+        assert all(upper / 2 <= delay <= upper for delay in delays)
+        assert len(set(delays)) > 1
+
+
+def test_retrying_checks_back_off_after_failed_logins(monkeypatch):
+    import WAN_checks_API
+
+    responses = [({"response": "Failed to connect", "error": "login_failed"}, 400)] * 2 + [({"hostname": "CPE"}, 200)]
+    calls, sleeps = [], []
+
+    def checks(*args, **kwargs):
+        calls.append(args)
+        return responses[len(calls) - 1]
+
+    monkeypatch.setattr(WAN_checks_API, "run_device_checks_shared", checks)
+    monkeypatch.setattr(WAN_checks_API, "time", types.SimpleNamespace(sleep=sleeps.append))
+    monkeypatch.setattr(WAN_checks_API, "CONNECT_RETRIES", 2)
+    monkeypatch.setattr(WAN_checks_API, "CONNECT_BACKOFF", 5)
+    monkeypatch.setattr(WAN_checks_API, "CONNECT_BACKOFF_MAX", 60)
+
+    assert WAN_checks_API.run_device_checks_retrying("192.0.2.1", "APLOS", "OTE", "") == ({"hostname": "CPE"}, 200)
+    assert len(calls) == 3
+    assert 2.5 <= sleeps[0] <= 5 and 5 <= sleeps[1] <= 10
+
+    # out of retries: the last failure is returned
+    calls.clear()
+    responses[2] = responses[0]
+    assert WAN_checks_API.run_device_checks_retrying("192.0.2.1", "APLOS", "OTE", "")[1] == 400
+    assert len(calls) == 3
+
+
+def test_retrying_checks_give_up_on_an_open_circuit(monkeypatch):
+    import WAN_checks_API
+
+    calls = []
+
+    def checks(*args, **kwargs):
+        calls.append(args)
+        return {"error": "circuit_open", "retry_after": 60}, 503
+
+    monkeypatch.setattr(WAN_checks_API, "run_device_checks_shared", checks)
+    monkeypatch.setattr(WAN_checks_API, "time", types.SimpleNamespace(sleep=pytest.fail))
+    assert WAN_checks_API.run_device_checks_retrying("192.0.2.1", "APLOS", "OTE", "")[1] == 503
+    assert len(calls) == 1
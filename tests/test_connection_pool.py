@@ -0,0 +1,153 @@
+"""Tests of the per-device SSH connection pool."""
+
+import sys
+import time
+import types
+import threading
+
+import pytest
+
+import connection_pool
+from connection_pool import ConnectionPool, PoolExhaustedError
+
+
+class Session:
+    def __init__(self, device):
+        self.ip = device["ip"]
+        self.alive = True
+        self.disconnected = False
+
+    def is_alive(self):
+        return self.alive
+
+    def clear_buffer(self):
+        pass
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+def device(ip="192.0.2.1"):
+    return {"ip": ip}
+
+
+def new_pool(**kwargs):
+    # a reaper interval longer than any test, the tests evict explicitly
+    return ConnectionPool(Session, **{"reap_interval": 3600, **kwargs})
+
+
+def test_released_session_is_reused():
+    pool = new_pool()
+    session = pool.acquire(device())
+    pool.release(session)
+    assert pool.acquire(device()) is session
+    stats = pool.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["devices"] == {"192.0.2.1": {"open": 1, "idle": 0}}
+
+
+def test_sessions_per_device_are_capped():
+    pool = new_pool(max_sessions_per_device=2, acquire_timeout=0.2)
+    sessions = [pool.acquire(device()), pool.acquire(device())]
+    with pytest.raises(PoolExhaustedError):
+        pool.acquire(device(), block=False)
+    # other devices have their own limit
+    assert pool.acquire(device("192.0.2.2")).ip == "192.0.2.2"
+
+    started = time.monotonic()
+    with pytest.raises(PoolExhaustedError):
+        pool.acquire(device())
+    assert 0.15 <= time.monotonic() - started < 2
+    assert pool.stats()["devices"]["192.0.2.1"]["open"] == 2
+    assert not any(session.disconnected for session in sessions)
+
+
+def test_waiting_acquire_gets_the_released_session():
+    pool = new_pool(max_sessions_per_device=1, acquire_timeout=5)
+    session = pool.acquire(device())
+    threading.Timer(0.1, pool.release, args=(session,)).start()
+    assert pool.acquire(device()) is session
+
+
+def test_discarded_session_frees_its_slot():
+    pool = new_pool(max_sessions_per_device=1, acquire_timeout=0)
+    session = pool.acquire(device())
+    pool.discard(session)
+    assert session.disconnected
+    assert pool.acquire(device()) is not session
+
+
+def test_failed_connect_frees_its_slot():
+    attempts = []
+
+    def connect(device):
+        attempts.append(device)
+        if len(attempts) == 1:
+            raise TimeoutError("connect timed out")
+        return Session(device)
+
+    pool = ConnectionPool(connect, max_sessions_per_device=1, acquire_timeout=0, reap_interval=3600)
+    with pytest.raises(TimeoutError):
+        pool.acquire(device())
+    assert pool.acquire(device()).ip == "192.0.2.1"
+    assert pool.stats()["connect_failures"] == 1
+
+
+def test_dead_idle_session_is_replaced():
+    pool = new_pool()
+    session = pool.acquire(device())
+    pool.release(session)
+    session.alive = False
+    replacement = pool.acquire(device())
+    assert replacement is not session and session.disconnected
+    assert pool.stats()["validation_failures"] == 1
+
+
+def test_idle_sessions_are_evicted_after_the_idle_timeout(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(connection_pool, "time", types.SimpleNamespace(monotonic=lambda: clock.now, sleep=time.sleep))
+    pool = new_pool(idle_timeout=60)
+    session = pool.acquire(device())
+    pool.release(session)
+
+    clock.now += 59
+    pool.evict_idle()
+    assert not session.disconnected
+
+    clock.now += 2
+    pool.evict_idle()
+    assert session.disconnected
+    stats = pool.stats()
+    assert stats["evictions"] == 1 and stats["devices"] == {}
+
+
+def test_closed_pool_does_not_keep_released_sessions():
+    pool = new_pool()
+    session = pool.acquire(device())
+    pool.close_all()
+    pool.release(session)
+    assert session.disconnected
+    assert pool.stats()["devices"] == {}
+
+
+def test_counters_are_exact_under_concurrent_checks():
+    pool = new_pool(max_sessions_per_device=4)
+
+    def check(device_ip):
+        for _ in range(200):
+            pool.release(pool.acquire(device(device_ip)))
+
+    threads = [threading.Thread(target=check, args=(f"192.0.2.{index % 4}",)) for index in range(16)]
+    # switch threads as often as possible to expose lost updates
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    stats = pool.stats()
+    assert stats["hits"] + stats["misses"] == 16 * 200
+    assert stats["misses"] == sum(device["open"] for device in stats["devices"].values())
@@ -0,0 +1,103 @@
+"""Tests of the per-device cache of show run, show version and show license status."""
+
+import types
+
+import pytest
+
+import device_cache
+from device_cache import DeviceCache
+from fake_device import device_outputs
+
+CACHED = ["show run", "show version", "show license status"]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(device_cache, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_every_command_expires_after_its_own_ttl(clock):
+    cache = DeviceCache({"show run": 60, "show version": 600, "show license status": 0})
+    cache.put_outputs("192.0.2.1", {"show run": "run", "show version": "version", "show license status": "license"})
+    assert cache.get_outputs("192.0.2.1", CACHED) == {"show run": "run", "show version": "version"}
+    assert cache.get_outputs("192.0.2.2", CACHED) == {}
+
+    clock.now += 61
+    assert cache.get_outputs("192.0.2.1", CACHED) == {"show version": "version"}
+    clock.now += 540
+    assert cache.get_outputs("192.0.2.1", CACHED) == {}
+    assert not cache.has_entries("192.0.2.1")
+    assert (cache.metrics["hits"], cache.metrics["misses"]) == (3, 5)
+
+
+def test_cached_output_keeps_its_expiry_when_stored_again(clock):
+    cache = DeviceCache({"show run": 60})
+    cache.put_outputs("192.0.2.1", {"show run": "old"})
+    clock.now += 30
+    cache.put_outputs("192.0.2.1", {"show run": "new"})
+    assert cache.get_outputs("192.0.2.1", ["show run"]) == {"show run": "old"}
+    clock.now += 31
+    assert cache.get_outputs("192.0.2.1", ["show run"]) == {}
+
+
+@pytest.mark.parametrize("previous, current, invalidated", [
+    ("10:22:31 UTC Tue Mar 14 2023 by admin", "10:22:31 UTC Tue Mar 14 2023 by admin", False),
+    ("10:22:31 UTC Tue Mar 14 2023 by admin", "09:00:00 UTC Wed Mar 15 2023 by admin", True),
+    # an unknown timestamp does not invalidate
+    (None, "09:00:00 UTC Wed Mar 15 2023 by admin", False),
+    ("10:22:31 UTC Tue Mar 14 2023 by admin", None, False),
+])
+def test_config_change_invalidates_the_device(clock, previous, current, invalidated):
+    cache = DeviceCache({"show run": 60, "show version": 600})
+    cache.put_outputs("192.0.2.1", {"show run": "run", "show version": "version"})
+    cache.put_outputs("192.0.2.2", {"show run": "run"})
+    cache.set_config_stamp("192.0.2.1", previous)
+    assert cache.check_config_change("192.0.2.1", current) is invalidated
+    assert cache.has_entries("192.0.2.1") is not invalidated
+    assert cache.has_entries("192.0.2.2")
+
+
+def check(client, auth, **fields):
+    response = client.post('/wanchecks/', json={"device_ip": "192.0.2.110", "tenant_type": "APLOS", "provider": "OTE",
+                                                "bgp_neighbor": "", "include": ["show_run"], **fields}, headers=auth)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def sent(fake, commands):
+    return [command for command in fake.commands if command in commands]
+
+
+def test_repeated_checks_use_the_cached_outputs_until_the_config_changes(client, auth, fake, monkeypatch):
+    import WAN_checks_API
+
+    monkeypatch.setattr(WAN_checks_API, "device_cache", DeviceCache({"show run": 3600, "show version": 86400,
+                                                                     "show license status": 3600}))
+    fake.outputs = device_outputs("APLOS", "OTE", "", "healthy", 20)
+    first = check(client, auth)
+    assert first["cached_commands"] == []
+    assert sent(fake, CACHED) == CACHED
+
+    fake.commands.clear()
+    second = check(client, auth)
+    assert second["cached_commands"] == sorted(CACHED)
+    assert second["show_run_output"] == first["show_run_output"]
+    assert sent(fake, CACHED) == []
+    assert WAN_checks_API.CONFIG_CHANGE_COMMAND in fake.commands
+
+    # a new 'Last configuration change' timestamp drops the cached outputs of the device
+    fake.outputs[WAN_checks_API.CONFIG_CHANGE_COMMAND] = "! Last configuration change at 09:00:00 UTC Wed Mar 15 2023 by admin"
+    fake.outputs["show run"] = fake.outputs["show run"].replace("10:22:31 UTC Tue Mar 14", "09:00:00 UTC Wed Mar 15")
+    fake.commands.clear()
+    third = check(client, auth)
+    assert third["cached_commands"] == []
+    assert sent(fake, CACHED) == CACHED
+    assert "09:00:00 UTC Wed Mar 15" in third["show_run_output"]
+
+    fake.commands.clear()
+    assert check(client, auth)["cached_commands"] == sorted(CACHED)
+    fake.commands.clear()
+    assert check(client, auth, force_refresh=True)["cached_commands"] == []
+    assert sent(fake, CACHED) == CACHED
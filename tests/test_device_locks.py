@@ -0,0 +1,152 @@
+"""Tests of the request coalescing of identical concurrent checks and of the per-device check limit."""
+
+import time
+import threading
+
+from device_locks import DeviceLimiter, SingleFlight
+from fake_device import device_outputs
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def run_concurrently(flight, key, func, callers):
+    """Start a leader call and 'callers' more calls with the same key while it runs; return their outcomes."""
+    release = threading.Event()
+    outcomes = [None] * (callers + 1)
+
+    def blocked():
+        release.wait(5)
+        return func()
+
+    def call(index):
+        try:
+            outcomes[index] = ("result", flight.do(key, blocked))
+        except Exception as e:
+            outcomes[index] = ("exception", e)
+
+    threads = [threading.Thread(target=call, args=(0,))]
+    threads[0].start()
+    wait_for(lambda: flight.in_flight() == 1)
+    threads += [threading.Thread(target=call, args=(index,)) for index in range(1, callers + 1)]
+    for thread in threads[1:]:
+        thread.start()
+    wait_for(lambda: flight.metrics["coalesced"] == callers)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    executions = []
+
+    def check():
+        executions.append(1)
+        return {"hostname": "CPE"}
+
+    outcomes = run_concurrently(flight, ("192.0.2.1", "APLOS"), check, callers=4)
+    assert len(executions) == 1
+    results = [result for _, (result, _) in outcomes]
+    assert all(result is results[0] for result in results)
+    assert [coalesced for _, (_, coalesced) in outcomes] == [False] + [True] * 4
+    assert flight.metrics == {"executions": 1, "coalesced": 4}
+    assert flight.in_flight() == 0
+
+
+def test_concurrent_callers_share_one_exception():
+    flight = SingleFlight()
+
+    def check():
+        raise TimeoutError("connect timed out")
+
+    outcomes = run_concurrently(flight, ("192.0.2.1", "APLOS"), check, callers=3)
+    assert [kind for kind, _ in outcomes] == ["exception"] * 4
+    assert all(error is outcomes[0][1] for _, error in outcomes)
+    # the failed call is not cached, the next call runs again
+    assert flight.do(("192.0.2.1", "APLOS"), lambda: "ok") == ("ok", False)
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+    assert flight.do("a", lambda: 3) == (3, False)
+    assert flight.metrics == {"executions": 3, "coalesced": 0}
+
+
+def run_checks(limiter, device_ips, seconds=0.05):
+    """Run one check per IP through the limiter; return the highest number of checks running at once per device."""
+    running, highest, lock = {}, {}, threading.Lock()
+
+    def check(device_ip):
+        assert limiter.acquire(device_ip)
+        try:
+            with lock:
+                running[device_ip] = running.get(device_ip, 0) + 1
+                highest[device_ip] = max(highest.get(device_ip, 0), running[device_ip])
+            time.sleep(seconds)
+            with lock:
+                running[device_ip] -= 1
+        finally:
+            limiter.release(device_ip)
+
+    threads = [threading.Thread(target=check, args=(device_ip,)) for device_ip in device_ips]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return highest
+
+
+def test_checks_of_a_device_run_one_at_a_time():
+    limiter = DeviceLimiter(max_per_device=1, timeout=5)
+    assert run_checks(limiter, ["192.0.2.1"] * 5 + ["192.0.2.2"] * 5) == {"192.0.2.1": 1, "192.0.2.2": 1}
+    assert limiter.stats() == {}
+
+
+def test_device_max_checks_run_at_the_same_time():
+    limiter = DeviceLimiter(max_per_device=2, timeout=5)
+    assert run_checks(limiter, ["192.0.2.1"] * 6, seconds=0.1) == {"192.0.2.1": 2}
+
+
+def test_check_gives_up_after_the_queue_timeout():
+    limiter = DeviceLimiter(max_per_device=1, timeout=0.1)
+    assert limiter.acquire("192.0.2.1")
+    waiting = threading.Thread(target=limiter.acquire, args=("192.0.2.1",))
+    waiting.start()
+    wait_for(lambda: limiter.stats()["192.0.2.1"]["waiting"] == 1)
+
+    started = time.monotonic()
+    assert not limiter.acquire("192.0.2.1")
+    assert 0.1 <= time.monotonic() - started < 1
+    waiting.join(5)
+    # the timed out checks leave the queue and other devices are not affected
+    assert limiter.stats() == {"192.0.2.1": {"running": 1, "waiting": 0}}
+    assert limiter.acquire("192.0.2.2")
+    limiter.release("192.0.2.2")
+    limiter.release("192.0.2.1")
+    assert limiter.acquire("192.0.2.1")
+
+
+def test_busy_device_returns_503(client, auth, fake, monkeypatch):
+    import WAN_checks_API
+
+    fake.outputs = device_outputs("APLOS", "OTE", "", "healthy", 20)
+    limiter = DeviceLimiter(max_per_device=1, timeout=0.05)
+    monkeypatch.setattr(WAN_checks_API, "device_limiter", limiter)
+    limiter.acquire("192.0.2.150")
+    request = {"device_ip": "192.0.2.150", "tenant_type": "APLOS", "provider": "OTE", "bgp_neighbor": ""}
+
+    response = client.post('/wanchecks/', json=request, headers=auth)
+    assert response.status_code == 503
+    assert response.get_json()["response"] == "192.0.2.150 is busy with other checks, try again later"
+    assert fake.handshakes == 0
+
+    limiter.release("192.0.2.150")
+    assert client.post('/wanchecks/', json=request, headers=auth).status_code == 200
@@ -0,0 +1,111 @@
+"""Tests of the fleet sweep scheduler and of the sweeps of the fake devices."""
+
+import json
+import time
+
+import pytest
+
+from fake_device import FakeConnection, FakeDevice, device_outputs
+from fleet_sweep import FleetSweeper
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    path = tmp_path / "inventory.json"
+    path.write_text(json.dumps([{"device_ip": "192.0.2.1", "tenant_type": "APLOS", "provider": "OTE"},
+                                {"device_ip": "192.0.2.2", "tenant_type": "PSD", "provider": "WIND"}]))
+    return str(path)
+
+
+def check(device_ip, tenant_type, provider, bgp_neighbor):
+    return {"json_return_output": {"PING_REPORT": "OK"}}, 200
+
+
+def test_trigger_runs_a_sweep_without_a_started_scheduler(inventory):
+    sweeper = FleetSweeper(check, inventory, interval=0, rate=0)
+    try:
+        assert sweeper.trigger() is True
+        wait_for(lambda: sweeper.sweeps and sweeper.sweeps[-1]["status"] == "finished")
+        assert sweeper.sweeps[-1]["results"]["ok"] == 2
+
+        # the scheduler started by the first trigger runs the next one
+        assert sweeper.trigger() is True
+        wait_for(lambda: len(sweeper.sweeps) == 2 and sweeper.sweeps[-1]["status"] == "finished")
+    finally:
+        sweeper.stop()
+
+
+def test_trigger_of_a_stopped_scheduler_fails(inventory):
+    sweeper = FleetSweeper(check, inventory, interval=0, rate=0)
+    sweeper.stop()
+    with pytest.raises(RuntimeError):
+        sweeper.trigger()
+
+
+@pytest.fixture
+def fleet(tmp_path, fake, monkeypatch):
+    """An inventory of fake devices: healthy, with an Idle BGP neighbor, unreachable and with an unknown provider."""
+    import WAN_checks_API
+
+    devices = {"192.0.2.180": FakeDevice(outputs=device_outputs("APLOS", "OTE", "", "healthy", 20), command_latencies={"ping": 0.0}),
+               "192.0.2.181": FakeDevice(outputs=device_outputs("PSD", "WIND", "", "bgp_idle", 20), command_latencies={"ping": 0.0})}
+
+    def connect(**device):
+        if device["ip"] not in devices:
+            raise ConnectionRefusedError("connection refused")
+        return FakeConnection(devices[device["ip"]], **device)
+
+    monkeypatch.setattr(WAN_checks_API, "connect_netmiko", connect)
+    monkeypatch.setattr(WAN_checks_API, "CONNECT_RETRIES", 0)
+    path = tmp_path / "inventory.csv"
+    path.write_text("device_ip,tenant_type,provider,bgp_neighbor\n"
+                    "192.0.2.180,APLOS,OTE,\n192.0.2.181,PSD,WIND,\n192.0.2.182,APLOS,OTE,\n192.0.2.183,APLOS,ACME,\n")
+    return FleetSweeper(WAN_checks_API.run_device_checks_retrying, str(path), interval=0, rate=0, max_workers=4)
+
+
+def test_sweep_checks_every_device_of_the_inventory(fleet):
+    summary = fleet.run_sweep()
+    assert (summary["status"], summary["devices"], summary["checked"]) == ("finished", 4, 4)
+    assert summary["results"] == {"ok": 1, "failed": 1, "unreachable": 1, "error": 1}
+    assert summary["providers"] == {"OTE": {"ok": 1, "failed": 0, "unreachable": 1, "error": 0},
+                                    "WIND": {"ok": 0, "failed": 1, "unreachable": 0, "error": 0},
+                                    "ACME": {"ok": 0, "failed": 0, "unreachable": 0, "error": 1}}
+    failures = {failure["device_ip"]: failure for failure in summary["failed_devices"]}
+    assert sorted(failures) == ["192.0.2.181", "192.0.2.182", "192.0.2.183"]
+    assert failures["192.0.2.181"]["reports"]["BGP_REPORT"] == "FAIL"
+    assert failures["192.0.2.181"]["reports"]["PING_REPORT"] == "OK"
+    assert failures["192.0.2.182"]["response"] == "Failed to connect to 192.0.2.182"
+    assert failures["192.0.2.183"]["error"].startswith("Unknown provider ACME")
+
+
+def test_sweep_endpoint_starts_a_sweep_and_returns_its_summary(client, auth, fleet, monkeypatch):
+    import WAN_checks_API
+
+    monkeypatch.setattr(WAN_checks_API, "fleet_sweeper", None)
+    assert client.post('/wanchecks/sweep/', headers=auth).status_code == 404
+
+    monkeypatch.setattr(WAN_checks_API, "fleet_sweeper", fleet)
+    try:
+        assert client.get('/wanchecks/sweep/').status_code == 401
+        response = client.post('/wanchecks/sweep/', headers=auth)
+        assert response.status_code == 202
+        assert response.get_json() == {"status": "started", "status_url": "/wanchecks/sweep/"}
+
+        def sweep_statuses():
+            return [sweep["status"] for sweep in client.get('/wanchecks/sweep/', headers=auth).get_json()["sweeps"]]
+
+        wait_for(lambda: sweep_statuses() == ["finished"])
+        status = client.get('/wanchecks/sweep/', headers=auth).get_json()
+        assert status["interval_seconds"] == 0
+        [sweep] = status["sweeps"]
+        assert (sweep["status"], sweep["results"]["ok"], sweep["results"]["failed"]) == ("finished", 1, 1)
+    finally:
+        fleet.stop()
+    assert client.post('/wanchecks/sweep/', headers=auth).status_code == 503
@@ -0,0 +1,38 @@
+"""Tests of the check history: profiles and diffs."""
+
+from fake_device import device_outputs
+
+
+def run_check(client, auth, profile):
+    response = client.post('/wanchecks/', json={"device_ip": "192.0.2.10", "tenant_type": "APLOS", "provider": "WIND",
+                                                "bgp_neighbor": "", "profile": profile}, headers=auth)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_quick_check_after_standard_check_has_empty_diff(client, auth, fake):
+    fake.outputs = device_outputs("APLOS", "WIND", "", "healthy", 20)
+    standard = run_check(client, auth, "standard")
+    run_check(client, auth, "quick")
+
+    # the quick check is not compared with the standard check, then with the previous quick check
+    assert client.get('/wanchecks/history/diff/?device_ip=192.0.2.10', headers=auth).status_code == 404
+    run_check(client, auth, "quick")
+    diff = client.get('/wanchecks/history/diff/?device_ip=192.0.2.10', headers=auth).get_json()
+    assert diff["changed"] is False and diff["changes"] == {}
+    assert diff["current"]["profile"] == diff["previous"]["profile"] == "quick"
+
+    # a standard check is compared with the previous standard check
+    run_check(client, auth, "standard")
+    diff = client.get('/wanchecks/history/diff/?device_ip=192.0.2.10', headers=auth).get_json()
+    assert diff["changed"] is False and diff["changes"] == {}
+    assert diff["previous"]["profile"] == "standard"
+
+    # the quick checks keep the serial number read by the standard check
+    serial_number = standard["json_return_output"]["serial_number"]
+    assert serial_number
+    summaries = client.get('/wanchecks/history/?device_ip=192.0.2.10', headers=auth).get_json()["checks"]
+    assert [check["serial_number"] for check in summaries] == [serial_number] * 4
+    latest = client.get('/wanchecks/history/latest/', headers=auth).get_json()["devices"]
+    assert latest[0]["serial_number"] == serial_number
+
@@ -0,0 +1,120 @@
+"""Tests of the asynchronous jobs and their callback URLs."""
+
+import time
+import threading
+
+import pytest
+
+from fake_device import device_outputs
+from job_manager import JobManager, QueueFullError, callback_url_allowed
+
+
+def wait_for_job(manager, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while manager.get(job_id)["status"] in ("queued", "running"):
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+    return manager.get(job_id)
+
+
+def test_finished_and_failed_jobs():
+    manager = JobManager(max_workers=1, max_queued=1)
+
+    def fail():
+        raise TimeoutError("connect timed out")
+
+    job = wait_for_job(manager, manager.submit(lambda device_ip: ({"device_ip": device_ip}, 200), "192.0.2.1"))
+    assert (job["status"], job["status_code"], job["result"]) == ("finished", 200, {"device_ip": "192.0.2.1"})
+    job = wait_for_job(manager, manager.submit(fail))
+    assert (job["status"], job["status_code"], job["error"]) == ("failed", 500, "connect timed out")
+    assert manager.get("unknown") is None
+    manager.shutdown()
+
+
+def test_full_queue_rejects_new_jobs():
+    manager = JobManager(max_workers=1, max_queued=1)
+    release = threading.Event()
+
+    def blocked():
+        return release.wait(5), 200
+
+    manager.submit(blocked)
+    manager.submit(blocked)
+    with pytest.raises(QueueFullError):
+        manager.submit(blocked)
+    release.set()
+    manager.shutdown()
+
+
+def test_shutdown_fails_the_queued_jobs():
+    manager = JobManager(max_workers=1, max_queued=2)
+    release = threading.Event()
+    running = manager.submit(lambda: (release.wait(5), 200))
+    queued = [manager.submit(lambda: ({}, 200)) for _ in range(2)]
+    while manager.get(running)["status"] != "running":
+        time.sleep(0.01)
+
+    threading.Timer(0.1, release.set).start()
+    manager.shutdown(wait=True)
+    assert manager.get(running)["status"] == "finished"
+    for job_id in queued:
+        job = manager.get(job_id)
+        assert (job["status"], job["status_code"]) == ("failed", 503)
+        assert job["error"] == "Cancelled, the server is shutting down" and job["finished_at"]
+    assert manager.stats()["queued"] == 0
+
+
+@pytest.mark.parametrize("callback_url, allowed", [
+    ("https://flows.example.com/workflows/1/run?sig=x", True),
+    ("https://FLOWS.example.com/workflows/2", True),
+    ("http://flows.example.com/workflows/1", False),
+    ("https://flows.example.com/admin", False),
+    ("https://flows.example.com.attacker.net/workflows/1", False),
+    ("https://flows.example.com@10.0.0.1/workflows/1", False),
+    ("https://127.0.0.1:5000/workflows/1", False),
+    ("ftp://flows.example.com/workflows/1", False),
+])
+def test_callback_url_allow_list(callback_url, allowed):
+    assert callback_url_allowed(callback_url, ["https://flows.example.com/workflows/"]) is allowed
+
+
+def test_callbacks_are_disabled_without_prefixes():
+    assert not callback_url_allowed("https://flows.example.com/workflows/1", ())
+
+
+def test_async_check_is_polled_until_finished(client, auth, fake, monkeypatch):
+    import WAN_checks_API
+
+    fake.outputs = device_outputs("APLOS", "OTE", "", "healthy", 20)
+    monkeypatch.setattr(WAN_checks_API, "job_manager", JobManager(max_workers=1, max_queued=1))
+    request = {"device_ip": "192.0.2.80", "tenant_type": "APLOS", "provider": "OTE", "bgp_neighbor": "", "async": True,
+               "include": []}
+    response = client.post('/wanchecks/', json=request, headers=auth)
+    assert response.status_code == 202
+    status_url = response.get_json()["status_url"]
+    assert response.headers["Location"] == status_url
+
+    deadline = time.monotonic() + 5
+    while (job := client.get(status_url, headers=auth).get_json())["status"] in ("queued", "running"):
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+    assert (job["status"], job["status_code"]) == ("finished", 200)
+    assert job["result"]["json_return_output"]["BGP_REPORT"] == "OK"
+    assert "show_run_output" not in job["result"]
+    WAN_checks_API.job_manager.shutdown()
+
+
+def test_callback_url_outside_the_allow_list_is_rejected(client, auth, monkeypatch):
+    import WAN_checks_API
+
+    submitted = []
+    monkeypatch.setattr(WAN_checks_API.job_manager, "submit", lambda *args, **kwargs: submitted.append(args))
+    monkeypatch.setattr(WAN_checks_API, "CALLBACK_URL_PREFIXES", ["https://flows.example.com/workflows/"])
+    request = {"device_ip": "192.0.2.81", "tenant_type": "APLOS", "provider": "OTE", "bgp_neighbor": "", "async": True}
+
+    for callback_url in ("http://169.254.169.254/latest/meta-data/", "https://flows.example.com.attacker.net/workflows/"):
+        response = client.post('/wanchecks/', json={**request, "callback_url": callback_url}, headers=auth)
+        assert response.status_code == 400
+        assert "CALLBACK_URL_PREFIXES" in response.get_json()["error"]
+    assert client.post('/wanchecks/', json={**request, "callback_url": 42}, headers=auth).status_code == 400
+    assert submitted == []
@@ -0,0 +1,96 @@
+"""Tests of the queued JSON logging of the print() output of the checks."""
+
+import json
+import logging
+import threading
+import contextvars
+
+from fake_device import device_outputs
+from log_config import LogStream, device_ip_var, request_id_var, setup_logging, stop_logging
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as log_file:
+        return [json.loads(line) for line in log_file]
+
+
+def test_completed_lines_are_logged_as_json(tmp_path):
+    log_file = tmp_path / "console_log.txt"
+    listener = setup_logging(str(log_file), logger_name="test_log_config.lines")
+    stream = LogStream(logging.getLogger("test_log_config.lines"))
+
+    stream.write("Serial number: ")
+    stream.write("\x1b[32mFLM2521W0AB\x1b[0m\nsecond line\n\n   \nunfinished")
+    stream.flush()
+    stop_logging(listener)
+    # stopping twice, e.g. at exit after a graceful shutdown, is harmless
+    stop_logging(listener)
+
+    records = read_records(log_file)
+    assert [record["message"] for record in records] == ["Serial number: FLM2521W0AB", "second line", "unfinished"]
+    assert {(record["level"], record["logger"]) for record in records} == {("INFO", "test_log_config.lines")}
+
+
+def test_lines_of_concurrent_threads_are_not_mixed(tmp_path):
+    log_file = tmp_path / "console_log.txt"
+    listener = setup_logging(str(log_file), logger_name="test_log_config.threads")
+    stream = LogStream(logging.getLogger("test_log_config.threads"))
+    barrier = threading.Barrier(4)
+
+    def check(request_id, device_ip):
+        request_id_var.set(request_id)
+        device_ip_var.set(device_ip)
+        for step in range(50):
+            stream.write(f"{device_ip} step ")
+            barrier.wait()
+            stream.write(f"{step}\n")
+
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(check, f"req-{n}", f"192.0.2.{n}"))
+               for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stop_logging(listener)
+
+    records = read_records(log_file)
+    assert len(records) == 200
+    for record in records:
+        device_ip, step = record["message"].split(" step ")
+        assert record["device_ip"] == device_ip
+        assert record["request_id"] == f"req-{device_ip.rsplit('.', 1)[1]}"
+        assert 0 <= int(step) < 50
+
+
+def test_log_file_is_rotated_at_max_bytes(tmp_path):
+    log_file = tmp_path / "console_log.txt"
+    listener = setup_logging(str(log_file), max_bytes=1000, backup_count=2, logger_name="test_log_config.rotation")
+    logger = logging.getLogger("test_log_config.rotation")
+    for line in range(100):
+        logger.info("line %d", line)
+    stop_logging(listener)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["console_log.txt", "console_log.txt.1", "console_log.txt.2"]
+    assert read_records(log_file)[-1]["message"] == "line 99"
+
+
+def test_check_output_is_tagged_with_the_request_id_and_device(client, auth, fake, tmp_path, monkeypatch):
+    log_file = tmp_path / "console_log.txt"
+    listener = setup_logging(str(log_file), logger_name="test_log_config.check")
+    fake.outputs = device_outputs("APLOS", "OTE", "", "healthy", 20)
+    with monkeypatch.context() as patch:
+        patch.setattr("sys.stdout", LogStream(logging.getLogger("test_log_config.check")))
+        response = client.post('/wanchecks/', json={"device_ip": "192.0.2.130", "tenant_type": "APLOS", "provider": "OTE",
+                                                    "bgp_neighbor": ""}, headers={**auth, "X-Request-ID": "req-130"})
+        # a new id is created for requests without one
+        generated = client.post('/wanchecks/', json={}, headers=auth).headers["X-Request-ID"]
+    stop_logging(listener)
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "req-130"
+    assert generated and generated != "req-130"
+
+    records = [record for record in read_records(log_file) if record["request_id"] == "req-130"]
+    assert records
+    assert {record["device_ip"] for record in records} <= {None, "192.0.2.130"}
+    assert any(record["device_ip"] == "192.0.2.130" for record in records)
+    assert not any("\x1b[" in record["message"] for record in records)
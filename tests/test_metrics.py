@@ -0,0 +1,100 @@
+"""Tests of the Prometheus metrics of /metrics."""
+
+import re
+
+import pytest
+
+from fake_device import device_outputs
+from metrics import MetricsRegistry
+
+SAMPLE = re.compile(r"^([^#].*) (\S+)$")
+
+
+def samples(text):
+    """Return the samples of a Prometheus text exposition as {'name{labels}': value}."""
+    return {match.group(1): float(match.group(2)) for match in map(SAMPLE.match, text.splitlines()) if match}
+
+
+def test_registry_renders_the_prometheus_text_format():
+    registry = MetricsRegistry()
+    checks = registry.counter("test_checks", "Checks", ("provider", "status"))
+    seconds = registry.histogram("test_seconds", "Durations", ("stage",), buckets=(0.5, 1))
+    checks.inc(provider="OTE", status="completed")
+    checks.inc(2, provider='O"T\\E', status="error")
+    for value in (0.2, 0.7, 3):
+        seconds.observe(value, stage="ping")
+
+    assert registry.render() == "\n".join([
+        "# HELP test_checks Checks",
+        "# TYPE test_checks counter",
+        'test_checks_total{provider="O\\"T\\\\E",status="error"} 2',
+        'test_checks_total{provider="OTE",status="completed"} 1',
+        "# HELP test_seconds Durations",
+        "# TYPE test_seconds histogram",
+        # the buckets are cumulative
+        'test_seconds_bucket{stage="ping",le="0.5"} 1',
+        'test_seconds_bucket{stage="ping",le="1"} 2',
+        'test_seconds_bucket{stage="ping",le="+Inf"} 3',
+        'test_seconds_sum{stage="ping"} 3.9',
+        'test_seconds_count{stage="ping"} 3',
+    ]) + "\n"
+
+
+def test_metrics_require_the_api_token(client, auth, monkeypatch):
+    import WAN_checks_API
+
+    assert client.get('/metrics').status_code == 401
+    response = client.get('/metrics', headers={"Authorization": f"Bearer {auth['Authorization']}"})
+    assert response.status_code == 200
+    assert response.content_type == "text/plain; version=0.0.4; charset=utf-8"
+    assert "# TYPE wanchecks_checks counter" in response.get_data(as_text=True)
+
+    monkeypatch.setattr(WAN_checks_API, "METRICS_REQUIRE_AUTH", False)
+    assert client.get('/metrics').status_code == 200
+
+
+def scrape(client, auth):
+    return samples(client.get('/metrics', headers=auth).get_data(as_text=True))
+
+
+def check(client, auth, device_ip):
+    return client.post('/wanchecks/', json={"device_ip": device_ip, "tenant_type": "APLOS", "provider": "WIND",
+                                            "bgp_neighbor": ""}, headers=auth)
+
+
+def test_checks_update_the_metrics(client, auth, fake):
+    fake.outputs = device_outputs("APLOS", "WIND", "", "healthy", 20)
+    before = scrape(client, auth)
+    assert check(client, auth, "192.0.2.140").status_code == 200
+    after = scrape(client, auth)
+
+    def increase(sample):
+        return after.get(sample, 0) - before.get(sample, 0)
+
+    assert increase('wanchecks_checks_total{tenant_type="APLOS",provider="WIND",status="completed"}') == 1
+    assert increase('wanchecks_check_seconds_count{tenant_type="APLOS",provider="WIND"}') == 1
+    for stage in ("login", "show_run", "show_commands", "interfaces", "ping", "bgp"):
+        assert increase(f'wanchecks_stage_seconds_count{{stage="{stage}",tenant_type="APLOS",provider="WIND"}}') >= 1
+    # the IP addresses of the commands are replaced, so every device shares the same labels
+    commands = [sample for sample in after if sample.startswith("wanchecks_command_seconds_count")]
+    assert any("<ip>" in sample for sample in commands)
+    assert not any(re.search(r"\d+\.\d+\.\d+\.\d+", sample) for sample in commands)
+
+
+@pytest.mark.parametrize("device_ip, error, reason", [("192.0.2.141", ConnectionRefusedError, "ConnectionRefusedError"),
+                                                      ("192.0.2.142", TimeoutError, "TimeoutError")])
+def test_failed_logins_are_counted_by_reason(client, auth, monkeypatch, device_ip, error, reason):
+    import WAN_checks_API
+
+    def refuse(**device):
+        raise error("connection failed")
+
+    monkeypatch.setattr(WAN_checks_API, "connect_netmiko", refuse)
+    before = scrape(client, auth)
+    assert check(client, auth, device_ip).status_code == 400
+    after = scrape(client, auth)
+
+    failures = f'wanchecks_ssh_failures_total{{reason="{reason}"}}'
+    login_failed = 'wanchecks_checks_total{tenant_type="APLOS",provider="WIND",status="login_failed"}'
+    assert after[failures] - before.get(failures, 0) == 1
+    assert after[login_failed] - before.get(login_failed, 0) == 1
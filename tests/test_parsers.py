@@ -0,0 +1,129 @@
+"""Tests of the command output parsers against the captured outputs of benchmarks/corpus."""
+
+import pytest
+
+from fake_device import corpus, route_table
+from parsers import (INVALID_INPUT, parse_bgp_neighbors, parse_config_change, parse_ipv6_interface, parse_license_status,
+                     parse_ping, parse_route_table_total, parse_version, same_address)
+
+
+@pytest.mark.parametrize("name, expected, succeeded", [
+    ("ping_success", {"success_rate": 100, "received": 5, "sent": 5, "rtt_min": 12, "rtt_avg": 14, "rtt_max": 21, "loss_pct": 0}, True),
+    ("ping_partial", {"success_rate": 80, "received": 4, "sent": 5, "rtt_min": 38, "rtt_avg": 41, "rtt_max": 47, "loss_pct": 20}, True),
+    ("ping_failed", {"success_rate": 0, "received": 0, "sent": 5, "rtt_min": None, "rtt_avg": None, "rtt_max": None,
+                     "loss_pct": 100}, False),
+])
+def test_parse_ping(name, expected, succeeded):
+    result = parse_ping(corpus(name))
+    assert result.to_dict() == expected
+    assert result.succeeded(80) is succeeded
+
+
+@pytest.mark.parametrize("output", ["", "% Unrecognized host or address, or protocol not running.", INVALID_INPUT])
+def test_unparsable_ping_is_not_successful(output):
+    result = parse_ping(output)
+    assert (result.sent, result.received) == (0, 0)
+    assert not result.succeeded(0)
+
+
+def test_ping_rounds_combine_into_one_result():
+    combined = parse_ping(corpus("ping_partial")).combine(parse_ping(corpus("ping_failed")))
+    assert (combined.sent, combined.received, combined.success_rate) == (10, 4, 40)
+    assert (combined.rtt_min, combined.rtt_avg, combined.rtt_max) == (38, 41, 47)
+
+
+@pytest.mark.parametrize("name, neighbor, expected", [
+    ("bgp_neighbor_established", "10.255.0.1",
+     [{"neighbor": "10.255.0.1", "found": True, "state": "Established", "uptime": "3w2d", "prefixes_sent": 3, "prefixes_received": 12}]),
+    ("bgp_neighbor_idle", "80.80.80.80",
+     [{"neighbor": "80.80.80.80", "found": True, "state": "Idle", "uptime": None, "prefixes_sent": 0, "prefixes_received": 0}]),
+    ("bgp_no_such_neighbor", "10.9.9.9",
+     [{"neighbor": "10.9.9.9", "found": False, "state": None, "uptime": None, "prefixes_sent": None, "prefixes_received": None}]),
+    ("bgp_ipv6_neighbors", "2001:DB8:1::1",
+     [{"neighbor": "10.255.0.1", "found": True, "state": "Established", "uptime": "3w2d", "prefixes_sent": 2, "prefixes_received": 4},
+      {"neighbor": "2001:DB8:1::1", "found": True, "state": "Active", "uptime": None, "prefixes_sent": 0, "prefixes_received": 0}]),
+])
+def test_parse_bgp_neighbors(name, neighbor, expected):
+    assert [record.to_dict() for record in parse_bgp_neighbors(corpus(name), neighbor)] == expected
+
+
+def test_ipv6_neighbors_lists_every_peer_with_its_own_state():
+    neighbors = parse_bgp_neighbors(corpus("bgp_ipv6_neighbors"), "2001:DB8:1::1")
+    assert [(record.neighbor, record.state) for record in neighbors] == [("10.255.0.1", "Established"),
+                                                                         ("2001:DB8:1::1", "Active")]
+    assert [record.established for record in neighbors] == [True, False]
+
+
+def test_invalid_bgp_command_is_a_neighbor_not_found():
+    [record] = parse_bgp_neighbors(corpus("ipv6_interface_invalid"), "10.255.0.1")
+    assert not record.found and not record.established
+
+
+@pytest.mark.parametrize("address, other, same", [
+    ("2001:DB8:1::1", "2001:db8:1::1", True),
+    # zero-padded groups of config.py
+    ("2001:DB8:1::1", "2001:0db8:0001:0000:0000:0000:0000:0001", True),
+    ("2001:DB8:1::1", "2001:0db8:0001::0001", True),
+    ("2001:DB8:1::1", "2001:db8:1::10", False),
+    ("10.255.0.1", "10.255.0.1", True),
+    ("10.255.0.1", "10.255.0.10", False),
+    ("10.255.0.1", "2001:db8:1::1", False),
+    (None, "2001:db8:1::1", False),
+    ("PEER-GROUP", "peer-group", True),
+])
+def test_same_address(address, other, same):
+    assert same_address(address, other) is same
+
+
+@pytest.mark.parametrize("name, interface, expected", [
+    ("ipv6_interface_up", "vlan3000", {"interface": "vlan3000", "exists": True, "status": "up", "line_protocol": "up"}),
+    ("ipv6_interface_down", "vlan3100", {"interface": "vlan3100", "exists": True, "status": "down", "line_protocol": "down"}),
+    ("ipv6_interface_invalid", "vlan200", {"interface": "vlan200", "exists": False, "status": None, "line_protocol": None}),
+])
+def test_parse_ipv6_interface(name, interface, expected):
+    status = parse_ipv6_interface(corpus(name), interface)
+    assert status.to_dict() == expected
+    assert status.is_up is (expected["line_protocol"] == "up")
+
+
+def test_administratively_down_interface():
+    status = parse_ipv6_interface("Vlan3000 is administratively down, line protocol is down\n", "vlan3000")
+    assert (status.status, status.is_up) == ("administratively down", False)
+
+
+@pytest.mark.parametrize("output, expected", [
+    (corpus("show_version"), {"serial_number": "FLM2521W0AB", "system_image": "isr4300-universalk9.17.06.05.SPA.bin",
+                              "version": "17.06.05", "uptime": "12 weeks, 3 days, 4 hours, 51 minutes"}),
+    ("", {"serial_number": None, "system_image": None, "version": None, "uptime": None}),
+])
+def test_parse_version(output, expected):
+    assert parse_version(output).to_dict() == expected
+
+
+@pytest.mark.parametrize("output, expected", [
+    (corpus("show_license_status"), {"trust_code_installed": True, "trust_code": "Mar 14 10:22:31 2023 UTC"}),
+    (corpus("show_license_status_no_trust"), {"trust_code_installed": False, "trust_code": None}),
+    ("", {"trust_code_installed": None, "trust_code": None}),
+])
+def test_parse_license_status(output, expected):
+    assert parse_license_status(output).to_dict() == expected
+
+
+@pytest.mark.parametrize("output, expected", [
+    (route_table(8), 8),
+    (route_table(0), 0),
+    # a table cut at the capture limit has no summary line
+    ("\n".join(route_table(100).split("\n")[:20]), None),
+])
+def test_parse_route_table_total(output, expected):
+    assert parse_route_table_total(output) == expected
+
+
+@pytest.mark.parametrize("output, expected", [
+    ("Building configuration...\n\n! Last configuration change at 10:22:31 UTC Tue Mar 14 2023 by admin\n!\nhostname CPE\n",
+     "10:22:31 UTC Tue Mar 14 2023 by admin"),
+    ("! Last configuration change at 08:01:02 UTC Mon Jan 8 2024  \n", "08:01:02 UTC Mon Jan 8 2024"),
+    ("Building configuration...\n\nhostname CPE\n", None),
+])
+def test_parse_config_change(output, expected):
+    assert parse_config_change(output) == expected
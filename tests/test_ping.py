@@ -0,0 +1,82 @@
+"""Tests of the fast-fail ping rounds of PING_MODE 'fast'."""
+
+import pytest
+
+from fake_device import FakeConnection, FakeDevice, FakePing, device_outputs, ping_probes
+
+
+class ProbeSequence(FakePing):
+    """A host answering the probes of its pings with '!' and losing them with '.', in order."""
+
+    def __init__(self, probes):
+        super().__init__()
+        self.probes = probes
+
+    def __call__(self, command):
+        repeat, timeout = ping_probes(command)
+        probes, self.probes = self.probes[:repeat], self.probes[repeat:]
+        received = probes.count("!")
+        lines = ["Type escape sequence to abort.",
+                 f"Sending {repeat}, 100-byte ICMP Echos to {command.split()[1]}, timeout is {timeout} seconds:", probes,
+                 f"Success rate is {100 * received // repeat} percent ({received}/{repeat})"]
+        if received:
+            lines[-1] += ", round-trip min/avg/max = 15/15/15 ms"
+        return "\n".join(lines)
+
+
+@pytest.fixture
+def fast_mode(monkeypatch):
+    import WAN_checks_API
+    monkeypatch.setattr(WAN_checks_API, "PING_MODE", "fast")
+    monkeypatch.setattr(WAN_checks_API, "PING_REPEAT", 5)
+    monkeypatch.setattr(WAN_checks_API, "PING_FAST_PROBES", 2)
+
+
+@pytest.mark.parametrize("probes, threshold, rounds", [
+    # the default 80% needs 4 answers, a healthy or a dead host is decided by the first command
+    ("!!!!!", None, [4]),
+    (".....", None, [4]),
+    ("!..!!", None, [4]),
+    # one lost probe out of the first 4: one more probe decides
+    ("!.!!!", None, [4, 1]),
+    ("!.!!.", None, [4, 1]),
+    # 40% needs 2 answers, PING_FAST_PROBES is the minimum first round
+    ("!!!!!", 40, [2]),
+    ("..!!!", 40, [2, 2]),
+    ("...!!", 40, [2, 2, 1]),
+    (".....", 40, [2, 2]),
+    ("!!!!!", 100, [5]),
+    ("!!!!.", 100, [5]),
+])
+def test_fast_ping_sends_only_the_probes_that_decide(fast_mode, probes, threshold, rounds):
+    import WAN_checks_API
+
+    device = FakeDevice(outputs={"ping ": ProbeSequence(probes)}, command_latencies={"ping": 0.0})
+    output, result = WAN_checks_API.ping_host(FakeConnection(device), "Lo0", "10.100.0.1", {}, threshold)
+    assert [ping_probes(command)[0] for command in device.commands] == rounds
+    assert output.count("Success rate is") == len(rounds)
+    assert result.sent == sum(rounds)
+    # the verdict is the one of all PING_REPEAT probes
+    expected = 100 * probes.count("!") / 5 >= (80 if threshold is None else threshold)
+    assert result.succeeded(80 if threshold is None else threshold) is expected
+
+
+def test_standard_mode_sends_every_probe(monkeypatch):
+    import WAN_checks_API
+
+    monkeypatch.setattr(WAN_checks_API, "PING_MODE", "standard")
+    device = FakeDevice(outputs={"ping ": ProbeSequence(".....")}, command_latencies={"ping": 0.0})
+    _, result = WAN_checks_API.ping_host(FakeConnection(device), "Lo0", "10.100.0.1", {})
+    assert device.commands == ["ping 10.100.0.1 source Lo0"]
+    assert (result.sent, result.received) == (5, 0)
+
+
+def test_fast_check_pings_every_host_once(client, auth, fake, fast_mode):
+    fake.outputs = device_outputs("APLOS", "OTE", "", "ping_failure", 20)
+    response = client.post('/wanchecks/', json={"device_ip": "192.0.2.160", "tenant_type": "APLOS", "provider": "OTE",
+                                                "bgp_neighbor": ""}, headers=auth)
+    assert response.get_json()["json_return_output"]["PING_REPORT"] == "FAIL"
+    pings = [command for command in fake.commands if command.startswith("ping ")]
+    # one command per host, the dead host included
+    assert all(ping_probes(command)[0] == 4 for command in pings)
+    assert len(pings) == len({(command.split()[1], command.split()[3]) for command in pings})
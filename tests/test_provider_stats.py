@@ -0,0 +1,31 @@
+"""Tests of the per-provider statistics of /wanchecks/providers/."""
+
+import json
+
+from fake_device import device_outputs
+from provider_stats import ProviderStats
+
+
+def test_provider_stats_of_the_checks(client, auth, fake, monkeypatch):
+    import WAN_checks_API
+
+    monkeypatch.setattr(WAN_checks_API, "provider_stats", ProviderStats())
+    for device_ip, scenario in (("192.0.2.190", "healthy"), ("192.0.2.191", "bgp_idle")):
+        fake.outputs = device_outputs("APLOS", "WIND", "", scenario, 20)
+        client.post('/wanchecks/', json={"device_ip": device_ip, "tenant_type": "APLOS", "provider": "WIND",
+                                         "bgp_neighbor": "", "force_refresh": True}, headers=auth)
+
+    response = client.get('/wanchecks/providers/?provider=wind&compact=1', headers=auth)
+    text = response.get_data(as_text=True)
+    assert text == json.dumps(json.loads(text), separators=(",", ":"))
+    wind = json.loads(text)["providers"]["WIND"]
+    assert (wind["checks"], wind["devices"]) == ({"completed": 2}, 2)
+    assert wind["reports"]["BGP_REPORT"] == {"OK": 1, "FAIL": 1}
+    neighbor = wind["bgp_neighbors"]["10.255.1.1"]
+    assert (neighbor["devices_failing"], neighbor["failing_devices"]) == (1, ["192.0.2.191"])
+
+    # 'include' selects sections of check responses, it does not apply to the statistics
+    included = client.get('/wanchecks/providers/?provider=wind&include=show_run', headers=auth).get_json()["providers"]["WIND"]
+    assert included["bgp_neighbors"] == wind["bgp_neighbors"] and included["hosts"] == wind["hosts"]
+    assert client.get('/wanchecks/providers/?include=routes', headers=auth).status_code == 400
+    assert client.get('/wanchecks/providers/?provider=OTE', headers=auth).status_code == 404
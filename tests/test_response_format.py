@@ -0,0 +1,111 @@
+"""Tests of the response options (include, compact) and the gzip/brotli negotiation."""
+
+import gzip
+import json
+
+import pytest
+
+import response_format
+from fake_device import device_outputs
+from response_format import parse_include, select_sections
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ([], ()),
+    (["show_run", "stats"], ("show_run", "stats")),
+    ("show_run, timings,", ("show_run", "timings")),
+])
+def test_parse_include(value, expected):
+    assert parse_include(value) == expected
+
+
+@pytest.mark.parametrize("value, error", [
+    ("show_run,routes", "Unknown include sections routes"),
+    ([1], "include must be a list of section names"),
+    ({"show_run": True}, "include must be a list of section names"),
+])
+def test_invalid_include_is_rejected(value, error):
+    with pytest.raises(ValueError, match=error):
+        parse_include(value)
+
+
+def test_select_sections_keeps_the_reports_and_the_requested_sections():
+    response = {"hostname": "CPE", "show_run_output": "hostname CPE", "cached_commands": [],
+                "json_return_output": {"PING_REPORT": "OK", "ping_stats": [], "Lo0_ping_outputs": [],
+                                       "vlan300_ping_outputs": [], "vlan300_ping_results": [], "timings": {}}}
+    assert select_sections(response, None) is response
+    assert select_sections(response, ("results",)) == {
+        "hostname": "CPE", "cached_commands": [], "json_return_output": {"PING_REPORT": "OK", "vlan300_ping_results": []}}
+    assert select_sections(response, ("show_run", "stats"))["json_return_output"] == {"PING_REPORT": "OK", "ping_stats": []}
+    assert "Lo0_ping_outputs" in response["json_return_output"]
+
+
+def check(client, auth, device_ip, headers=None, query="", **fields):
+    return client.post(f'/wanchecks/{query}', json={"device_ip": device_ip, "tenant_type": "APLOS", "provider": "OTE",
+                                                    "bgp_neighbor": "", **fields}, headers={**auth, **(headers or {})})
+
+
+def test_large_responses_are_gzip_encoded(client, auth, fake):
+    fake.outputs = device_outputs("APLOS", "OTE", "", "healthy", 20)
+    plain = check(client, auth, "192.0.2.170")
+    assert "Content-Encoding" not in plain.headers
+    assert plain.headers["Vary"] == "Accept-Encoding"
+
+    encoded = check(client, auth, "192.0.2.170", headers={"Accept-Encoding": "gzip, deflate"})
+    assert encoded.headers["Content-Encoding"] == "gzip"
+    assert encoded.headers["Vary"] == "Accept-Encoding"
+    body = json.loads(gzip.decompress(encoded.get_data()))
+    assert body["json_return_output"]["PING_REPORT"] == "OK"
+    assert len(encoded.get_data()) < len(plain.get_data())
+
+
+def test_small_responses_are_not_compressed(client, auth, fake, monkeypatch):
+    import WAN_checks_API
+
+    fake.outputs = device_outputs("APLOS", "OTE", "", "healthy", 20)
+    response = check(client, auth, "192.0.2.171", headers={"Accept-Encoding": "gzip"}, include=[], compact=True)
+    assert len(response.get_data()) < WAN_checks_API.RESPONSE_COMPRESSION_MIN_BYTES
+    assert "Content-Encoding" not in response.headers
+
+    monkeypatch.setattr(WAN_checks_API, "RESPONSE_COMPRESSION_MIN_BYTES", 0)
+    response = check(client, auth, "192.0.2.171", headers={"Accept-Encoding": "gzip"}, include=[], compact=True)
+    assert response.headers["Content-Encoding"] == "gzip"
+
+
+@pytest.mark.skipif(response_format.brotli is not None, reason="brotli is installed")
+def test_brotli_is_not_offered_without_the_brotli_package(client, auth, fake):
+    fake.outputs = device_outputs("APLOS", "OTE", "", "healthy", 20)
+    assert "Content-Encoding" not in check(client, auth, "192.0.2.172", headers={"Accept-Encoding": "br"}).headers
+    assert check(client, auth, "192.0.2.172", headers={"Accept-Encoding": "br, gzip"}).headers["Content-Encoding"] == "gzip"
+
+
+def test_brotli_is_preferred_over_gzip(client, auth, fake):
+    brotli = pytest.importorskip("brotli")
+    fake.outputs = device_outputs("APLOS", "OTE", "", "healthy", 20)
+    response = check(client, auth, "192.0.2.173", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert json.loads(brotli.decompress(response.get_data()))["json_return_output"]["BGP_REPORT"] == "OK"
+    # unless the client weighs gzip higher
+    response = check(client, auth, "192.0.2.173", headers={"Accept-Encoding": "gzip;q=1.0, br;q=0.5"})
+    assert response.headers["Content-Encoding"] == "gzip"
+
+
+def test_include_and_compact_options(client, auth, fake):
+    fake.outputs = device_outputs("APLOS", "OTE", "", "healthy", 20)
+    response = check(client, auth, "192.0.2.174", include=["stats"], compact=True)
+    body = json.loads(response.get_data(as_text=True))
+    assert response.get_data(as_text=True) == json.dumps(body, separators=(",", ":"))
+    assert "show_run_output" not in body and "ping_stats" in body["json_return_output"]
+    assert "Lo0_ping_outputs" not in body["json_return_output"]
+
+    # the query string sets the options the body does not set
+    response = check(client, auth, "192.0.2.174", query="?include=show_run&compact=0")
+    body = json.loads(response.get_data(as_text=True))
+    assert response.get_data(as_text=True).startswith("{\n    ")
+    assert "show_run_output" in body and "ping_stats" not in body["json_return_output"]
+
+    # an unknown section is rejected before the device is contacted
+    sent = len(fake.commands)
+    assert check(client, auth, "192.0.2.174", include=["routes"]).status_code == 400
+    assert len(fake.commands) == sent
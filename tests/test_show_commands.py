@@ -0,0 +1,80 @@
+"""Tests of the planning and single-pass batching of the show commands of a check."""
+
+from fake_device import FakeConnection, FakeDevice, device_outputs
+
+
+def commands_of(tenant_type="APLOS", provider="OTE", bgp_neighbor="", profile="standard"):
+    import WAN_checks_API
+    return WAN_checks_API.plan_show_commands(WAN_checks_API.tenant_plans[tenant_type], provider, bgp_neighbor,
+                                             WAN_checks_API.CHECK_PROFILES[profile])
+
+
+def test_planned_commands_of_the_tenant_types():
+    assert commands_of("APLOS", "WIND") == [
+        "show version", "show license status", "show ipv6 interface vlan3000", "show ipv6 interface vlan3100",
+        "show ip bgp neighbor 10.255.1.1", "show bgp ipv6 unicast neighbors"]
+    # duplicate neighbors are sent once; the optional vlan200 is probed with 'show interface'
+    assert commands_of("MMM", bgp_neighbor="10.9.9.1, 10.9.9.2,10.9.9.1") == [
+        "show version", "show license status", "show interface vlan200", "show ipv6 interface vlan3000",
+        "show ipv6 interface vlan200", "show ip bgp neighbor 10.9.9.1", "show ip bgp neighbor 10.9.9.2"]
+    assert "show version" not in commands_of(profile="quick")
+
+
+def test_batched_outputs_match_the_outputs_of_single_commands():
+    import WAN_checks_API
+
+    device = FakeDevice(outputs=device_outputs("APLOS", "WIND", "", "healthy", 20))
+    commands = commands_of("APLOS", "WIND")
+    batched = WAN_checks_API.run_show_commands(FakeConnection(device), commands)
+    assert device.commands == commands
+
+    # the outputs are split on the prompt, without the trailing newline of the device
+    one_by_one = {command: FakeConnection(device).send_command(command).rstrip("\n") for command in commands}
+    assert batched == one_by_one
+    assert "Trust Code Installed" in batched["show license status"]
+
+
+class WrongEcho(FakeConnection):
+    """A device echoing the batched commands in another form, e.g. abbreviated."""
+
+    def write_channel(self, out_data):
+        super().write_channel(out_data.replace("show ", "sh "))
+
+
+def test_unsplittable_batch_falls_back_to_single_commands():
+    import WAN_checks_API
+
+    device = FakeDevice(outputs=device_outputs("APLOS", "OTE", "", "healthy", 20))
+    commands = commands_of("APLOS", "OTE")
+    outputs = WAN_checks_API.run_show_commands(WrongEcho(device), commands)
+    assert device.commands[-len(commands):] == commands
+    assert outputs == {command: device.lookup(command) for command in commands}
+
+
+def test_batching_can_be_disabled(monkeypatch):
+    import WAN_checks_API
+
+    sent = []
+
+    class Connection:
+        def send_command(self, command):
+            sent.append(command)
+            return f"output of {command}"
+
+        def write_channel(self, data):
+            raise AssertionError("commands must not be batched")
+
+    monkeypatch.setattr(WAN_checks_API, "BATCH_SHOW_COMMANDS", False)
+    outputs = WAN_checks_API.run_show_commands(Connection(), ["show version", "show license status"])
+    assert sent == ["show version", "show license status"]
+    assert outputs["show version"] == "output of show version"
+
+
+def test_check_reads_the_planned_commands_in_one_pass(client, auth, fake):
+    fake.outputs = device_outputs("APLOS", "OTE", "", "healthy", 20)
+    response = client.post('/wanchecks/', json={"device_ip": "192.0.2.90", "tenant_type": "APLOS", "provider": "OTE",
+                                                "bgp_neighbor": "", "include": ["timings"]}, headers=auth)
+    commands = [entry["command"] for entry in response.get_json()["json_return_output"]["timings"]["commands"]]
+    assert " ; ".join(commands_of("APLOS", "OTE")) in commands
+    # the batched show commands are not sent again one by one
+    assert not set(commands_of("APLOS", "OTE")) & set(commands)
@@ -0,0 +1,62 @@
+"""Tests of the NDJSON and Server-Sent Events streaming mode of /wanchecks/."""
+
+import json
+
+from fake_device import device_outputs
+
+
+def check_request(device_ip, **fields):
+    return {"device_ip": device_ip, "tenant_type": "APLOS", "provider": "OTE", "bgp_neighbor": "", **fields}
+
+
+def test_ndjson_stream_sends_every_section_and_the_reports(client, auth, fake):
+    fake.outputs = device_outputs("APLOS", "OTE", "", "bgp_idle", 20)
+    response = client.post('/wanchecks/', json=check_request("192.0.2.100", stream="ndjson"), headers=auth)
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    sections = [record["section"] for record in records]
+    assert sections[:2] == ["device", "show_run"]
+    assert set(sections[2:-1]) == {"version_license", "interfaces", "Lo0_ping", "vlan3100_ping", "vlan3000_ping", "bgp"}
+    assert sections[-1] == "done"
+    assert records[0]["data"] == {"hostname": "FAKE-CPE", "device_ip": "192.0.2.100"}
+    assert records[-1]["data"] == {"status_code": 200, "PING_REPORT": "OK", "INTERFACE_REPORT": "OK",
+                                   "LICENSE_REPORT": "OK", "BGP_REPORT": "FAIL"}
+    bgp = next(record["data"] for record in records if record["section"] == "bgp")
+    assert bgp["BGP_REPORT"] == "FAIL"
+
+
+def test_sse_stream_is_selected_by_the_accept_header(client, auth, fake):
+    fake.outputs = device_outputs("APLOS", "OTE", "", "healthy", 20)
+    response = client.post('/wanchecks/', json=check_request("192.0.2.101", stream=True, profile="quick"),
+                           headers={**auth, "Accept": "text/event-stream"})
+    assert response.mimetype == "text/event-stream"
+
+    events = response.get_data(as_text=True).split("\n\n")
+    assert events[-1] == ""
+    names = [event.split("\n")[0] for event in events[:-1]]
+    assert names[0] == "event: device" and names[-1] == "event: done"
+    # the quick profile reads neither show run nor the license
+    assert "event: show_run" not in names and "event: version_license" not in names
+    done = json.loads(events[-2].split("\n")[1][len("data: "):])
+    assert done["status_code"] == 200 and "LICENSE_REPORT" not in done
+
+
+def test_stream_ends_with_an_error_section(client, auth, fake, monkeypatch):
+    import WAN_checks_API
+
+    def refuse(**device):
+        raise ConnectionRefusedError("connection refused")
+
+    monkeypatch.setattr(WAN_checks_API, "connect_netmiko", refuse)
+    response = client.post('/wanchecks/', json=check_request("192.0.2.102", stream="ndjson"), headers=auth)
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert records == [{"section": "error", "data": {"status_code": 400, "response": "Failed to connect to 192.0.2.102",
+                                                      "error": "login_failed"}}]
+
+
+def test_unknown_stream_format_is_rejected(client, auth):
+    response = client.post('/wanchecks/', json=check_request("192.0.2.103", stream="xml"), headers=auth)
+    assert response.status_code == 400